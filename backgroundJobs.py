@@ -0,0 +1,95 @@
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobSignals(QObject):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class ComputeJob(QRunnable):
+    # Runs function(*args, progress=callback) on the thread pool. The callback
+    # reports a percentage and is also where a cancelled job stops, so long
+    # computations should call it between chunks.
+    def __init__(self, function, *args):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.signals = JobSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report_progress(self, percent):
+        if self.cancelled:
+            raise JobCancelled()
+        self.signals.progress.emit(int(percent))
+
+    def run(self):
+        try:
+            result = self.function(*self.args, progress=self.report_progress)
+        except JobCancelled:
+            return
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(str(e))
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(result)
+
+
+class JobRunner:
+    # Keeps at most one live job per name, submitting a new job under the
+    # same name cancels the previous one and drops its result.
+    def __init__(self, progress_bar=None, pool=None):
+        self.progress_bar = progress_bar
+        self.pool = pool or QThreadPool.globalInstance()
+        self.jobs = {}
+
+    def submit(self, name, function, on_finished, *args, on_failed=None):
+        self.cancel(name)
+        job = ComputeJob(function, *args)
+        job.signals.finished.connect(lambda result: self.job_done(name, job, on_finished, result))
+        job.signals.failed.connect(lambda message: self.job_failed(name, job, on_failed, message))
+        if self.progress_bar is not None:
+            job.signals.progress.connect(self.progress_bar.setValue)
+            self.progress_bar.setValue(0)
+        self.jobs[name] = job
+        self.pool.start(job)
+        return job
+
+    def is_current(self, name, job):
+        return self.jobs.get(name) is job and not job.cancelled
+
+    def job_done(self, name, job, on_finished, result):
+        if not self.is_current(name, job):
+            return
+        del self.jobs[name]
+        if self.progress_bar is not None:
+            self.progress_bar.setValue(100)
+        on_finished(result)
+
+    def job_failed(self, name, job, on_failed, message):
+        if not self.is_current(name, job):
+            return
+        del self.jobs[name]
+        if self.progress_bar is not None:
+            self.progress_bar.setValue(0)
+        if on_failed is not None:
+            on_failed(message)
+        else:
+            print(f"Error computing {name}:", message)
+
+    def cancel(self, name):
+        job = self.jobs.pop(name, None)
+        if job is not None:
+            job.cancel()
+
+    def cancel_all(self):
+        for name in list(self.jobs):
+            self.cancel(name)
@@ -0,0 +1,224 @@
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from heatmapDownsample import HeatmapPyramid
+from tensorDifference import ERROR_METRICS, calculateDifference
+from tensorHistogram import StreamingHistogram
+
+BATCH_WORKERS = os.cpu_count() or 1
+# Thread counts BLAS and OpenMP libraries read when they are loaded
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+PLOT_BINS = 100
+SUMMARY_FIELDS = ["pair", "file1", "file2", "shape", "metric", "mean", "median", "max", "min", "std",
+                  "percentiles_25", "percentiles_50", "percentiles_75", "size", "quantile_error", "seconds", "error"]
+
+
+def read_manifest(path):
+    # One pair per line, comma or whitespace separated, # starts a comment
+    pairs = []
+    with open(path, newline="") as file:
+        for row in csv.reader(line for line in file if line.strip() and not line.lstrip().startswith("#")):
+            fields = row if len(row) >= 2 else row[0].split()
+            if len(fields) < 2:
+                raise ValueError(f"Manifest line needs two files: {row}")
+            pairs.append((fields[0].strip(), fields[1].strip()))
+    return pairs
+
+
+def match_pairs(first_pattern, second_pattern):
+    # A single first file is compared with every second file, otherwise the
+    # files are paired by name
+    first = sorted(glob.glob(first_pattern))
+    second = sorted(glob.glob(second_pattern))
+    if len(first) == 1:
+        return [(first[0], path) for path in second if os.path.abspath(path) != os.path.abspath(first[0])]
+    by_name = {os.path.basename(path): path for path in second}
+    pairs = [(path, by_name[os.path.basename(path)]) for path in first if os.path.basename(path) in by_name]
+    for path in first:
+        if os.path.basename(path) not in by_name:
+            print("No match for", path)
+    return pairs
+
+
+def as_2d(data):
+    # Heatmaps of higher-dimensional tensors show the first axis against the rest
+    if data.ndim == 2:
+        return data
+    if data.ndim < 2:
+        return data.reshape(1, -1)
+    return data.reshape(data.shape[0], -1)
+
+
+def save_plots(difference, metric, streamed, path_stem, bins):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    if streamed is not None:
+        image = streamed.heatmaps["max-abs"] if streamed.heatmaps is not None else None
+        base = streamed.histogram
+    else:
+        data = difference.error(metric)
+        data_2d = as_2d(data)
+        image = HeatmapPyramid(data_2d.shape, lambda rows, cols: data_2d[rows, cols]).overview()[0]
+        base = StreamingHistogram.from_values(data)
+
+    if image is not None:
+        figure = Figure(figsize=(10, 5))
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot(111)
+        heatmap = axes.imshow(image, cmap='coolwarm', interpolation='nearest', aspect=1)
+        figure.colorbar(heatmap)
+        axes.set_title(metric)
+        figure.savefig(f"{path_stem}-heatmap.png")
+
+    counts, edges = base.rebin(bins)
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    axes.stairs(counts, edges, fill=True)
+    axes.set_xlabel('Value')
+    axes.set_ylabel('Frequency')
+    axes.set_title(f"{metric} Histogram")
+    figure.savefig(f"{path_stem}-histogram.png")
+
+
+def json_value(value):
+    # JSON has no nan or inf, they are written as null (an empty CSV cell)
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def diff_pair(index, file1, file2, metrics, output, plots, bins, threads, cache_directory, dtype=None):
+    # Runs in a worker process, one pair at a time
+    name = f"{index:04d}-{os.path.splitext(os.path.basename(file2))[0]}"
+    rows = []
+    started = time.perf_counter()
+    try:
+        data1 = np.load(file1, mmap_mode='r')
+        data2 = np.load(file2, mmap_mode='r')
+        if data1.shape != data2.shape:
+            raise ValueError(f"Tensor sizes are not the same: {data1.shape} and {data2.shape}")
+        results = None
+        if cache_directory is not None:
+            from resultCache import ResultCache
+            results = ResultCache(cache_directory).pair(file1, file2)
+        difference = calculateDifference(data1, data2, results=results, dtype=dtype)
+        streaming = difference.should_stream()
+        for metric in metrics:
+            metric_started = time.perf_counter()
+            streamed = None
+            if streaming:
+                streamed = difference.streamed_errors(metric, workers=threads)
+                statistics = streamed.statistics
+            else:
+                statistics = difference.cached(("statistics", metric), lambda: difference.error_statistics(metric, workers=threads))
+            if plots:
+                save_plots(difference, metric, streamed, os.path.join(output, f"{name}-{metric.replace(' ', '_')}"), bins)
+            row = {"pair": name, "file1": file1, "file2": file2, "shape": list(data1.shape), "metric": metric}
+            row.update({field: json_value(value) for field, value in statistics._asdict().items()})
+            row["size"] = int(statistics.size)
+            row["seconds"] = time.perf_counter() - metric_started
+            rows.append(row)
+    except Exception as e:
+        rows.append({"pair": name, "file1": file1, "file2": file2, "error": str(e)})
+
+    with open(os.path.join(output, f"{name}.json"), "w") as file:
+        json.dump({"pair": name, "file1": file1, "file2": file2, "seconds": time.perf_counter() - started, "metrics": rows},
+                  file, indent=2, allow_nan=False)
+    return rows
+
+
+def limit_threads(threads):
+    # Every worker process gets its share of the cores, not all of them. BLAS
+    # and OpenMP (torch included) size their pools from these when they load,
+    # so they are set here, before workers are spawned and import NumPy, and
+    # values the user set win. Returns the previous environment to restore.
+    previous = {name: os.environ.get(name) for name in THREAD_VARIABLES}
+    for name in THREAD_VARIABLES:
+        os.environ.setdefault(name, str(threads))
+    return previous
+
+
+def restore_threads(previous):
+    for name, value in previous.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+def run_batch(pairs, output, metrics=ERROR_METRICS, workers=BATCH_WORKERS, plots=False, bins=PLOT_BINS, cache_directory=None, dtype=None):
+    os.makedirs(output, exist_ok=True)
+    workers = max(1, min(workers, len(pairs)))
+    threads = max(1, BATCH_WORKERS // workers)
+    started = time.perf_counter()
+    rows = []
+    previous = limit_threads(threads)
+    try:
+        # Spawned workers are fresh interpreters, forked ones would keep the parent's BLAS pool
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(diff_pair, index, file1, file2, metrics, output, plots, bins, threads, cache_directory, dtype)
+                       for index, (file1, file2) in enumerate(pairs)]
+            for done, future in enumerate(as_completed(futures), 1):
+                pair_rows = future.result()
+                rows.extend(pair_rows)
+                failures = [row["error"] for row in pair_rows if "error" in row]
+                print(f"[{done}/{len(pairs)}] {pair_rows[0]['pair']}" + (f" failed: {failures[0]}" if failures else ""))
+    finally:
+        restore_threads(previous)
+    elapsed = time.perf_counter() - started
+    rows.sort(key=lambda row: row["pair"])
+
+    with open(os.path.join(output, "summary.csv"), "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    throughput = {"pairs": len(pairs), "workers": workers, "seconds": elapsed,
+                  "pairs_per_minute": 60 * len(pairs) / elapsed if elapsed > 0 else None}
+    with open(os.path.join(output, "summary.json"), "w") as file:
+        json.dump({"throughput": throughput, "results": rows}, file, indent=2, allow_nan=False)
+    print(f"{len(pairs)} pairs in {elapsed:.1f}s on {workers} workers ({60 * len(pairs) / max(elapsed, 1e-9):.1f} pairs/min)")
+    return rows, throughput
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff many pairs of .npy tensors without the GUI.")
+    parser.add_argument("--manifest", help="file listing one pair of .npy files per line")
+    parser.add_argument("--first", help="glob of first files, or a single reference file")
+    parser.add_argument("--second", help="glob of second files, paired with --first by file name")
+    parser.add_argument("--output", default="diff-results", help="directory for the JSON, CSV and PNG results")
+    parser.add_argument("--metrics", nargs="+", choices=ERROR_METRICS, default=list(ERROR_METRICS), metavar="METRIC")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="worker processes")
+    parser.add_argument("--plots", action="store_true", help="also save heatmap and histogram PNGs")
+    parser.add_argument("--bins", type=int, default=PLOT_BINS, help="histogram bins in the PNGs")
+    parser.add_argument("--cache", action="store_true", help="reuse and fill the on-disk result cache")
+    parser.add_argument("--cache-dir", help="result cache directory")
+    parser.add_argument("--dtype", choices=("float32", "float64"), help="metric precision, defaults to the inputs' own")
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        pairs = read_manifest(args.manifest)
+    elif args.first and args.second:
+        pairs = match_pairs(args.first, args.second)
+    else:
+        parser.error("give --manifest or both --first and --second")
+    if not pairs:
+        parser.error("no file pairs found")
+
+    cache_directory = None
+    if args.cache or args.cache_dir:
+        from resultCache import RESULT_CACHE_DIRECTORY
+        cache_directory = args.cache_dir or RESULT_CACHE_DIRECTORY
+    rows, _ = run_batch(pairs, args.output, args.metrics, args.workers, args.plots, args.bins, cache_directory, args.dtype)
+    return 1 if any("error" in row for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
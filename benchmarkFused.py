@@ -0,0 +1,71 @@
+import argparse
+import sys
+import time
+import numpy as np
+from fusedErrors import FUSED_BLOCK_ELEMENTS, FusedSweep, numba_available
+from tensorDifference import ERROR_METRICS, calculateDifference
+from tensorStatistics import compute_statistics
+
+
+def separate(a, b, workers):
+    # What the windows did before: every metric materialized, then reduced on its own
+    for metric in ERROR_METRICS:
+        compute_statistics(calculateDifference(a, b, max_cache_bytes=0).error(metric), exact=False, workers=workers)
+
+
+def fused(a, b, use_numba):
+    # One thread, so the numbers are per core
+    sweep = FusedSweep(np.result_type(a, np.float32), use_numba)
+    flat_a = a.reshape(-1)
+    flat_b = b.reshape(-1)
+    for start in range(0, flat_a.size, FUSED_BLOCK_ELEMENTS):
+        sweep.update(flat_a[start:start + FUSED_BLOCK_ELEMENTS], flat_b[start:start + FUSED_BLOCK_ELEMENTS])
+    return sweep.results()
+
+
+def fused_threads(a, b, workers):
+    return calculateDifference(a, b, max_cache_bytes=0).fused_errors(workers=workers)
+
+
+def best_time(run, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time all four metrics and their statistics, separately and in one fused sweep.")
+    parser.add_argument("--elements", type=int, default=2 ** 26, help="elements per input tensor")
+    parser.add_argument("--dtype", default="float32", choices=("float16", "float32", "float64"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="threads for the separate and threaded runs")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    a = rng.standard_normal(args.elements, dtype=np.float32).astype(args.dtype)
+    b = (a + rng.standard_normal(args.elements, dtype=np.float32).astype(args.dtype) * 1e-3).astype(args.dtype)
+    input_bytes = a.nbytes + b.nbytes
+
+    runs = [("separate passes", lambda: separate(a, b, args.workers)),
+            ("fused, NumPy", lambda: fused(a, b, False))]
+    if numba_available():
+        fused(a[:FUSED_BLOCK_ELEMENTS], b[:FUSED_BLOCK_ELEMENTS], True)  # compile outside the timing
+        runs.append(("fused, Numba", lambda: fused(a, b, True)))
+    else:
+        print("Numba is not installed, only the NumPy sweep is timed")
+    runs.append((f"fused, {args.workers} threads", lambda: fused_threads(a, b, args.workers)))
+
+    print(f"{args.elements} {args.dtype} elements per input, {input_bytes / 2 ** 20:.0f} MiB read per sweep")
+    baseline = None
+    for name, run in runs:
+        seconds = best_time(run, args.repeat)
+        baseline = baseline or seconds
+        print(f"{name:>20}: {seconds:8.3f}s  {input_bytes / seconds / 2 ** 30:6.2f} GiB/s of input  {baseline / seconds:5.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import numpy as np
+from matplotlib.colors import to_rgba
+from matplotlib.transforms import Bbox
+from PyQt6.QtCore import QTimer
+from hoverAnnotation import frame_interval
+
+
+def pixel_rect(buffer, bbox):
+    # Display bbox to (top, bottom, left, right) rows and columns of the Agg buffer, clipped to it
+    height, width = buffer.shape[:2]
+    top = min(max(height - int(np.ceil(bbox.y1)), 0), height)
+    bottom = min(max(height - int(np.floor(bbox.y0)), 0), height)
+    left = min(max(int(np.floor(bbox.x0)), 0), width)
+    right = min(max(int(np.ceil(bbox.x1)), 0), width)
+    return top, bottom, left, right
+
+
+def runs(indices):
+    # Consecutive equal indices as (index, count) pairs
+    starts = np.flatnonzero(np.r_[True, indices[1:] != indices[:-1]])
+    return indices[starts], np.diff(np.r_[starts, len(indices)])
+
+
+def resample_nearest(pixels, rows, cols, out, fill):
+    # out[i, j] = pixels[rows[i], cols[j]], fill where either is outside pixels.
+    # The indices come from a linear map so they are monotonic, which makes
+    # the inside one block and lets each source row be gathered once.
+    inside_rows = np.flatnonzero((rows >= 0) & (rows < pixels.shape[0]))
+    inside_cols = np.flatnonzero((cols >= 0) & (cols < pixels.shape[1]))
+    if len(inside_rows) == 0 or len(inside_cols) == 0:
+        out[...] = fill
+        return
+    top, bottom = inside_rows[0], inside_rows[-1] + 1
+    left, right = inside_cols[0], inside_cols[-1] + 1
+    out[:top] = fill
+    out[bottom:] = fill
+    out[top:bottom, :left] = fill
+    out[top:bottom, right:] = fill
+    source_rows, counts = runs(rows[top:bottom])
+    out[top:bottom, left:right] = np.repeat(pixels[source_rows].take(cols[left:right], axis=1), counts, axis=0)
+
+
+class RedrawEngine:
+    # One per canvas. Full redraws are requested rather than made, and a burst
+    # of requests costs one draw once a display frame passes without another.
+    # Overlays such as hover annotations are animated artists blitted over the
+    # last full draw, and a zoom first shows the axes' pixels from that draw
+    # rescaled to the new limits, so it responds before the redraw lands.
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.overlays = []
+        self.background = None
+        self.overlay_boxes = []
+        self.drawn_limits = {}
+        self.snapshot = None
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(frame_interval())
+        self.timer.timeout.connect(self.draw)
+        canvas.mpl_connect('draw_event', self.save_background)
+
+    def request_draw(self):
+        self.timer.start()
+
+    def draw(self):
+        self.timer.stop()
+        self.canvas.draw()
+
+    def add_overlay(self, artist):
+        # Animated artists are left out of full draws and drawn over them here
+        artist.set_animated(True)
+        self.overlays.append(artist)
+
+    def remove_overlay(self, artist):
+        if artist in self.overlays:
+            self.overlays.remove(artist)
+
+    def buffer(self):
+        # The Agg buffer as one uint32 per pixel, written in place
+        buffer = np.asarray(self.canvas.get_renderer().buffer_rgba())
+        return buffer.view(np.uint32).reshape(buffer.shape[:2])
+
+    def save_background(self, event):
+        # Runs at the end of every full draw, before it reaches the screen
+        self.background = self.buffer().copy()
+        self.drawn_limits = {axes: (axes.get_xlim(), axes.get_ylim()) for axes in self.canvas.figure.axes}
+        self.snapshot = None
+        self.overlay_boxes = self.draw_overlays()
+
+    def draw_overlays(self):
+        # Returns the display boxes drawn into, the next blit restores only those
+        figure = self.canvas.figure
+        renderer = self.canvas.get_renderer()
+        boxes = []
+        for artist in self.overlays:
+            if artist.figure is figure and artist.get_visible():
+                figure.draw_artist(artist)
+                # Text extents leave out the box drawn around them
+                patch = artist.get_bbox_patch() if hasattr(artist, 'get_bbox_patch') else None
+                extents = [artist.get_window_extent(renderer)] + ([patch.get_window_extent(renderer)] if patch is not None else [])
+                boxes.append(Bbox.union(extents).padded(2))
+        return boxes
+
+    def blit_overlays(self):
+        if self.background is None or self.snapshot is not None:
+            # Nothing to blit over yet, or a zoom preview is up until its redraw
+            self.request_draw()
+            return
+        buffer = self.buffer()
+        if buffer.shape != self.background.shape:
+            self.request_draw()
+            return
+        for box in self.overlay_boxes:
+            top, bottom, left, right = pixel_rect(buffer, box)
+            buffer[top:bottom, left:right] = self.background[top:bottom, left:right]
+        boxes = self.draw_overlays()
+        changed = self.overlay_boxes + boxes
+        self.overlay_boxes = boxes
+        if changed:
+            self.canvas.blit(Bbox.union(changed))
+
+    def preview_zoom(self, axes):
+        # Stands in for the redraw until it comes: the pixels inside the axes
+        # from the last full draw, nearest neighbour at the axes' new limits
+        self.request_draw()
+        if self.background is None or axes not in self.drawn_limits:
+            return
+        if axes.get_xscale() != 'linear' or axes.get_yscale() != 'linear':
+            return
+        buffer = self.buffer()
+        if buffer.shape != self.background.shape:
+            return
+        top, bottom, left, right = pixel_rect(buffer, axes.bbox)
+        if self.snapshot is None or self.snapshot[0] is not axes:
+            # Overlays are left out, they are redrawn over the preview
+            self.snapshot = (axes, self.background[top:bottom, left:right].copy())
+            self.overlay_boxes = []
+        pixels = self.snapshot[1]
+        height, width = pixels.shape
+        if height == 0 or width == 0 or (height, width) != (bottom - top, right - left):
+            return
+        (old_left, old_right), (old_bottom, old_top) = self.drawn_limits[axes]
+        (new_left, new_right), (new_bottom, new_top) = axes.get_xlim(), axes.get_ylim()
+        # Pixel centres of the new view in data coordinates, then in pixels of the old view
+        x = new_left + (np.arange(width) + 0.5) * (new_right - new_left) / width
+        y = new_top + (np.arange(height) + 0.5) * (new_bottom - new_top) / height
+        cols = np.floor((x - old_left) / (old_right - old_left) * width).astype(np.intp)
+        rows = np.floor((y - old_top) / (old_bottom - old_top) * height).astype(np.intp)
+        fill = np.array(to_rgba(axes.get_facecolor()), dtype=np.float64) * 255
+        resample_nearest(pixels, rows, cols, buffer[top:bottom, left:right], np.round(fill).astype(np.uint8).view(np.uint32)[0])
+        self.canvas.blit(axes.bbox)
@@ -0,0 +1,145 @@
+import numpy as np
+from tensorHistogram import StreamingHistogram
+from tensorStatistics import StatisticsAccumulator
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# The four metric rows of a block stay in cache while they are reduced
+FUSED_BLOCK_ELEMENTS = 2 ** 16
+# Rows of a fused block, in the order of ERROR_METRICS
+FUSED_METRICS = 4
+
+
+def numba_available():
+    return njit is not None
+
+
+def fill_metrics(value_a, value_b, out):
+    # NumPy version of the kernel, the other three metrics are made from the difference row
+    np.subtract(value_a, value_b, out=out[0], dtype=np.result_type(value_a, value_b, out))
+    np.abs(out[0], out=out[1])
+    np.square(out[0], out=out[2])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(out[0], value_a, out=out[3], dtype=np.result_type(out, value_a))
+    np.abs(out[3], out=out[3])
+    out[3] *= 100
+
+
+if njit is not None:
+    @njit(nogil=True, cache=True, error_model="numpy")
+    def fill_kernel(value_a, value_b, out):
+        # All four metrics of a block from one read of the inputs
+        for i in range(value_a.shape[0]):
+            out[0, i] = value_a[i] - value_b[i]
+            difference = out[0, i]
+            out[1, i] = abs(difference)
+            out[2, i] = difference * difference
+            out[3, i] = abs(difference / value_a[i]) * 100
+
+    @njit(nogil=True, cache=True)
+    def reduce_kernel(values):
+        # Sums are taken relative to the first value to keep the variance well
+        # conditioned; min and max are of the non-NaN values, then of the finite ones
+        shift = np.float64(values[0])
+        if not np.isfinite(shift):
+            shift = 0.0
+        total = 0.0
+        total_squares = 0.0
+        low = np.inf
+        high = -np.inf
+        finite_low = np.inf
+        finite_high = -np.inf
+        nan_count = 0
+        inf_count = 0
+        negative_inf_count = 0
+        for i in range(values.shape[0]):
+            value = np.float64(values[i])
+            if value != value:
+                nan_count += 1
+                continue
+            low = min(low, value)
+            high = max(high, value)
+            if np.isinf(value):
+                inf_count += 1
+                if value < 0:
+                    negative_inf_count += 1
+            else:
+                finite_low = min(finite_low, value)
+                finite_high = max(finite_high, value)
+            shifted = value - shift
+            total += shifted
+            total_squares += shifted * shifted
+        return shift, total, total_squares, low, high, finite_low, finite_high, nan_count, inf_count, negative_inf_count
+
+    @njit(nogil=True, cache=True)
+    def bin_kernel(values, low, width, counts):
+        # StreamingHistogram.update's binning, once its range covers the values
+        last = counts.shape[0] - 1
+        scale = 1.0 / width
+        for i in range(values.shape[0]):
+            value = np.float64(values[i])
+            if np.isfinite(value):
+                index = int((value - low) * scale)
+                counts[min(max(index, 0), last)] += 1
+
+
+class FusedSweep:
+    # Statistics and base histograms of all four metrics, gathered while both
+    # inputs are read once. Each block is turned into the four metric rows in
+    # a cache-sized scratch buffer and reduced there, by compiled loops when
+    # Numba is installed and by NumPy passes over the cached rows otherwise.
+    def __init__(self, dtype, use_numba=None):
+        self.dtype = np.dtype(dtype)
+        self.use_numba = numba_available() if use_numba is None else use_numba
+        self.accumulators = [StatisticsAccumulator(StreamingHistogram()) for _ in range(FUSED_METRICS)]
+        self.scratch = np.empty((FUSED_METRICS, FUSED_BLOCK_ELEMENTS), dtype=self.dtype)
+
+    def update(self, value_a, value_b, keep=None, kept=None):
+        # kept receives row keep of every block, a flat view of the output array
+        value_a = np.asarray(value_a).reshape(-1)
+        value_b = np.asarray(value_b).reshape(-1)
+        for start in range(0, value_a.size, FUSED_BLOCK_ELEMENTS):
+            stop = start + FUSED_BLOCK_ELEMENTS
+            out = self.update_block(value_a[start:stop], value_b[start:stop])
+            if kept is not None:
+                kept[start:stop] = out[keep]
+
+    def update_block(self, value_a, value_b):
+        out = self.scratch[:, :value_a.size]
+        compute = np.result_type(value_a, value_b, self.dtype)
+        if not (self.use_numba and compute.kind == "f" and compute.itemsize >= 4 and self.dtype.itemsize >= 4):
+            fill_metrics(value_a, value_b, out)
+            for row, accumulator in zip(out, self.accumulators):
+                accumulator.update(row)
+            return out
+
+        fill_kernel(value_a.astype(compute, copy=False), value_b.astype(compute, copy=False), out)
+        size = value_a.size
+        for row, accumulator in zip(out, self.accumulators):
+            shift, total, total_squares, low, high, finite_low, finite_high, nan_count, inf_count, negative_inf_count = reduce_kernel(row)
+            counted = size - nan_count
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = shift + total / counted if counted else np.nan
+                m2 = max(total_squares - total * total / counted, 0.0) if counted else np.nan
+            accumulator.merge_partial(size, mean, m2, low if counted else np.nan, high if counted else np.nan, nan_count)
+
+            histogram = accumulator.histogram
+            histogram.non_finite += nan_count + inf_count
+            histogram.negative_inf += negative_inf_count
+            histogram.positive_inf += inf_count - negative_inf_count
+            finite = counted - inf_count
+            if finite:
+                histogram.reserve(finite_low, finite_high)
+                bin_kernel(row, histogram.low, histogram.width, histogram.counts)
+                histogram.include(finite, finite_low, finite_high)
+        return out
+
+    def merge(self, other):
+        for accumulator, partial in zip(self.accumulators, other.accumulators):
+            accumulator.merge(partial)
+
+    def results(self):
+        return [(accumulator.result(), accumulator.histogram) for accumulator in self.accumulators]
@@ -0,0 +1,118 @@
+import numpy as np
+
+# Resolution of the overview image every heatmap starts from
+HEATMAP_DOWNSAMPLE_SHAPE = (1024, 1024)
+REDUCTIONS = ("max-abs", "mean", "min")
+# Visible regions are reduced in row chunks of about this many elements
+REGION_CHUNK_ELEMENTS = 2 ** 24
+# Blocks up to this size are reduced by elementwise passes over strided views,
+# which beats a reduction over the short block axes of a reshape
+STRIDED_BLOCK_SIZE = 8
+
+
+def level_for(shape, screen_shape):
+    # Smallest power-of-two level whose blocks fit the data onto the screen
+    level = 0
+    while any(-(-size // 2 ** level) > max(target, 1) for size, target in zip(shape, screen_shape)):
+        level += 1
+    return level
+
+
+def reduce_strided(data, block_shape, op):
+    block_rows, block_cols = block_shape
+    cols = np.array(data[:, 0::block_cols])
+    for j in range(1, block_cols):
+        op(cols, data[:, j::block_cols], out=cols)
+    out = cols[0::block_rows].copy()
+    for i in range(1, block_rows):
+        op(out, cols[i::block_rows], out=out)
+    return out
+
+
+def reduce_blocks(data, block_shape, reduction="max-abs"):
+    # max-abs keeps the signed value with the largest magnitude of every block
+    # so the extreme errors survive downsampling
+    rows, cols = data.shape
+    block_rows, block_cols = block_shape
+    if block_rows == 1 and block_cols == 1:
+        return np.asarray(data)
+    out_rows = -(-rows // block_rows)
+    out_cols = -(-cols // block_cols)
+    pad = ((0, out_rows * block_rows - rows), (0, out_cols * block_cols - cols))
+
+    if reduction == "mean":
+        # Zero padding plus the true element count keeps partial edge blocks exact
+        blocks = np.pad(data, pad).reshape(out_rows, block_rows, out_cols, block_cols)
+        sums = blocks.sum(axis=(1, 3), dtype=np.float64)
+        row_counts = np.minimum(block_rows, rows - np.arange(out_rows) * block_rows)
+        col_counts = np.minimum(block_cols, cols - np.arange(out_cols) * block_cols)
+        return sums / np.outer(row_counts, col_counts)
+
+    if pad[0][1] or pad[1][1]:
+        # Repeating the edge never changes a block's max or min
+        data = np.pad(data, pad, mode="edge")
+    data = np.asarray(data)
+    if max(block_shape) <= STRIDED_BLOCK_SIZE:
+        low = reduce_strided(data, block_shape, np.minimum)
+        if reduction == "min":
+            return low
+        high = reduce_strided(data, block_shape, np.maximum)
+    else:
+        blocks = data.reshape(out_rows, block_rows, out_cols, block_cols)
+        low = blocks.min(axis=(1, 3))
+        if reduction == "min":
+            return low
+        high = blocks.max(axis=(1, 3))
+    return np.where(np.abs(low) > np.abs(high), low, high)
+
+
+def block_extent(row_start, col_start, image_shape, factor):
+    return (col_start - 0.5, col_start + image_shape[1] * factor - 0.5,
+            row_start + image_shape[0] * factor - 0.5, row_start - 0.5)
+
+
+class HeatmapPyramid:
+    # Level k of the pyramid reduces 2^k x 2^k blocks of the error array.
+    # Only the overview level is kept, finer levels are produced for the
+    # visible region alone, read through region(row_slice, col_slice).
+    def __init__(self, shape, region, reduction="max-abs", overviews=None):
+        self.shape = tuple(shape)
+        self.region = region
+        self.reduction = reduction
+        self.overview_level = level_for(self.shape, HEATMAP_DOWNSAMPLE_SHAPE)
+        self.overviews = dict(overviews or {})
+
+    def reduce_region(self, row_start, row_stop, col_start, col_stop, factor, progress=None):
+        step = REGION_CHUNK_ELEMENTS // max(col_stop - col_start, 1)
+        step = max(factor, step - step % factor)
+        parts = []
+        for start in range(row_start, row_stop, step):
+            stop = min(start + step, row_stop)
+            parts.append(reduce_blocks(self.region(slice(start, stop), slice(col_start, col_stop)), (factor, factor), self.reduction))
+            if progress is not None:
+                progress(100 * (stop - row_start) // (row_stop - row_start))
+        return np.concatenate(parts, axis=0)
+
+    def overview(self, progress=None):
+        factor = 2 ** self.overview_level
+        if self.reduction not in self.overviews:
+            self.overviews[self.reduction] = self.reduce_region(0, self.shape[0], 0, self.shape[1], factor, progress)
+        image = self.overviews[self.reduction]
+        return image, block_extent(0, 0, image.shape, factor)
+
+    def view(self, xlim, ylim, screen_shape, progress=None):
+        rows, cols = self.shape
+        row_start = int(np.clip(np.floor(min(ylim) + 0.5), 0, rows))
+        row_stop = int(np.clip(np.ceil(max(ylim) + 0.5), 0, rows))
+        col_start = int(np.clip(np.floor(min(xlim) + 0.5), 0, cols))
+        col_stop = int(np.clip(np.ceil(max(xlim) + 0.5), 0, cols))
+        level = level_for((row_stop - row_start, col_stop - col_start), screen_shape)
+        if level >= self.overview_level or row_stop <= row_start or col_stop <= col_start:
+            return self.overview(progress)
+
+        # Align the region to the level's block grid so refined blocks line up
+        factor = 2 ** level
+        row_start -= row_start % factor
+        col_start -= col_start % factor
+        image = self.reduce_region(row_start, row_stop, col_start, col_stop, factor, progress)
+        return image, block_extent(row_start, col_start, image.shape, factor)
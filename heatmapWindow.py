@@ -1,44 +1,19 @@
-import mplcursors
+from collections import OrderedDict, namedtuple
 import matplotlib.pyplot as plt
-from PyQt6.QtWidgets import QGroupBox, QComboBox, QSizePolicy, QWidget, QCheckBox, QLabel, QFormLayout,  QVBoxLayout, QHBoxLayout, QPushButton, QMessageBox
+from PyQt6.QtCore import Qt, QThreadPool, QTimer
+from PyQt6.QtWidgets import QGroupBox, QComboBox, QSizePolicy, QWidget, QCheckBox, QLabel, QFormLayout,  QVBoxLayout, QHBoxLayout, QPushButton, QMessageBox, QProgressBar, QSpinBox, QTableWidget, QTableWidgetItem, QAbstractItemView, QTabWidget
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
-import torch
 import numpy as np
-from matplotlib.colors import LogNorm
+from matplotlib.colors import LogNorm, Normalize
 from matplotlib.figure import Figure
-
-class calculateDifference:
-    def __init__(self, tensor_a, tensor_b):
-        self.tensor_a = tensor_a
-        self.tensor_b = tensor_b
-    
-    def l1_loss(self):
-        l1_loss = torch.abs(self.tensor_a - self.tensor_b)
-        return l1_loss.numpy()
-    
-    def l2_loss(self):
-        l2_loss = torch.square(self.tensor_a - self.tensor_b)
-        return l2_loss.numpy()
-    
-    def relative_error(self):
-        relative_error = torch.abs(self.tensor_a - self.tensor_b) / torch.abs(self.tensor_a) * 100
-        return relative_error.numpy()
-    
-    def tensor_difference_dict(self):
-        tensor_diff = (self.tensor_a - self.tensor_b).numpy()
-        l1_loss = self.l1_loss()
-        l2_loss = self.l2_loss()
-        rel_error = self.relative_error()
-        
-        errors_dict = {
-            "Tensor Difference": tensor_diff,
-            "L1 Error": l1_loss,
-            "L2 Error": l2_loss,
-            "Relative Error": rel_error
-        }
-        
-        return errors_dict
+from backgroundJobs import JobRunner
+from canvasRedraw import RedrawEngine
+from heatmapDownsample import HeatmapPyramid, level_for, reduce_blocks
+from hoverAnnotation import HoverAnnotation
+from indexSelector import RESLICE_INTERVAL, IndexSelector
+from tensorDifference import SLICE_CACHE_BYTES, ArrayCache, as_float, calculateDifference
+from tensorStatistics import compute_statistics, percentile_accuracy
 
 
 class CustomNavigationToolbar(NavigationToolbar):
@@ -50,17 +25,197 @@ class CustomNavigationToolbar(NavigationToolbar):
         self.window.reset_graph()
         super().home()
 
+
+REDUCTION_NAMES = {"Max Abs": "max-abs", "Mean": "mean", "Min": "min"}
+
+TOP_ERRORS = 20
+MAX_TOP_ERRORS = 10000
+# Elements shown on each side of a worst element after jumping to it
+TOP_ERROR_VIEW = 32
+# The slice table lists this many slices, largest error first
+MAX_SLICE_ROWS = 10000
+# Slices on each side of the graphed one computed ahead along the last scrubbed dimension
+PREFETCH_DEPTH = 2
+# Prefetched slices may take this much of the slice cache, the rest keeps the visited ones
+PREFETCH_BYTES = SLICE_CACHE_BYTES // 2
+PLAYBACK_FPS = 30
+# Pre-rendered playback frames, their pixels and the images behind them
+PLAYBACK_CACHE_BYTES = 2 ** 28
+# Frames rendered ahead of the one shown
+PLAYBACK_AHEAD = 8
+
+
+def result_table(headers):
+    table = QTableWidget(0, len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+    table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+    table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+    table.verticalHeader().setVisible(False)
+    table.setSortingEnabled(True)
+    return table
+
+
+def fill_table(table, headers, rows, keys):
+    # Numbers are stored as numbers so the columns sort by value, keys[row]
+    # is kept on every item of its row
+    table.blockSignals(True)
+    table.setSortingEnabled(False)
+    table.clearContents()
+    table.setRowCount(len(rows))
+    table.setHorizontalHeaderLabels(headers)
+    for row, (values, key) in enumerate(zip(rows, keys)):
+        for column, value in enumerate(values):
+            item = QTableWidgetItem()
+            item.setData(Qt.ItemDataRole.DisplayRole, value)
+            item.setData(Qt.ItemDataRole.UserRole, key)
+            table.setItem(row, column, item)
+    table.setSortingEnabled(True)
+    table.sortItems(0, Qt.SortOrder.AscendingOrder)
+    table.blockSignals(False)
+
+
+class ViewportRefiner:
+    # Zooming or panning re-renders only the visible part of the heatmap at
+    # the pyramid level matching the axes size on screen. Limit changes are
+    # debounced and the reduction runs on the thread pool.
+    def __init__(self, redraw, interval=50):
+        self.redraw = redraw
+        self.jobs = JobRunner()
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.refine)
+        self.axes = None
+        self.image = None
+        self.pyramid = None
+
+    def attach(self, axes, image, pyramid):
+        self.jobs.cancel_all()
+        self.axes = axes
+        self.image = image
+        self.pyramid = pyramid
+        axes.callbacks.connect('xlim_changed', self.schedule)
+        axes.callbacks.connect('ylim_changed', self.schedule)
+
+    def detach(self):
+        self.timer.stop()
+        self.jobs.cancel_all()
+        self.axes = None
+        self.image = None
+        self.pyramid = None
+
+    def schedule(self, axes=None):
+        if self.pyramid is not None:
+            self.timer.start()
+
+    def refine(self):
+        if self.pyramid is None:
+            return
+        bbox = self.axes.get_window_extent()
+        screen_shape = (max(int(bbox.height), 1), max(int(bbox.width), 1))
+        self.jobs.submit("refine", self.pyramid.view, self.show_view, self.axes.get_xlim(), self.axes.get_ylim(), screen_shape)
+
+    def show_view(self, result):
+        image_data, extent = result
+        if self.image is None:
+            return
+        if self.image.get_array().shape == image_data.shape and tuple(self.image.get_extent()) == extent:
+            return
+        # The norm keeps the overview's limits so colours stay comparable
+        self.image.set_data(image_data)
+        self.image.set_extent(extent)
+        self.redraw.request_draw()
+
+
+class PlaybackFrame(namedtuple("PlaybackFrame", ["pixels", "opaque", "image", "extent"])):
+    # Sized like an array so frames share one ArrayCache budget
+    @property
+    def nbytes(self):
+        return self.pixels.nbytes + self.image.nbytes
+
+
+def render_pixels(image, extent, xlim, ylim, size, norm, cmap):
+    # Colours every pixel of the axes from a view image at or below screen
+    # resolution, nearest neighbour like the AxesImage. Rows go top down as
+    # in the Agg buffer, pixels outside the image are left transparent.
+    height, width = size
+    left, right, bottom, top = extent
+    x = xlim[0] + (np.arange(width) + 0.5) * (xlim[1] - xlim[0]) / width
+    y = ylim[1] + (np.arange(height) + 0.5) * (ylim[0] - ylim[1]) / height
+    cols = np.floor((x - left) / (right - left) * image.shape[1]).astype(np.intp)
+    rows = np.floor((y - top) / (bottom - top) * image.shape[0]).astype(np.intp)
+    valid_cols = (cols >= 0) & (cols < image.shape[1])
+    valid_rows = (rows >= 0) & (rows < image.shape[0])
+    pixels = cmap(norm(image[np.clip(rows, 0, image.shape[0] - 1)][:, np.clip(cols, 0, image.shape[1] - 1)]), bytes=True)
+    pixels[~np.outer(valid_rows, valid_cols), 3] = 0
+    return pixels
+
+
+def show_overview(figure, axes, heatmap, heatmap_data, extent, log_scale):
+    # The first heatmap of a figure creates the axes, image and colorbar, later
+    # ones are drawn into them in place and keep the chosen colormap
+    norm = LogNorm() if log_scale else Normalize()
+    if heatmap is None:
+        axes = figure.add_subplot(111)
+        heatmap = axes.imshow(heatmap_data, cmap='coolwarm', interpolation='nearest', aspect=1, norm=norm, extent=extent)
+        figure.colorbar(heatmap, ax=axes)
+        return axes, heatmap
+    # Markers belong to the previous heatmap
+    for line in list(axes.lines):
+        line.remove()
+    heatmap.set_data(heatmap_data)
+    heatmap.set_extent(extent)
+    # Scaled before the colorbar follows it through the image's callbacks
+    norm.autoscale_None(heatmap_data)
+    heatmap.set_norm(norm)
+    axes.set_xlim(extent[0], extent[1])
+    axes.set_ylim(extent[2], extent[3])
+    if figure.canvas.toolbar is not None:
+        # The views of the previous heatmap are no home to return to
+        figure.canvas.toolbar.update()
+    return axes, heatmap
+
+
+def error_region(tensor1, tensor2, text):
+    # Streaming pyramids recompute the metric for each visible region from the inputs
+    return lambda rows, cols: calculateDifference(tensor1[rows, cols], tensor2[rows, cols], max_cache_bytes=0).error(text)
+
+
+def heatmap_lookup(tensor1, tensor2, values_at):
+    # Image extents are in tensor coordinates at every pyramid level, so the
+    # pixel under the mouse is plain rounding and the values are read from
+    # the (possibly memory-mapped) inputs
+    rows, cols = tensor1.shape[:2]
+    def lookup(xdata, ydata):
+        x = int(np.floor(ydata + 0.5))
+        y = int(np.floor(xdata + 0.5))
+        if not (0 <= x < rows and 0 <= y < cols):
+            return None
+        values = values_at((x, y))
+        value_tensor_diff = values["Tensor Difference"]
+        value_l1 = values["L1 Error"]
+        value_l2 = values["L2 Error"]
+        value_relative = values["Relative Error"]
+        return (f"Tensor Location: ({x}, {y})\nTensor 1: {as_float(tensor1[x, y])}\nTensor 2: {as_float(tensor2[x, y])}\nTensor Difference: {value_tensor_diff:.20f}\nL1 Error: {value_l1:.20f}\nL2 Error: {value_l2:.20f}\nRelative Error: {value_relative:.20f}", (y, x))
+    return lookup
+
 class Heatmap2DimenWindow(QWidget):
-    def __init__(self, tensor1, tensor2):
+    def __init__(self, tensor1, tensor2, streaming=None, results=None):
         super().__init__()
         self.setWindowTitle("2D Heatmap Window")
         self.tensor1 = tensor1
         self.tensor2 = tensor2
         self.errors_dict = {}
+        self.exact_statistics = {}
         self.original_xlim = None
         self.original_ylim = None
         
-        self.errors_dict = calculateDifference(self.tensor1, self.tensor2).tensor_difference_dict()
+        self.difference = calculateDifference(self.tensor1, self.tensor2, results=results)
+        # Streaming keeps only a downsampled image and running statistics per metric
+        self.streaming = self.difference.should_stream() if streaming is None else streaming
+        if not self.streaming:
+            self.errors_dict = self.difference.tensor_difference_dict()
         self.figure = plt.figure(figsize=(10, 5))
         self.canvas = FigureCanvas(self.figure)
         
@@ -74,6 +229,10 @@ class Heatmap2DimenWindow(QWidget):
         self.scale_color_checkbox = QCheckBox('Scale Color')
         self.scale_color_checkbox.stateChanged.connect(self.scale_color)
         
+        self.reduction_dropdown = QComboBox(self)
+        self.reduction_dropdown.addItems(list(REDUCTION_NAMES))
+        self.reduction_dropdown.currentTextChanged.connect(self.change_reduction)
+        
         main_layout = QVBoxLayout(self)
         
         group_box = QGroupBox()
@@ -82,7 +241,15 @@ class Heatmap2DimenWindow(QWidget):
         left_layout.addRow(self.dropdown)
         left_layout.addRow(self.color_button)
         left_layout.addRow(self.scale_color_checkbox)
+        left_layout.addRow(QLabel("Downsampling:"), self.reduction_dropdown)
         
+        self.progress_bar = QProgressBar()
+        left_layout.addRow(self.progress_bar)
+        self.jobs = JobRunner(self.progress_bar)
+        self.redraw = RedrawEngine(self.canvas)
+        self.refiner = ViewportRefiner(self.redraw)
+        self.hover = HoverAnnotation(self.canvas, self.redraw)
+        self.canvas.mpl_connect('scroll_event', self.zoom_heatmap)
         
         self.mean_label = QLabel()
         self.median_label = QLabel()
@@ -117,6 +284,12 @@ class Heatmap2DimenWindow(QWidget):
         left_layout.addRow(QLabel("<b>Percentiles 75th: </b>"))
         left_layout.addRow(self.percentiles_label_75)
         
+        self.percentile_accuracy_label = QLabel()
+        left_layout.addRow(QLabel("<b>Percentiles: </b>"), self.percentile_accuracy_label)
+        self.exact_button = QPushButton("Exact Percentiles")
+        self.exact_button.clicked.connect(self.exact_percentiles)
+        left_layout.addRow(self.exact_button)
+        
         
         right_layout = QVBoxLayout()
         self.toolbar = CustomNavigationToolbar(self.canvas, self)
@@ -128,6 +301,7 @@ class Heatmap2DimenWindow(QWidget):
         main_layout.addWidget(group_box)
         
         self.axes = None
+        self.heatmap = None
         self.draw_heatmap(self.dropdown.currentText())
         self.showMaximized()
     
@@ -135,36 +309,64 @@ class Heatmap2DimenWindow(QWidget):
         if self.scale_color_checkbox.isChecked:
             self.draw_heatmap(self.dropdown.currentText())
     
-    def update_statistics(self, data_tensor):
-        mean_value = np.mean(data_tensor)
-        median_value = np.median(data_tensor)
-        max_value = np.max(data_tensor)
-        min_value = np.min(data_tensor)
-        std_deviation = np.std(data_tensor)
-        percentiles_25 = np.percentile(data_tensor, 25)
-        percentiles_50 = np.percentile(data_tensor, 50)
-        percentiles_75 = np.percentile(data_tensor, 75)
-        
-        self.mean_label.setText(f"{mean_value:.10e}")
-        self.median_label.setText(f"{median_value:.10e}")
-        self.max_label.setText(f"{max_value:.10e}")
-        self.min_label.setText(f"{min_value:.10e}")
-        self.std_label.setText(f"{std_deviation:.10e}")
-        self.percentiles_label_25.setText(f"{percentiles_25:.10e}")
-        self.percentiles_label_50.setText(f"{percentiles_50:.10e}")
-        self.percentiles_label_75.setText(f"{percentiles_75:.10e}")
+    def change_reduction(self):
+        self.draw_heatmap(self.dropdown.currentText())
+    
+    def set_statistics(self, statistics):
+        self.mean_label.setText(f"{statistics.mean:.10e}")
+        self.median_label.setText(f"{statistics.median:.10e}")
+        self.max_label.setText(f"{statistics.max:.10e}")
+        self.min_label.setText(f"{statistics.min:.10e}")
+        self.std_label.setText(f"{statistics.std:.10e}")
+        self.percentiles_label_25.setText(f"{statistics.percentiles_25:.10e}")
+        self.percentiles_label_50.setText(f"{statistics.percentiles_50:.10e}")
+        self.percentiles_label_75.setText(f"{statistics.percentiles_75:.10e}")
+        self.percentile_accuracy_label.setText(percentile_accuracy(statistics))
+    
+    def exact_percentiles(self):
+        self.jobs.submit("statistics", self.compute_exact_statistics, self.exact_statistics_ready, self.dropdown.currentText())
+    
+    def compute_exact_statistics(self, text, progress):
+        if self.streaming:
+            return text, self.difference.exact_statistics(text, progress=progress)
+        if text not in self.exact_statistics:
+            statistics = compute_statistics(self.errors_dict[text], exact=True)
+            self.exact_statistics[text] = self.difference.store_result(("statistics", text), statistics)
+        return text, self.exact_statistics[text]
+    
+    def exact_statistics_ready(self, result):
+        text, statistics = result
+        if text == self.dropdown.currentText():
+            self.set_statistics(statistics)
 
     def draw_heatmap(self, text):
-        self.figure.clear()
-        self.axes = self.figure.add_subplot(111)
+        reduction = REDUCTION_NAMES[self.reduction_dropdown.currentText()]
+        self.jobs.submit("heatmap", self.compute_heatmap, self.show_heatmap, text, reduction)
+    
+    def compute_heatmap(self, text, reduction, progress):
+        # Runs on the thread pool, only touches data and never widgets
+        if self.streaming:
+            streamed = self.difference.streamed_errors(text, progress=progress)
+            pyramid = HeatmapPyramid(self.tensor1.shape, error_region(self.tensor1, self.tensor2, text), reduction, streamed.heatmaps)
+            statistics = streamed.statistics
+        else:
+            # Statistics first, a fused sweep for them also leaves the metric array behind
+            statistics = self.exact_statistics.get(text) or self.difference.cached(("statistics", text), lambda: self.difference.error_statistics(text))
+            progress(25)
+            data = self.errors_dict[text]
+            pyramid = HeatmapPyramid(data.shape, lambda rows, cols: data[rows, cols], reduction)
+            pyramid.overviews[reduction] = self.difference.cached(("heatmap", text, reduction), lambda: pyramid.overview()[0])
+        heatmap_data, extent = pyramid.overview()
+        return pyramid, heatmap_data, extent, statistics
+    
+    def show_heatmap(self, result):
+        pyramid, heatmap_data, extent, statistics = result
+        self.refiner.detach()
+        self.hover.detach()
         try:
-            heatmap_data = self.errors_dict[text]
-            self.update_statistics(heatmap_data)
+            self.set_statistics(statistics)
             if heatmap_data.shape[0] > 0 and heatmap_data.shape[1] > 0:
-                if self.scale_color_checkbox.isChecked():
-                    self.heatmap = self.axes.imshow(heatmap_data, cmap='coolwarm', interpolation='nearest', aspect=1, norm=LogNorm())
-                else:
-                    self.heatmap = self.axes.imshow(heatmap_data, cmap='coolwarm', interpolation='nearest', aspect=1)
+                self.axes, self.heatmap = show_overview(self.figure, self.axes, self.heatmap, heatmap_data, extent, self.scale_color_checkbox.isChecked())
                 # Store the original heatmap data's range
                 if self.original_xlim is None:
                     self.original_xlim = self.axes.get_xlim()
@@ -176,40 +378,28 @@ class Heatmap2DimenWindow(QWidget):
             print("Error creating heatmap:", e)
             return
         
-        # Create the mplcursors cursor
-        cursor = mplcursors.cursor(hover=True)
-        
-        # Define the annotation function
-        @cursor.connect("add")
-        def on_hover(sel):
-            x, y = sel.index
-            value_tensor_diff = self.errors_dict["Tensor Difference"][x, y]
-            value_l1 = self.errors_dict["L1 Error"][x, y]
-            value_l2 = self.errors_dict["L2 Error"][x, y]
-            value_relative = self.errors_dict["Relative Error"][x, y]
-            sel.annotation.set_text(f"Tensor Location: ({int(x)}, {int(y)})\nTensor 1: {self.tensor1[x, y]}\nTensor 2: {self.tensor2[x, y]}\nTensor Difference: {value_tensor_diff:.20f}\nL1 Error: {value_l1:.20f}\nL2 Error: {value_l2:.20f}\nRelative Error: {value_relative:.20f}")
-        
-        self.figure.colorbar(self.heatmap)
-        
-        self.canvas.mpl_connect('scroll_event', self.zoom_heatmap)
-        
-        self.canvas.draw()
+        self.hover.attach(self.axes, heatmap_lookup(self.tensor1, self.tensor2, self.difference.values_at))
+        self.refiner.attach(self.axes, self.heatmap, pyramid)
+        self.redraw.request_draw()
     
     def reset_graph(self):
-        self.figure.clear()
+        self.refiner.detach()
+        self.hover.detach()
         self.draw_heatmap(self.dropdown.currentText())  # Call draw_heatmap with the current selected text
     
     def change_color(self):
-        # Update the colormap of the heatmap
+        # Update the colormap of the heatmap, the colorbar follows it
         try:
             colormap = 'hot' if self.heatmap.get_cmap().name == 'coolwarm' else 'coolwarm'
             self.heatmap.set_cmap(colormap)
-            self.canvas.draw()
+            self.redraw.request_draw()
         except Exception as e:
             QMessageBox.critical(self, "Error: Not able to change color: ", str(e))
             return
     
     def zoom_heatmap(self, event):
+        if self.heatmap is None or event.inaxes is not self.axes:
+            return
         # Get the current x and y limits of the heatmap
         xlim = self.axes.get_xlim()
         ylim = self.axes.get_ylim()
@@ -230,8 +420,8 @@ class Heatmap2DimenWindow(QWidget):
             self.axes.set_xlim((new_xlim[0], new_xlim[1]))
             self.axes.set_ylim((new_ylim[0], new_ylim[1]))
             
-            # Redraw the heatmap
-            self.canvas.draw()
+            # The last drawn pixels stand in until a burst of scrolls ends in one redraw
+            self.redraw.preview_zoom(self.axes)
 
 
 class Canvas(FigureCanvas):
@@ -244,29 +434,122 @@ class Canvas(FigureCanvas):
         self.original_xlim = None
         self.original_ylim = None
         self.scale_color = False
+        self.reduction = "max-abs"
+        self.pyramid = None
+        self.pyramid_source = None
+        self.redraw = RedrawEngine(self)
+        self.refiner = ViewportRefiner(self.redraw)
+        self.hover = HoverAnnotation(self, self.redraw)
+        self.mpl_connect('scroll_event', self.zoom_heatmap)
+        # While playing, everything but the heatmap is saved and frames are blitted over it
+        self.playing = False
+        self.background = None
+        self.frame = None
+        self.mpl_connect('draw_event', self.save_background)
     
     def change_color_scale(self, value):
         self.scale_color = value
     
+    def change_reduction(self, reduction):
+        self.reduction = reduction
+    
     def clear_canvas(self):
+        self.refiner.detach()
+        self.hover.detach()
         self.figure.clear()
         self.heatmap = None
+        self.playing = False
+        self.background = None
+        self.frame = None
+        self.draw()
+    
+    def start_playback(self):
+        # The heatmap is left out of full draws from now on, frames are
+        # rendered to the axes' pixels ahead of time and copied over the
+        # saved background, so showing one never resamples or redraws
+        self.refiner.detach()
+        self.hover.detach()
+        self.heatmap.set_animated(True)
+        # Frame extents follow the view, they must not move the limits
+        self.axes.set_autoscale_on(False)
+        self.playing = True
+        self.frame = None
         self.draw()
     
+    def frame_view(self):
+        # Data limits of the whole pixels the axes cover, which frames are rendered for
+        bbox = self.axes.bbox
+        left, bottom = round(bbox.x0), round(bbox.y0)
+        width, height = max(round(bbox.width), 1), max(round(bbox.height), 1)
+        (x0, y0), (x1, y1) = self.axes.transData.inverted().transform([(left, bottom), (left + width, bottom + height)])
+        return (x0, x1), (y0, y1), (height, width)
+    
+    def save_background(self, event):
+        # Also after zooming, resizing or a colour change, which redraw the figure
+        if self.playing and self.heatmap is not None:
+            self.background = self.copy_from_bbox(self.axes.bbox)
+            self.blit_frame()
+    
+    def show_frame(self, frame):
+        if self.background is None or self.heatmap is None:
+            return
+        # The AxesImage holds the frame too, the norm keeps the limits the colorbar shows
+        self.heatmap.set_data(frame.image)
+        self.heatmap.set_extent(frame.extent)
+        self.frame = frame
+        self.blit_frame()
+    
+    def blit_frame(self):
+        self.restore_region(self.background)
+        if self.frame is not None:
+            # Frames match the axes pixel for pixel, so they are copied into
+            # the Agg buffer as they are instead of being drawn as an image
+            buffer = np.asarray(self.get_renderer().buffer_rgba())
+            pixels = self.frame.pixels
+            top = buffer.shape[0] - round(self.axes.bbox.y0) - pixels.shape[0]
+            left = round(self.axes.bbox.x0)
+            target = buffer[top:top + pixels.shape[0], left:left + pixels.shape[1]]
+            pixels = pixels[:target.shape[0], :target.shape[1]]
+            if self.frame.opaque:
+                np.copyto(target, pixels)
+            else:
+                # Whole RGBA pixels at a time, the background shows where the image ends
+                np.copyto(target.view(np.uint32)[..., 0], pixels.view(np.uint32)[..., 0], where=pixels[..., 3] > 0)
+        self.blit(self.axes.bbox)
+    
+    def stop_playback(self):
+        self.playing = False
+        self.background = None
+        self.frame = None
+        if self.heatmap is not None:
+            self.heatmap.set_animated(False)
+    
     def get_figure(self):
         return self.figure
     
-    def draw_heatmap(self, text, errors_dict, tensor1, tensor2):
-        self.clear_canvas()
-        self.axes = self.figure.add_subplot(111)
-        
+    def build_pyramid(self, text, errors_dict, reduction=None):
+        data = errors_dict[text]
+        pyramid = HeatmapPyramid(data.shape, lambda rows, cols: data[rows, cols], reduction or self.reduction)
+        pyramid.overviews[pyramid.reduction] = errors_dict.cached(("heatmap", text, pyramid.reduction), lambda: pyramid.overview()[0])
+        return pyramid
+    
+    def draw_heatmap(self, text, errors_dict, tensor1, tensor2, pyramid=None):
+        self.refiner.detach()
+        self.hover.detach()
         try:
-            heatmap_data = errors_dict[text]
+            # The errors dict itself is kept, the id of a collected one is reused by new slices
+            if pyramid is None and self.pyramid_source is not None and self.pyramid_source[0] == text and self.pyramid_source[1] is errors_dict:
+                pyramid = self.pyramid
+            if pyramid is None or pyramid.reduction != self.reduction:
+                pyramid = self.build_pyramid(text, errors_dict)
+            self.pyramid = pyramid
+            self.pyramid_source = (text, errors_dict)
+            heatmap_data, extent = pyramid.overview()
             if heatmap_data.shape[0] > 0 and heatmap_data.shape[1] > 0:
-                if self.scale_color:
-                    self.heatmap = self.axes.imshow(heatmap_data, cmap='coolwarm', interpolation='nearest', aspect=1, norm=LogNorm())
-                else:
-                    self.heatmap = self.axes.imshow(heatmap_data, cmap='coolwarm', interpolation='nearest', aspect=1)
+                if self.heatmap is None:
+                    # Only the first heatmap after a clear starts from an empty figure
+                    self.figure.clear()
+                self.axes, self.heatmap = show_overview(self.figure, self.axes, self.heatmap, heatmap_data, extent, self.scale_color)
                 
                 # Store the original heatmap data's range
                 if self.original_xlim is None:
@@ -281,31 +564,31 @@ class Canvas(FigureCanvas):
             print("Error creating heatmap:", e)
             return
         
-        cursor = mplcursors.cursor(self.heatmap, hover=True)
-        
-        @cursor.connect("add")
-        def on_hover(sel):
-            x, y = sel.index
-            value_tensor_diff = errors_dict["Tensor Difference"][x, y]
-            value_l1 = errors_dict["L1 Error"][x, y]
-            value_l2 = errors_dict["L2 Error"][x, y]
-            value_relative = errors_dict["Relative Error"][x, y]
-            sel.annotation.set_text(f"Tensor Location: ({int(x)}, {int(y)})\nTensor 1: {tensor1[x, y]}\nTensor 2: {tensor2[x, y]}\nTensor Difference: {value_tensor_diff:.20f}\nL1 Error: {value_l1:.20f}\nL2 Error: {value_l2:.20f}\nRelative Error: {value_relative:.20f}")
-        
-        self.figure.colorbar(self.heatmap, ax=self.axes)
-        self.mpl_connect('scroll_event', self.zoom_heatmap)
-        self.draw()
+        self.hover.attach(self.axes, heatmap_lookup(tensor1, tensor2, errors_dict.values_at))
+        self.refiner.attach(self.axes, self.heatmap, pyramid)
+        self.redraw.request_draw()
     
     def change_color(self):
         try:
             colormap = 'hot' if self.heatmap.get_cmap().name == 'coolwarm' else 'coolwarm'
             self.heatmap.set_cmap(colormap)
-            self.draw()
+            self.redraw.request_draw()
         except Exception as e:
             QMessageBox.critical(self, "Error: Not able to change color: ", str(e))
             return
     
+    def centre_on(self, row, col, half_span=TOP_ERROR_VIEW):
+        # Marks the element and zooms to it, the refiner then renders the view at full detail
+        if self.heatmap is None:
+            return
+        self.axes.plot(col, row, marker='s', markersize=12, markerfacecolor='none', markeredgecolor='black')
+        self.axes.set_xlim(col - half_span - 0.5, col + half_span + 0.5)
+        self.axes.set_ylim(row + half_span + 0.5, row - half_span - 0.5)
+        self.redraw.request_draw()
+    
     def zoom_heatmap(self, event):
+        if self.heatmap is None or event.inaxes is not self.axes:
+            return
         xlim = self.axes.get_xlim()
         ylim = self.axes.get_ylim()
         
@@ -323,22 +606,59 @@ class Canvas(FigureCanvas):
             self.axes.set_xlim(new_xlim)
             self.axes.set_ylim(new_ylim)
             
-            self.draw()
+            if self.playing:
+                # Frames are blitted over the redraw, there is no still image to rescale
+                self.redraw.request_draw()
+            else:
+                self.redraw.preview_zoom(self.axes)
 
 
 class HeatmapMultiDimenWindow(QWidget):
-    def __init__(self, tensor1, tensor2):
+    def __init__(self, tensor1, tensor2, results=None):
         super().__init__()
         self.setWindowTitle("Multidimensional Heatmap Window")
         self.tensor1 = tensor1
         self.tensor2 = tensor2
+        self.results = results
         self.errors_dict = {}
         self.tensor1_2d = None
         self.tensor2_2d = None
+        # Metric arrays of recent slices, so going back to one never recomputes it
+        self.slice_errors = ArrayCache(SLICE_CACHE_BYTES)
+        self.slice_key = None
+        # The full N-D difference, only used to search for the worst elements
+        self.difference = calculateDifference(tensor1, tensor2, results=results)
+        self.top_errors_metric = None
+        self.slice_summary_source = None
+        # Slice position of the element to centre on once its slice is drawn
+        self.focus = None
+        # Neighbours of the graphed slice are computed on a thread of their own,
+        # so they never hold up the slice the user asked for
+        self.prefetch_pool = QThreadPool()
+        self.prefetch_pool.setMaxThreadCount(1)
+        self.prefetch_jobs = JobRunner(pool=self.prefetch_pool)
+        self.prefetched = OrderedDict()
+        self.prefetch_keys = set()
+        # The prefetch job of the slice being opened, graphed when it finishes
+        self.awaited_prefetch = None
+        self.scrubbed_dimension = None
+        # Playback steps one fixed dimension through overview frames rendered ahead
+        self.frames = ArrayCache(PLAYBACK_CACHE_BYTES)
+        self.frame_jobs = JobRunner()
+        self.playback = None
+        self.playback_index = None
+        self.playback_norm = None
+        self.playback_timer = QTimer()
+        self.playback_timer.setInterval(1000 // PLAYBACK_FPS)
+        self.playback_timer.timeout.connect(self.next_frame)
         
         self.checkboxes = []
         self.dropdowns = []
         self.selected_checkboxes = []
+        self.reslice_timer = QTimer()
+        self.reslice_timer.setSingleShot(True)
+        self.reslice_timer.setInterval(RESLICE_INTERVAL)
+        self.reslice_timer.timeout.connect(self.reslice)
         
         main_layout = QVBoxLayout(self)
         group_box = QGroupBox("Please select two dimensions to graph and fix the rest dimensions.")
@@ -358,6 +678,14 @@ class HeatmapMultiDimenWindow(QWidget):
         self.scale_color_checkbox = QCheckBox('Scale Color')
         select_dimen_layout.addRow(self.scale_color_checkbox)
         
+        self.reduction_dropdown = QComboBox(self)
+        self.reduction_dropdown.addItems(list(REDUCTION_NAMES))
+        select_dimen_layout.addRow(QLabel("Downsampling:"), self.reduction_dropdown)
+        
+        self.progress_bar = QProgressBar()
+        select_dimen_layout.addRow(self.progress_bar)
+        self.jobs = JobRunner(self.progress_bar)
+        
         self.mean_label = QLabel()
         self.median_label = QLabel()
         self.max_label = QLabel()
@@ -391,6 +719,33 @@ class HeatmapMultiDimenWindow(QWidget):
         select_dimen_layout.addRow(QLabel("<b>Percentiles 75th: </b>"))
         select_dimen_layout.addRow(self.percentiles_label_75)
         
+        self.percentile_accuracy_label = QLabel()
+        select_dimen_layout.addRow(QLabel("<b>Percentiles: </b>"), self.percentile_accuracy_label)
+        self.exact_button = QPushButton("Exact Percentiles")
+        select_dimen_layout.addRow(self.exact_button)
+        
+        self.result_tabs = QTabWidget()
+        top_errors_tab = QWidget()
+        top_errors_layout = QFormLayout(top_errors_tab)
+        self.top_errors_spinbox = QSpinBox()
+        self.top_errors_spinbox.setRange(1, MAX_TOP_ERRORS)
+        self.top_errors_spinbox.setValue(TOP_ERRORS)
+        self.top_errors_button = QPushButton("Find Worst Elements")
+        top_errors_layout.addRow(self.top_errors_spinbox, self.top_errors_button)
+        self.top_errors_table = result_table(["Rank", "Location", "Tensor 1", "Tensor 2", "Error"])
+        top_errors_layout.addRow(self.top_errors_table)
+        self.result_tabs.addTab(top_errors_tab, "Worst Elements")
+        
+        slices_tab = QWidget()
+        slices_layout = QFormLayout(slices_tab)
+        self.slice_summary_button = QPushButton("Summarize Slices")
+        self.slice_summary_label = QLabel()
+        slices_layout.addRow(self.slice_summary_button, self.slice_summary_label)
+        self.slice_summary_table = result_table(["Rank", "Fixed Indices", "Max |Error|", "Mean", "RMS"])
+        slices_layout.addRow(self.slice_summary_table)
+        self.result_tabs.addTab(slices_tab, "Slices")
+        select_dimen_layout.addRow(self.result_tabs)
+        
         
         self.toolbar = CustomNavigationToolbar(self.canvas, self)
         
@@ -400,37 +755,339 @@ class HeatmapMultiDimenWindow(QWidget):
         canvas_layout.addWidget(self.canvas)
         group_box_layout.addLayout(canvas_layout)
         
-        self.dropdown.currentTextChanged.connect(lambda text: self.canvas.draw_heatmap(text, self.errors_dict, self.tensor1_2d, self.tensor2_2d))
-        self.dropdown.currentTextChanged.connect(lambda text: self.update_statistics(text))
+        self.dropdown.currentTextChanged.connect(self.show_metric)
         self.color_button.clicked.connect(self.canvas.change_color)
         self.scale_color_checkbox.stateChanged.connect(self.change_color_scale)
+        self.reduction_dropdown.currentTextChanged.connect(self.change_reduction)
+        self.exact_button.clicked.connect(self.exact_percentiles)
+        self.top_errors_button.clicked.connect(self.find_top_errors)
+        self.top_errors_table.itemSelectionChanged.connect(self.jump_to_top_error)
+        self.slice_summary_button.clicked.connect(self.summarize_slices)
+        self.slice_summary_table.itemSelectionChanged.connect(self.open_summarized_slice)
         
         main_layout.addWidget(group_box)
         self.showMaximized()
     
-    def update_statistics(self, text):
+    def show_metric(self, text):
+        if self.playback is not None:
+            # Stopping graphs the slice playback is on, with the new metric or reduction
+            self.play_button.setChecked(False)
+            return
+        self.awaited_prefetch = None
+        self.jobs.submit("metric", self.compute_metric, self.metric_ready, self.errors_dict, text, self.canvas.reduction,
+                         on_failed=lambda message: self.clean_labels())
+    
+    def compute_metric(self, errors_dict, text, reduction, progress):
+        # Runs on the thread pool: fills the metric cache, the overview image and the statistics
+        statistics = errors_dict.cached(("statistics", text), lambda: errors_dict.error_statistics(text))
+        progress(25)
+        pyramid = self.canvas.build_pyramid(text, errors_dict, reduction)
+        progress(50)
+        return errors_dict, text, pyramid, statistics
+    
+    def metric_ready(self, result):
+        errors_dict, text, pyramid, statistics = result
+        self.canvas.draw_heatmap(text, errors_dict, self.tensor1_2d, self.tensor2_2d, pyramid)
+        self.set_statistics(statistics)
+        if self.focus is not None:
+            self.canvas.centre_on(*self.focus)
+            self.focus = None
+        self.prefetch_neighbours(text)
+    
+    def prefetch_neighbours(self, text):
+        # Starts on the slices next to the graphed one along the dimension scrubbed
+        # last, nearest first and only as many as fit in PREFETCH_BYTES
+        if self.slice_key is None:
+            self.prefetch_jobs.cancel_all()
+            return
+        _, selected, fixed = self.slice_key
+        fixed = dict(fixed)
+        dimension = self.scrubbed_dimension if self.scrubbed_dimension in fixed else next(iter(fixed), None)
+        if dimension is None:
+            self.prefetch_jobs.cancel_all()
+            return
+        slice_bytes = max(self.tensor1_2d.size * self.difference.dtype.itemsize, 1)
+        indices = []
+        for step in range(1, PREFETCH_DEPTH + 1):
+            for index in (fixed[dimension] + step, fixed[dimension] - step):
+                if 0 <= index < self.tensor1.shape[dimension]:
+                    indices.append(index)
+        indices = indices[:PREFETCH_BYTES // slice_bytes]
+        
+        reduction = self.canvas.reduction
+        keys = []
+        for index in indices:
+            fixed[dimension] = index
+            keys.append(("slice", selected, tuple(sorted(fixed.items()))))
+        self.prefetch_keys = set(keys)
+        # Slices that are no longer next to the graphed one are let go
+        for slice_key in list(self.prefetched):
+            if slice_key not in self.prefetch_keys or self.prefetched[slice_key][1:3] != (text, reduction):
+                del self.prefetched[slice_key]
+        # Running jobs of slices still wanted carry on, the rest are cancelled
+        names = {("prefetch", slice_key, text, reduction): slice_key for slice_key in keys if slice_key not in self.prefetched}
+        for name in list(self.prefetch_jobs.jobs):
+            if name not in names:
+                self.prefetch_jobs.cancel(name)
+        for name, slice_key in names.items():
+            if name not in self.prefetch_jobs.jobs:
+                self.prefetch_jobs.submit(name, self.prefetch_slice, self.prefetch_ready, slice_key, text, reduction,
+                                          on_failed=lambda message, name=name: self.prefetch_failed(name, message))
+    
+    def prefetch_slice(self, slice_key, text, reduction, progress):
+        # Runs on the prefetch thread: what compute_metric would give for the
+        # slice, but only the overview is kept. The metric array stays in the
+        # shared slice cache, which alone bounds the memory of prefetching.
+        _, selected, fixed = slice_key
+        errors_dict = self.slice_difference(slice_key, *self.slice_views(selected, dict(fixed)))
+        statistics = errors_dict.cached(("statistics", text), lambda: errors_dict.error_statistics(text))
+        progress(50)
+        overview = self.canvas.build_pyramid(text, errors_dict, reduction).overview()[0]
+        return slice_key, (errors_dict, text, reduction, overview, statistics)
+    
+    def prefetch_ready(self, result):
+        slice_key, entry = result
+        if ("prefetch", slice_key) + entry[1:3] == self.awaited_prefetch:
+            self.awaited_prefetch = None
+            if slice_key == self.slice_key:
+                self.open_prefetched(entry)
+                return
+        if slice_key in self.prefetch_keys:
+            self.prefetched[slice_key] = entry
+    
+    def prefetch_failed(self, name, message):
+        if name == self.awaited_prefetch:
+            # Computed again on the main pool, which reports what goes wrong
+            self.show_metric(name[2])
+        else:
+            print(f"Error computing {name}:", message)
+    
+    def open_prefetched(self, entry):
+        # The pyramid reads the metric array again, from the slice cache if
+        # it is still there, only once the view is refined
+        errors_dict, text, reduction, overview, statistics = entry
+        errors = []
+        def region(rows, cols):
+            if not errors:
+                errors.append(errors_dict[text])
+            return errors[0][rows, cols]
+        pyramid = HeatmapPyramid(self.tensor1_2d.shape, region, reduction, {reduction: overview})
+        self.errors_dict = errors_dict
+        self.jobs.cancel("metric")
+        self.metric_ready((errors_dict, text, pyramid, statistics))
+    
+    def play_toggled(self, checked):
+        if checked:
+            self.start_playback()
+        else:
+            self.stop_playback()
+            # The slice playback stopped on is graphed in full, with hover and zoom
+            self.graph_button_clicked()
+    
+    def start_playback(self):
+        # Plays the dimension scrubbed last, or the first fixed one
+        dimension = None
+        if self.slice_key is not None and self.canvas.heatmap is not None:
+            fixed = dict(self.slice_key[2])
+            dimension = self.scrubbed_dimension if self.scrubbed_dimension in fixed else next(iter(fixed), None)
+        if dimension is None:
+            QMessageBox.warning(self, "Play", "Please graph a slice with a fixed dimension first.")
+            self.release_play_button()
+            return
+        self.prefetch_jobs.cancel_all()
+        self.playback = (self.slice_key[1], fixed, dimension, self.dropdown.currentText(), self.canvas.reduction)
+        self.playback_index = fixed[dimension]
+        self.playback_norm = self.canvas.heatmap.norm
+        self.play_button.setText("Pause")
+        self.canvas.start_playback()
+        self.render_frames()
+        self.playback_timer.start()
+    
+    def stop_playback(self):
+        if self.playback is None:
+            return
+        self.playback_timer.stop()
+        self.frame_jobs.cancel_all()
+        self.playback = None
+        self.canvas.stop_playback()
+        self.release_play_button()
+    
+    def release_play_button(self):
+        self.play_button.blockSignals(True)
+        self.play_button.setChecked(False)
+        self.play_button.blockSignals(False)
+        self.play_button.setText("Play")
+    
+    def frame_key(self, index):
+        # Frames are pixels, so they depend on the view and colormap as well as the slice
+        selected, fixed, dimension, text, reduction = self.playback
+        fixed = dict(fixed)
+        fixed[dimension] = index
+        slice_key = ("slice", selected, tuple(sorted(fixed.items())))
+        return slice_key, text, reduction, self.canvas.frame_view(), self.canvas.heatmap.get_cmap().name
+    
+    def next_frame(self):
+        dimension = self.playback[2]
+        index = (self.playback_index + 1) % self.tensor1.shape[dimension]
+        frame = self.frames.get(self.frame_key(index))
+        if frame is None:
+            # Not rendered yet, the current frame stays up a little longer
+            self.render_frames()
+            return
+        self.playback_index = index
+        self.canvas.show_frame(frame)
+        dropdown = self.dropdowns[dimension]
+        dropdown.blockSignals(True)
+        dropdown.setCurrentIndex(index)
+        dropdown.blockSignals(False)
+        self.render_frames()
+    
+    def render_frames(self):
+        # Keeps the next PLAYBACK_AHEAD frames rendered or rendering
+        size = self.tensor1.shape[self.playback[2]]
+        for step in range(1, min(PLAYBACK_AHEAD, size - 1) + 1):
+            key = self.frame_key((self.playback_index + step) % size)
+            if key not in self.frames and ("frame", key) not in self.frame_jobs.jobs:
+                self.frame_jobs.submit(("frame", key), self.render_frame, self.frame_ready, key,
+                                       self.playback_norm, self.canvas.heatmap.get_cmap())
+    
+    def render_frame(self, key, norm, cmap, progress):
+        # Runs on the thread pool: the slice reduced to the view like the
+        # refiner would, then coloured pixel for pixel
+        slice_key, text, reduction, (xlim, ylim, size), _ = key
+        _, selected, fixed = slice_key
+        tensor1_2d, tensor2_2d = self.slice_views(selected, dict(fixed))
+        difference = calculateDifference(tensor1_2d, tensor2_2d, max_cache_bytes=0,
+                                         results=None if self.results is None else self.results.child(slice_key))
+        errors = []
+        def region(rows, cols):
+            # A slice graphed or prefetched before still has its metric array
+            if not errors:
+                data = self.slice_errors.get((slice_key, text))
+                errors.append(difference.error(text) if data is None else data)
+            return errors[0][rows, cols]
+        pyramid = HeatmapPyramid(tensor1_2d.shape, region, reduction)
+        pyramid.overviews[reduction] = difference.cached(("heatmap", text, reduction), lambda: pyramid.overview()[0])
+        image, extent = pyramid.view(xlim, ylim, size)
+        factor = 2 ** level_for(image.shape, size)
+        if factor > 1:
+            # The overview can still be finer than the axes, every pixel then keeps its block's extreme
+            left, right, bottom, top = extent
+            rows, cols = image.shape
+            image = reduce_blocks(image, (factor, factor), reduction)
+            extent = (left, left + (right - left) * image.shape[1] * factor / cols,
+                      top + (bottom - top) * image.shape[0] * factor / rows, top)
+        pixels = render_pixels(image, extent, xlim, ylim, size, norm, cmap)
+        return key, PlaybackFrame(pixels, bool(pixels[..., 3].all()), image, extent)
+    
+    def frame_ready(self, result):
+        key, frame = result
+        self.frames.put(key, frame)
+    
+    def set_statistics(self, statistics):
         try:
-            data_tensor = self.errors_dict[text]
-            mean_value = np.mean(data_tensor)
-            median_value = np.median(data_tensor)
-            max_value = np.max(data_tensor)
-            min_value = np.min(data_tensor)
-            std_deviation = np.std(data_tensor)
-            percentiles_25 = np.percentile(data_tensor, 25)
-            percentiles_50 = np.percentile(data_tensor, 50)
-            percentiles_75 = np.percentile(data_tensor, 75)
-            
-            self.mean_label.setText(f"{mean_value:.10e}")
-            self.median_label.setText(f"{median_value:.10e}")
-            self.max_label.setText(f"{max_value:.10e}")
-            self.min_label.setText(f"{min_value:.10e}")
-            self.std_label.setText(f"{std_deviation:.10e}")
-            self.percentiles_label_25.setText(f"{percentiles_25:.10e}")
-            self.percentiles_label_50.setText(f"{percentiles_50:.10e}")
-            self.percentiles_label_75.setText(f"{percentiles_75:.10e}")
+            self.mean_label.setText(f"{statistics.mean:.10e}")
+            self.median_label.setText(f"{statistics.median:.10e}")
+            self.max_label.setText(f"{statistics.max:.10e}")
+            self.min_label.setText(f"{statistics.min:.10e}")
+            self.std_label.setText(f"{statistics.std:.10e}")
+            self.percentiles_label_25.setText(f"{statistics.percentiles_25:.10e}")
+            self.percentiles_label_50.setText(f"{statistics.percentiles_50:.10e}")
+            self.percentiles_label_75.setText(f"{statistics.percentiles_75:.10e}")
+            self.percentile_accuracy_label.setText(percentile_accuracy(statistics))
         except:
             self.clean_labels()
     
+    def exact_percentiles(self):
+        if len(self.errors_dict) > 0:
+            self.jobs.submit("statistics", self.compute_exact_statistics, self.exact_statistics_ready, self.errors_dict, self.dropdown.currentText())
+    
+    def compute_exact_statistics(self, errors_dict, text, progress):
+        return errors_dict, text, errors_dict.store_result(("statistics", text), compute_statistics(errors_dict[text], exact=True))
+    
+    def exact_statistics_ready(self, result):
+        errors_dict, text, statistics = result
+        if errors_dict is self.errors_dict and text == self.dropdown.currentText():
+            self.set_statistics(statistics)
+    
+    def find_top_errors(self):
+        self.jobs.submit("top errors", self.compute_top_errors, self.show_top_errors, self.dropdown.currentText(), self.top_errors_spinbox.value())
+    
+    def compute_top_errors(self, text, k, progress):
+        # Runs on the thread pool over the whole tensor, before any slicing
+        top = self.difference.cached(("top", text, k), lambda: self.difference.top_errors(text, k, progress=progress))
+        rows = []
+        for index in map(tuple, top.indices.tolist()):
+            rows.append((index, float(as_float(self.tensor1[index])), float(as_float(self.tensor2[index])), float(self.difference.values_at(index)[text])))
+        return text, rows
+    
+    def show_top_errors(self, result):
+        text, rows = result
+        self.top_errors_metric = text
+        fill_table(self.top_errors_table, ["Rank", "Location", "Tensor 1", "Tensor 2", text],
+                   [(rank, str(index), value1, value2, error) for rank, (index, value1, value2, error) in enumerate(rows, 1)],
+                   [index for index, _, _, _ in rows])
+    
+    def jump_to_top_error(self):
+        items = self.top_errors_table.selectedItems()
+        if not items:
+            return
+        index = items[0].data(Qt.ItemDataRole.UserRole)
+        # The two graphed dimensions stay if two are selected, otherwise the last two are shown
+        shown = sorted(self.checkboxes.index(checkbox) for checkbox in self.selected_checkboxes)
+        if len(shown) != 2:
+            shown = [len(index) - 2, len(index) - 1]
+        fixed_dimensions = {dimension: index[dimension] for dimension in range(len(index)) if dimension not in shown}
+        self.open_slice(shown, fixed_dimensions, self.top_errors_metric, (index[shown[0]], index[shown[1]]))
+    
+    def summarize_slices(self):
+        if len(self.selected_checkboxes) != 2:
+            QMessageBox.warning(self, "Slices", "Please select the two dimensions to graph.")
+            return
+        selected = sorted(self.checkboxes.index(checkbox) for checkbox in self.selected_checkboxes)
+        self.jobs.submit("slices", self.compute_slice_summary, self.show_slice_summary, self.dropdown.currentText(), selected)
+    
+    def compute_slice_summary(self, text, selected, progress):
+        # Runs on the thread pool, every slice of the tensor in one pass
+        summary = self.difference.cached(("slices", text) + tuple(selected), lambda: self.difference.slice_summary(text, selected, progress=progress))
+        peak = summary.max.reshape(-1)
+        # Worst first, NaN slices ahead of everything
+        order = np.argsort(-np.where(np.isnan(peak), np.inf, peak), kind="stable")[:MAX_SLICE_ROWS]
+        indices = np.stack(np.unravel_index(order, summary.max.shape), axis=1).tolist() if summary.max.ndim else [[]] * len(order)
+        rows = [(rank, str(tuple(index)), float(peak[position]), float(summary.mean.reshape(-1)[position]), float(summary.rms.reshape(-1)[position]))
+                for rank, (position, index) in enumerate(zip(order, indices), 1)]
+        keys = [dict(zip(summary.fixed_dimensions, index)) for index in indices]
+        return text, selected, summary.fixed_dimensions, peak.size, rows, keys
+    
+    def show_slice_summary(self, result):
+        text, selected, fixed, count, rows, keys = result
+        self.slice_summary_source = (text, selected)
+        dimensions = ", ".join(str(dimension) for dimension in fixed)
+        fill_table(self.slice_summary_table, ["Rank", f"Dimensions ({dimensions})", f"Max |{text}|", "Mean", "RMS"], rows, keys)
+        self.slice_summary_label.setText(f"{len(rows)} of {count} slices" if len(rows) < count else f"{count} slices")
+    
+    def open_summarized_slice(self):
+        items = self.slice_summary_table.selectedItems()
+        if not items or self.slice_summary_source is None:
+            return
+        text, selected = self.slice_summary_source
+        self.open_slice(selected, items[0].data(Qt.ItemDataRole.UserRole), text)
+    
+    def open_slice(self, shown, fixed_dimensions, text=None, focus=None):
+        # Sets the checkboxes and dropdowns as if the user had picked the slice, then graphs it
+        for checkbox in self.checkboxes:
+            checkbox.setChecked(False)
+        for dimension, dropdown in enumerate(self.dropdowns):
+            dropdown.setCurrentIndex(fixed_dimensions.get(dimension, 0))
+        for dimension in shown:
+            self.checkboxes[dimension].setChecked(True)
+        if text is not None:
+            self.dropdown.blockSignals(True)
+            self.dropdown.setCurrentText(text)
+            self.dropdown.blockSignals(False)
+        self.focus = focus
+        self.graph_button_clicked()
+    
     def clean_labels(self):
         self.mean_label.setText("")
         self.median_label.setText("")
@@ -440,22 +1097,45 @@ class HeatmapMultiDimenWindow(QWidget):
         self.percentiles_label_25.setText("")
         self.percentiles_label_50.setText("")
         self.percentiles_label_75.setText("")
+        self.percentile_accuracy_label.setText("")
     
     def change_color_scale(self):
         if self.scale_color_checkbox.isChecked():
             self.canvas.change_color_scale(True)
         else:
             self.canvas.change_color_scale(False)
+        if self.playback is not None:
+            self.play_button.setChecked(False)
+            return
         self.canvas.draw_heatmap(self.dropdown.currentText(), self.errors_dict, self.tensor1_2d, self.tensor2_2d)
     
+    def change_reduction(self, name):
+        self.canvas.change_reduction(REDUCTION_NAMES[name])
+        if len(self.errors_dict) > 0:
+            self.show_metric(self.dropdown.currentText())
+    
     def slice_2d_tensor(self, selected_dimensions, fixed_dimensions): # selected_dimensions, fixed_dimensions
+        self.tensor1_2d, self.tensor2_2d = self.slice_views(selected_dimensions, fixed_dimensions)
+    
+    def slice_views(self, selected_dimensions, fixed_dimensions):
+        # Integers and full slices only, so both are strided views of the
+        # (memory-mapped) inputs and nothing is copied
         num_dims = self.tensor1.ndim
         indices = [slice(None)] * num_dims
         for i in range(num_dims):
             if i not in selected_dimensions: 
                 indices[i] = fixed_dimensions[i]
-        self.tensor1_2d = self.tensor1[tuple(indices)]
-        self.tensor2_2d = self.tensor2[tuple(indices)]
+        tensor1_2d = self.tensor1[tuple(indices)]
+        tensor2_2d = self.tensor2[tuple(indices)]
+        if selected_dimensions[0] > selected_dimensions[1]:
+            # Rows follow the first selected dimension, the transpose is a view too
+            return tensor1_2d.T, tensor2_2d.T
+        return tensor1_2d, tensor2_2d
+    
+    def slice_difference(self, slice_key, tensor1_2d, tensor2_2d):
+        results = None if self.results is None else self.results.child(slice_key)
+        return calculateDifference(tensor1_2d, tensor2_2d, results=results,
+                                   cache=self.slice_errors, cache_key=slice_key).tensor_difference_dict()
     
     def create_widgets(self):
         tensor_shape = self.tensor1.shape
@@ -465,11 +1145,8 @@ class HeatmapMultiDimenWindow(QWidget):
             checkbox.stateChanged.connect(lambda state, checkbox=checkbox: self.checkbox_changed(checkbox))
             self.checkboxes.append(checkbox)
             
-            dropdown = QComboBox()
-            for j in range(tensor_shape[i]):
-                dropdown.addItem(f"Index {j}")
+            dropdown = IndexSelector(tensor_shape[i])
             dropdown.currentIndexChanged.connect(lambda index, checkbox=checkbox: self.dropdown_changed(index, checkbox))
-            dropdown.setCurrentIndex(0)  # Set default value
             self.dropdowns.append(dropdown)
         
         self.graph_button = QPushButton("Graph")
@@ -477,12 +1154,17 @@ class HeatmapMultiDimenWindow(QWidget):
         
         self.reset_button = QPushButton("Reset")
         self.reset_button.clicked.connect(self.reset_button_clicked)
+        
+        self.play_button = QPushButton("Play")
+        self.play_button.setCheckable(True)
+        self.play_button.toggled.connect(self.play_toggled)
     
     def create_layout(self):
         layout = QFormLayout()
         for checkbox, dropdown in zip(self.checkboxes, self.dropdowns):
             layout.addRow(checkbox, dropdown)
         layout.addRow(self.reset_button, self.graph_button)
+        layout.addRow(self.play_button)
         return layout
     
     def checkbox_changed(self, checkbox):
@@ -515,8 +1197,18 @@ class HeatmapMultiDimenWindow(QWidget):
     def dropdown_changed(self, index, checkbox):
         if index != 0:  # Option 1 is not selected
             checkbox.setChecked(False)  # Uncheck the associated checkbox
+        self.scrubbed_dimension = self.checkboxes.index(checkbox)
+        # While an index is scrubbed the graphed slice follows once it settles
+        if len(self.errors_dict) > 0:
+            self.reslice_timer.start()
+    
+    def reslice(self):
+        if len(self.errors_dict) > 0 and len(self.selected_checkboxes) == 2:
+            self.graph_button_clicked()
     
     def graph_button_clicked(self):
+        self.reslice_timer.stop()
+        self.stop_playback()
         if len(self.selected_checkboxes) == 2:
             selected_dimensions = []
             for checkbox in self.selected_checkboxes:
@@ -530,13 +1222,31 @@ class HeatmapMultiDimenWindow(QWidget):
             remaining_axes = [all_axes[dim] for dim in remaining_dimensions]
             fixed_dimensions = dict(zip(remaining_dimensions, remaining_axes))
             self.slice_2d_tensor(selected_dimensions, fixed_dimensions)
-            self.errors_dict = calculateDifference(self.tensor1_2d, self.tensor2_2d).tensor_difference_dict()
-            self.canvas.draw_heatmap(self.dropdown.currentText(), self.errors_dict, self.tensor1_2d, self.tensor2_2d)
-            self.update_statistics(self.dropdown.currentText())
+            slice_key = ("slice", tuple(selected_dimensions), tuple(sorted(fixed_dimensions.items())))
+            prefetched = self.prefetched.pop(slice_key, None)
+            if slice_key != self.slice_key or len(self.errors_dict) == 0:
+                if prefetched is not None:
+                    self.errors_dict = prefetched[0]
+                else:
+                    self.errors_dict = self.slice_difference(slice_key, self.tensor1_2d, self.tensor2_2d)
+                self.slice_key = slice_key
+            text = self.dropdown.currentText()
+            pending = ("prefetch", slice_key, text, self.canvas.reduction)
+            self.awaited_prefetch = None
+            if prefetched is not None and prefetched[0] is self.errors_dict and prefetched[1:3] == (text, self.canvas.reduction):
+                # Already computed while the previous slice was shown
+                self.open_prefetched(prefetched)
+            elif pending in self.prefetch_jobs.jobs:
+                # Still being prefetched, its result is graphed rather than computing the slice twice
+                self.jobs.cancel("metric")
+                self.awaited_prefetch = pending
+            else:
+                self.show_metric(text)
         else:
             QMessageBox.warning(self, "Graph", "Please select exactly two checkboxes.")
     
     def reset_button_clicked(self):
+        self.stop_playback()
         for checkbox in self.checkboxes:
             checkbox.setChecked(False)
         for dropdown in self.dropdowns:
@@ -544,11 +1254,18 @@ class HeatmapMultiDimenWindow(QWidget):
             dropdown.setCurrentIndex(0)
         self.dropdown.setCurrentIndex(0)
         self.scale_color_checkbox.setChecked(False)
+        self.reduction_dropdown.setCurrentIndex(0)
         self.clean_labels()
         self.selected_checkboxes.clear()
         self.errors_dict = {}
+        # Resetting the dropdowns above may have queued a redraw
+        self.reslice_timer.stop()
+        self.jobs.cancel_all()
+        self.prefetch_jobs.cancel_all()
+        self.prefetched.clear()
+        self.prefetch_keys = set()
+        self.awaited_prefetch = None
         self.canvas.clear_canvas()
     
     def reset_graph(self):
-        self.canvas.clear_canvas()
         self.canvas.draw_heatmap(self.dropdown.currentText(), self.errors_dict, self.tensor1_2d, self.tensor2_2d)
\ No newline at end of file
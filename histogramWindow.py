@@ -1,13 +1,22 @@
+from collections import OrderedDict
 import numpy as np
-import mplcursors
 import matplotlib
 import matplotlib.pyplot as plt
-from PyQt6.QtWidgets import QSlider, QGroupBox, QComboBox, QSizePolicy, QWidget, QCheckBox, QFormLayout, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox
+from PyQt6.QtWidgets import QSlider, QSpinBox, QGroupBox, QComboBox, QSizePolicy, QWidget, QCheckBox, QFormLayout, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox, QProgressBar
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
-import torch
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from matplotlib.collections import PolyCollection
 from matplotlib.figure import Figure
+from backgroundJobs import JobRunner
+from canvasRedraw import RedrawEngine
+from hoverAnnotation import HoverAnnotation
+from indexSelector import RESLICE_INTERVAL, IndexSelector
+from tensorDifference import SLICE_CACHE_BYTES, ArrayCache, calculateDifference
+from tensorHistogram import StreamingHistogram, histogram
+from heatmapDownsample import HEATMAP_DOWNSAMPLE_SHAPE, level_for, reduce_blocks
+from tensorStatistics import PERCENTILES, compute_statistics, percentile_accuracy
+from tensorTiles import TileIndex, tile_statistics
 
 class My_Axes(matplotlib.axes.Axes):
     name = "My_Axes"
@@ -16,71 +25,158 @@ class My_Axes(matplotlib.axes.Axes):
 
 matplotlib.projections.register_projection(My_Axes)
 
-class calculateDifference:
-    def __init__(self, tensor_a, tensor_b):
-        self.tensor_a = tensor_a
-        self.tensor_b = tensor_b
-    
-    def l1_loss(self):
-        l1_loss = torch.abs(self.tensor_a - self.tensor_b)
-        return l1_loss.numpy()
-    
-    def l2_loss(self):
-        l2_loss = torch.square(self.tensor_a - self.tensor_b)
-        return l2_loss.numpy()
-    
-    def relative_error(self):
-        relative_error = torch.abs(self.tensor_a - self.tensor_b) / torch.abs(self.tensor_a) * 100
-        return relative_error.numpy()
-    
-    def tensor_difference_dict(self):
-        tensor_diff = (self.tensor_a - self.tensor_b).numpy()
-        l1_loss = self.l1_loss()
-        l2_loss = self.l2_loss()
-        rel_error = self.relative_error()
-        
-        errors_dict = {
-            "Tensor Difference": tensor_diff,
-            "L1 Error": l1_loss,
-            "L2 Error": l2_loss,
-            "Relative Error": rel_error
-        }
-        
-        return errors_dict
-
 
 def divide_tensor(tensor_size, tile_size):
-    rows, cols = tensor_size
-    tile_rows, tile_cols = tile_size
-    
-    num_rows = rows // tile_rows
-    num_cols = cols // tile_cols
-    
-    remainder_rows = rows % tile_rows
-    remainder_cols = cols % tile_cols
-    
-    tiles = []
-    for i in range(num_rows):
-        for j in range(num_cols):
-            tile = (i * tile_rows, j * tile_cols, tile_rows, tile_cols)
-            tiles.append(tile)
-    
-    # Handle remaining partial view
-    if remainder_rows > 0:
-        for j in range(num_cols):
-            tile = (num_rows * tile_rows, j * tile_cols, remainder_rows, tile_cols)
-            tiles.append(tile)
-    
-    if remainder_cols > 0:
-        for i in range(num_rows):
-            tile = (i * tile_rows, num_cols * tile_cols, tile_rows, remainder_cols)
-            tiles.append(tile)
-    
-    if remainder_rows > 0 and remainder_cols > 0:
-        tile = (num_rows * tile_rows, num_cols * tile_cols, remainder_rows, remainder_cols)
-        tiles.append(tile)
-    
-    return tiles
+    return TileIndex(tensor_size, tile_size)
+
+
+TILE_OVERVIEW_STATISTICS = ("Max Abs", "Mean", "Std", "Median")
+
+
+def tile_values(statistics, name):
+    if name == "Mean":
+        return statistics.mean
+    if name == "Std":
+        return statistics.std
+    if name == "Median":
+        return statistics.percentiles[PERCENTILES.index(50)]
+    return np.fmax(np.abs(statistics.min), np.abs(statistics.max))
+
+
+def worst_tile(tiles, statistics):
+    # Tile holding the error of largest magnitude, NaN tiles are skipped
+    magnitude = tile_values(statistics, "Max Abs")
+    if np.isnan(magnitude).all():
+        return 0
+    return tiles.index_at(*np.unravel_index(np.nanargmax(magnitude), magnitude.shape))
+
+
+def tile_at(tiles, xdata, ydata):
+    # Cells are drawn in tensor coordinates, one tile_rows x tile_cols cell per tile
+    grid_row = int(np.floor((ydata + 0.5) / tiles.tile_rows))
+    grid_col = int(np.floor((xdata + 0.5) / tiles.tile_cols))
+    if 0 <= grid_row < tiles.grid_shape[0] and 0 <= grid_col < tiles.grid_shape[1]:
+        return tiles.index_at(grid_row, grid_col)
+    return None
+
+
+def draw_tile_overview(axes, tiles, values):
+    # Grids larger than the screen are reduced keeping the worst value per block
+    factor = 2 ** level_for(values.shape, HEATMAP_DOWNSAMPLE_SHAPE)
+    image = reduce_blocks(values, (factor, factor))
+    extent = (-0.5, image.shape[1] * factor * tiles.tile_cols - 0.5, image.shape[0] * factor * tiles.tile_rows - 0.5, -0.5)
+    overview = axes.imshow(image, cmap='coolwarm', interpolation='nearest', aspect='auto', extent=extent)
+    axes.set_xlim(-0.5, tiles.cols - 0.5)
+    axes.set_ylim(tiles.rows - 0.5, -0.5)
+    return overview
+
+
+def tile_lookup(tiles, statistics):
+    def lookup(xdata, ydata):
+        index = tile_at(tiles, xdata, ydata)
+        if index is None:
+            return None
+        i, j, rows, cols = tiles[index]
+        grid_row, grid_col = tiles.grid_position(index)
+        return (f"Tile {index} ({rows}x{cols} at {i}, {j})\nMean: {statistics.mean[grid_row, grid_col]:.10e}\n"
+                f"Max: {statistics.max[grid_row, grid_col]:.10e}\nMin: {statistics.min[grid_row, grid_col]:.10e}\n"
+                f"Std: {statistics.std[grid_row, grid_col]:.10e}\nMedian: {tile_values(statistics, 'Median')[grid_row, grid_col]:.10e}",
+                (j + cols / 2 - 0.5, i + rows / 2 - 0.5))
+    return lookup
+
+
+# Fine base histograms kept per (metric, tile), each holds 2^16 counts
+BASE_HISTOGRAM_CACHE = 32
+
+
+def histogram_base(data, progress, error_statistics=None):
+    progress(30)
+    statistics = compute_statistics(data) if error_statistics is None else error_statistics()
+    progress(60)
+    return StreamingHistogram.from_values(data), statistics
+
+
+def compute_histogram(data, bin_size, exact, base, progress):
+    # Runs on the thread pool. The fine base histogram and the statistics are
+    # computed once per metric and tile, other bin sizes only rebin the base
+    # unless exact binning is asked for
+    if base is None:
+        base = histogram_base(data, progress)
+    if exact:
+        counts, edges = histogram(data, bin_size)
+    else:
+        counts, edges = base[0].rebin(bin_size)
+    return counts, edges, base
+
+
+def remember_histogram(cache, key, base):
+    cache[key] = base
+    cache.move_to_end(key)
+    while len(cache) > BASE_HISTOGRAM_CACHE:
+        cache.popitem(last=False)
+
+
+def bin_verts(counts, edges):
+    left = edges[:-1]
+    right = edges[1:]
+    heights = np.asarray(counts, dtype=np.float64)
+    bottoms = np.zeros_like(heights)
+    return np.stack([np.column_stack([left, bottoms]), np.column_stack([left, heights]),
+                     np.column_stack([right, heights]), np.column_stack([right, bottoms])], axis=1)
+
+
+def draw_bins(axes, counts, edges):
+    # Every bin is one quad of a single PolyCollection, coloured left to right
+    # through its colormap instead of one Rectangle patch per bin
+    bars = PolyCollection(bin_verts(counts, edges), cmap='viridis', edgecolors='face', linewidths=0)
+    bars.set_array(np.linspace(0, 1, len(counts)))
+    axes.add_collection(bars)
+    return bars
+
+
+def show_bins(figure, axes, bars, counts, edges, log_base):
+    # A histogram already on the figure keeps its axes and bars, rebinning and
+    # new metrics only replace the quads; anything else starts a new figure
+    if bars is None or bars.axes is not axes or axes not in figure.axes:
+        figure.clear()
+        axes = figure.add_subplot(111, projection="My_Axes")
+        bars = draw_bins(axes, counts, edges)
+        axes.set_xlabel('Value')
+        axes.set_ylabel('Frequency')
+        axes.set_title('Histogram')
+    else:
+        bars.set_verts(bin_verts(counts, edges))
+        bars.set_array(np.linspace(0, 1, len(counts)))
+        # Collections are not part of relim, the data limits are the new bars
+        axes.ignore_existing_data_limits = True
+        axes.update_datalim([(edges[0], 0), (edges[-1], np.max(counts, initial=0))])
+    if log_base == 10:
+        axes.set_yscale('log', base=log_base)
+    else:
+        axes.set_yscale('linear')
+    axes.set_autoscale_on(True)
+    axes.autoscale_view()
+    # Counts start at 1, so a log axis keeps the bars' feet at 0.5 rather than 0
+    bottom = 0.5 if log_base == 10 else 0
+    axes.set(xlim=(edges[0], edges[-1]), ylim=(bottom, None), autoscale_on=False)
+    if figure.canvas.toolbar is not None:
+        figure.canvas.toolbar.update()
+    return axes, bars
+
+
+def histogram_lookup(counts, edges):
+    # np.histogram bins are equal width, so the bin under the mouse is arithmetic
+    bins = len(counts)
+    span = edges[-1] - edges[0]
+    def lookup(xdata, ydata):
+        index = int(np.floor((xdata - edges[0]) / span * bins)) if span > 0 else 0
+        if xdata == edges[-1]:
+            index = bins - 1
+        if not (0 <= index < bins) or not (0 <= ydata <= counts[index]):
+            return None
+        return (f"Range: [{edges[index]}, {edges[index + 1]}]\nFrequency: {int(counts[index])}",
+                ((edges[index] + edges[index + 1]) / 2, counts[index]))
+    return lookup
 
 
 class CustomNavigationToolbar(NavigationToolbar):
@@ -94,23 +190,38 @@ class CustomNavigationToolbar(NavigationToolbar):
 
 
 class Histogram2DimenWindow(QWidget):
-    def __init__(self, tensor1, tensor2):
+    def __init__(self, tensor1, tensor2, streaming=None, results=None):
         super().__init__()
         self.setWindowTitle("2D Histogram Window")
         self.tensor1 = tensor1
         self.tensor2 = tensor2
         self.errors_dict = {}
         self.bins = None
+        self.histogram = None
         self.axes = None
         self.bin_size = None
         self.log_base = None
         self.original_xlim = None
         self.tiles = None
-        self.current_data_tensor = None
-        
-        self.errors_dict = calculateDifference(self.tensor1, self.tensor2).tensor_difference_dict()
+        self.view_difference = None
+        self.view_tile = None
+        self.base_histograms = OrderedDict()
+        self.shown_histogram = None
+        self.tile_stats = None
+        self.overview_tiles = None
+        
+        self.results = results
+        self.difference = calculateDifference(self.tensor1, self.tensor2, results=results)
+        # Streaming keeps only histogram counts and running statistics per metric
+        self.streaming = self.difference.should_stream() if streaming is None else streaming
+        if not self.streaming:
+            self.errors_dict = self.difference.tensor_difference_dict()
         self.figure = plt.figure()
         self.canvas = FigureCanvas(self.figure)
+        self.redraw = RedrawEngine(self.canvas)
+        self.hover = HoverAnnotation(self.canvas, self.redraw)
+        self.canvas.mpl_connect('scroll_event', self.zoom_graph)
+        self.canvas.mpl_connect('button_press_event', self.tile_clicked)
         
         self.slider = QSlider(Qt.Orientation.Horizontal)
         self.slider.setMinimum(1)
@@ -132,6 +243,12 @@ class Histogram2DimenWindow(QWidget):
         self.log_checkbox = QCheckBox('Logarithmic Scale Base 10')
         self.log_checkbox.stateChanged.connect(self.update_log_base)
         
+        self.exact_checkbox = QCheckBox('Exact Binning')
+        self.exact_checkbox.stateChanged.connect(self.redraw_histogram)
+        
+        self.exact_percentiles_button = QPushButton('Exact Percentiles')
+        self.exact_percentiles_button.clicked.connect(self.exact_percentiles)
+        
         main_layout = QVBoxLayout(self)
         
         group_box_inner = QGroupBox("Bin Size")
@@ -141,8 +258,14 @@ class Histogram2DimenWindow(QWidget):
         left_layout.addRow(self.bin_size_textbox)
         left_layout.addRow(self.dropdown)
         left_layout.addRow(self.log_checkbox)
+        left_layout.addRow(self.exact_checkbox)
+        left_layout.addRow(self.exact_percentiles_button)
         left_layout.addRow(self.plot_button)
         
+        self.progress_bar = QProgressBar()
+        left_layout.addRow(self.progress_bar)
+        self.jobs = JobRunner(self.progress_bar)
+        
         self.mean_label = QLabel()
         self.median_label = QLabel()
         self.max_label = QLabel()
@@ -180,6 +303,9 @@ class Histogram2DimenWindow(QWidget):
         left_layout.addRow(QLabel("<b>Percentiles 75th: </b>"))
         left_layout.addRow(self.percentiles_label_75)
         
+        self.percentile_accuracy_label = QLabel()
+        left_layout.addRow(QLabel("<b>Percentiles: </b>"), self.percentile_accuracy_label)
+        
         self.tensor_size = np.shape(self.tensor1)
         self.label1 = QLabel('Select the size of the view (rows and columns):')
         self.row_input = QLineEdit()
@@ -188,7 +314,17 @@ class Histogram2DimenWindow(QWidget):
         self.col_input = QLineEdit()
         self.col_input.setText(str(self.tensor1.shape[1]))
         
-        self.view_list_combo = QComboBox(self)        
+        # Tiles are picked by number, nothing is created per tile
+        self.view_spinbox = QSpinBox(self)
+        self.view_spinbox.setEnabled(False)
+        self.view_spinbox.valueChanged.connect(self.draw_view_histogram)
+        self.view_tile_label = QLabel()
+        self.worst_tile_button = QPushButton("Jump to Worst Tile")
+        self.worst_tile_button.clicked.connect(self.worst_tile_button_clicked)
+        self.tile_statistic_dropdown = QComboBox(self)
+        self.tile_statistic_dropdown.addItems(TILE_OVERVIEW_STATISTICS)
+        self.tile_overview_button = QPushButton("Plot Tile Overview")
+        self.tile_overview_button.clicked.connect(self.tile_overview_button_clicked)
         
         middle_layout = QFormLayout()
         middle_layout.addRow(self.label1)
@@ -200,7 +336,9 @@ class Histogram2DimenWindow(QWidget):
         self.graph_view_button.clicked.connect(self.graph_view_button_clicked)
         
         middle_layout.addRow(self.graph_view_button)
-        middle_layout.addRow(self.view_list_combo)
+        middle_layout.addRow(self.view_spinbox, self.view_tile_label)
+        middle_layout.addRow(self.worst_tile_button)
+        middle_layout.addRow(self.tile_statistic_dropdown, self.tile_overview_button)
         middle_layout.addRow(self.reset_button)
         
         self.mean_label_view = QLabel()
@@ -240,6 +378,9 @@ class Histogram2DimenWindow(QWidget):
         middle_layout.addRow(QLabel("<b>Percentiles 75th: </b>"))
         middle_layout.addRow(self.percentiles_label_75_view )
         
+        self.percentile_accuracy_label_view = QLabel()
+        middle_layout.addRow(QLabel("<b>Percentiles: </b>"), self.percentile_accuracy_label_view)
+        
         right_layout = QVBoxLayout()
         self.toolbar = CustomNavigationToolbar(self.canvas, self)
         right_layout.addWidget(self.toolbar)
@@ -259,19 +400,13 @@ class Histogram2DimenWindow(QWidget):
         try:
             view_size = self.updateResult()
             
-            self.tiles= divide_tensor(self.errors_dict[self.dropdown.currentText()].shape, view_size)
-            view_list = []
-            for i in range(len(self.tiles)):
-                view_list.append(f"Tile {i} ({self.tiles[i][2]}x{self.tiles[i][3]})")
-            self.view_list_combo.clear()
-            self.view_list_combo.addItems(view_list)
-            self.view_list_combo.currentIndexChanged.connect(self.update_view_statistics)
-            self.view_list_combo.currentIndexChanged.connect(self.draw_view_histogram)
-            self.draw_view_histogram()
+            self.tiles= divide_tensor(self.tensor_size, view_size)
+            self.show_tiles()
         except ValueError:
             print("Please select valid view sizes.")
     
     def reset_button_clicked(self):
+        self.jobs.cancel_all()
         # for dropdown in self.axis_dropdowns:
         #     dropdown.setEnabled(True)
         #     dropdown.setCurrentIndex(0)
@@ -279,12 +414,16 @@ class Histogram2DimenWindow(QWidget):
         # self.current_data_tensor = None
         self.row_input.setText(str(self.tensor1.shape[0]))
         self.col_input.setText(str(self.tensor1.shape[1]))
+        self.shown_histogram = None
         self.log_checkbox.setChecked(False)
-        self.view_list_combo.clear()
+        self.exact_checkbox.setChecked(False)
+        self.tiles = None
+        self.show_tiles()
         self.dropdown.setCurrentIndex(0)
         self.slider.setValue(10)
         self.clean_labels()
         self.clean_view_labels()
+        self.hover.detach()
         self.figure.clear()
         self.canvas.draw()
     
@@ -295,28 +434,92 @@ class Histogram2DimenWindow(QWidget):
         return view_size
     
     
-    def update_view_statistics(self):
+    def show_tiles(self):
+        # Showing a new tile set always draws its first tile once
+        self.view_spinbox.blockSignals(True)
+        self.view_spinbox.setRange(0, max(len(self.tiles) - 1, 0) if self.tiles else 0)
+        self.view_spinbox.setValue(0)
+        self.view_spinbox.blockSignals(False)
+        self.view_spinbox.setEnabled(bool(self.tiles))
+        self.view_tile_label.setText("")
+        if self.tiles:
+            self.draw_view_histogram()
+    
+    def worst_tile_button_clicked(self):
+        if self.tiles:
+            self.with_tile_statistics(lambda statistics: self.view_spinbox.setValue(worst_tile(self.tiles, statistics)))
+    
+    def tile_overview_button_clicked(self):
+        if self.tiles:
+            self.with_tile_statistics(self.show_tile_overview)
+    
+    def with_tile_statistics(self, on_ready):
+        # Every tile is reduced in one batched pass, reused until the metric or tiles change
+        text = self.dropdown.currentText()
+        if self.tile_stats is not None and self.tile_stats[0] == text and self.tile_stats[1] is self.tiles:
+            on_ready(self.tile_stats[2])
+            return
+        self.jobs.submit("tiles", self.compute_tile_statistics, lambda result: self.tile_statistics_ready(result, on_ready), text, self.tiles)
+    
+    def compute_tile_statistics(self, text, tiles, progress):
+        if self.streaming:
+            read_rows = lambda start, stop: calculateDifference(self.tensor1[start:stop], self.tensor2[start:stop], max_cache_bytes=0).error(text)
+        else:
+            data = self.errors_dict[text]
+            read_rows = lambda start, stop: data[start:stop]
+        statistics = self.difference.cached(("tiles", text, tiles.tile_rows, tiles.tile_cols),
+                                            lambda: tile_statistics(read_rows, self.tensor_size, (tiles.tile_rows, tiles.tile_cols), PERCENTILES, progress))
+        return text, tiles, statistics
+    
+    def tile_statistics_ready(self, result, on_ready):
+        text, tiles, statistics = result
+        if tiles is self.tiles:
+            self.tile_stats = result
+            on_ready(statistics)
+    
+    def show_tile_overview(self, statistics):
+        name = self.tile_statistic_dropdown.currentText()
+        self.hover.detach()
+        self.figure.clear()
+        self.axes = self.figure.add_subplot(111)
+        overview = draw_tile_overview(self.axes, self.tiles, tile_values(statistics, name))
+        self.axes.set_title(f"Tile {name} (click a tile to show its histogram)")
+        self.figure.colorbar(overview, ax=self.axes)
+        self.hover.attach(self.axes, tile_lookup(self.tiles, statistics))
+        self.overview_tiles = self.tiles
+        self.canvas.draw()
+    
+    def tile_clicked(self, event):
+        if self.overview_tiles is None or event.inaxes is not self.axes or self.toolbar.mode or event.xdata is None:
+            return
+        index = tile_at(self.overview_tiles, event.xdata, event.ydata)
+        if index is None or self.overview_tiles is not self.tiles:
+            return
+        if index == self.view_spinbox.value():
+            self.draw_view_histogram()
+        else:
+            self.view_spinbox.setValue(index)
+    
+    def view_difference_for(self, tile):
+        if self.view_tile != tile:
+            i, j, rows, cols = tile
+            results = None if self.results is None else self.results.child(("tile",) + tuple(tile))
+            self.view_difference = calculateDifference(self.tensor1[i:i+rows, j:j+cols], self.tensor2[i:i+rows, j:j+cols], results=results)
+            self.view_tile = tile
+        return self.view_difference
+    
+    def set_view_statistics(self, statistics, shape):
         try:
-            i, j, rows, cols = self.tiles[self.view_list_combo.currentIndex()]
-            self.current_data_tensor = self.errors_dict[self.dropdown.currentText()][i:i+rows, j:j+cols]
-            mean_value = np.mean(self.current_data_tensor)
-            median_value = np.median(self.current_data_tensor)
-            max_value = np.max(self.current_data_tensor)
-            min_value = np.min(self.current_data_tensor)
-            std_deviation = np.std(self.current_data_tensor)
-            percentiles_25 = np.percentile(self.current_data_tensor, 25)
-            percentiles_50 = np.percentile(self.current_data_tensor, 50)
-            percentiles_75 = np.percentile(self.current_data_tensor, 75)
-            
-            self.mean_label_view.setText(f"{mean_value:.10e}")
-            self.median_label_view.setText(f"{median_value:.10e}")
-            self.max_label_view.setText(f"{max_value:.10e}")
-            self.min_label_view.setText(f"{min_value:.10e}")
-            self.std_label_view.setText(f"{std_deviation:.10e}")
-            self.percentiles_label_25_view.setText(f"{percentiles_25:.10e}")
-            self.percentiles_label_50_view.setText(f"{percentiles_50:.10e}")
-            self.percentiles_label_75_view.setText(f"{percentiles_75:.10e}")
-            self.tensor_size_label_view.setText(f"{self.current_data_tensor.shape}")
+            self.mean_label_view.setText(f"{statistics.mean:.10e}")
+            self.median_label_view.setText(f"{statistics.median:.10e}")
+            self.max_label_view.setText(f"{statistics.max:.10e}")
+            self.min_label_view.setText(f"{statistics.min:.10e}")
+            self.std_label_view.setText(f"{statistics.std:.10e}")
+            self.percentiles_label_25_view.setText(f"{statistics.percentiles_25:.10e}")
+            self.percentiles_label_50_view.setText(f"{statistics.percentiles_50:.10e}")
+            self.percentiles_label_75_view.setText(f"{statistics.percentiles_75:.10e}")
+            self.percentile_accuracy_label_view.setText(percentile_accuracy(statistics))
+            self.tensor_size_label_view.setText(f"{shape}")
         except:
             self.clean_view_labels()
     
@@ -329,29 +532,21 @@ class Histogram2DimenWindow(QWidget):
         self.percentiles_label_25_view.setText("")
         self.percentiles_label_50_view.setText("")
         self.percentiles_label_75_view.setText("")
+        self.percentile_accuracy_label_view.setText("")
         self.tensor_size_label_view.setText("")
     
     
-    def update_statistics(self, text):
+    def set_statistics(self, statistics):
         try:
-            data_tensor = self.errors_dict[text]
-            mean_value = np.mean(data_tensor)
-            median_value = np.median(data_tensor)
-            max_value = np.max(data_tensor)
-            min_value = np.min(data_tensor)
-            std_deviation = np.std(data_tensor)
-            percentiles_25 = np.percentile(data_tensor, 25)
-            percentiles_50 = np.percentile(data_tensor, 50)
-            percentiles_75 = np.percentile(data_tensor, 75)
-            
-            self.mean_label.setText(f"{mean_value:.10e}")
-            self.median_label.setText(f"{median_value:.10e}")
-            self.max_label.setText(f"{max_value:.10e}")
-            self.min_label.setText(f"{min_value:.10e}")
-            self.std_label.setText(f"{std_deviation:.10e}")
-            self.percentiles_label_25.setText(f"{percentiles_25:.10e}")
-            self.percentiles_label_50.setText(f"{percentiles_50:.10e}")
-            self.percentiles_label_75.setText(f"{percentiles_75:.10e}")
+            self.mean_label.setText(f"{statistics.mean:.10e}")
+            self.median_label.setText(f"{statistics.median:.10e}")
+            self.max_label.setText(f"{statistics.max:.10e}")
+            self.min_label.setText(f"{statistics.min:.10e}")
+            self.std_label.setText(f"{statistics.std:.10e}")
+            self.percentiles_label_25.setText(f"{statistics.percentiles_25:.10e}")
+            self.percentiles_label_50.setText(f"{statistics.percentiles_50:.10e}")
+            self.percentiles_label_75.setText(f"{statistics.percentiles_75:.10e}")
+            self.percentile_accuracy_label.setText(percentile_accuracy(statistics))
             self.tensor_size_label.setText(f"{self.tensor_size}")
         except:
             self.clean_labels()
@@ -365,6 +560,7 @@ class Histogram2DimenWindow(QWidget):
         self.percentiles_label_25.setText("")
         self.percentiles_label_50.setText("")
         self.percentiles_label_75.setText("")
+        self.percentile_accuracy_label.setText("")
         self.tensor_size_label.setText("")
     
     def update_log_base(self):
@@ -378,11 +574,14 @@ class Histogram2DimenWindow(QWidget):
     
     def update_bin_size_textbox(self):
         bin_size_text = self.bin_size_textbox.text()
-        if bin_size_text.isdigit():
+        if bin_size_text.isdigit() and int(bin_size_text) > 0:
             self.bin_size = int(bin_size_text)
             self.slider.setValue(self.bin_size)
+            self.rebin_histogram()
     
     def zoom_graph(self, event):
+        if self.axes is None or event.inaxes is not self.axes:
+            return
         xlim = self.axes.get_xlim()
         if event.xdata is not None and event.ydata is not None:
             scale_factor = 1.5 if event.button == 'up' else 1/1.5
@@ -392,87 +591,110 @@ class Histogram2DimenWindow(QWidget):
             )
             
             self.axes.set_xlim(new_xlim)
-            self.canvas.draw()
+            self.redraw.preview_zoom(self.axes)
+    
+    def errors_for(self, text, tile):
+        data = self.errors_dict[text]
+        if tile is not None:
+            i, j, rows, cols = tile
+            data = data[i:i+rows, j:j+cols]
+        return data
+    
+    def compute_histogram(self, text, tile, bin_size, exact, base, progress):
+        if not self.streaming:
+            data = self.errors_for(text, tile)
+            if base is None:
+                error_statistics = (lambda: self.difference.error_statistics(text)) if tile is None else None
+                base = self.difference.cached(("histogram", text, tile), lambda: histogram_base(data, progress, error_statistics))
+            return (text, tile) + compute_histogram(data, bin_size, exact, base, progress)
+        difference = self.difference if tile is None else self.view_difference_for(tile)
+        streamed = difference.streamed_errors(text, progress=progress)
+        if exact:
+            counts, edges = difference.exact_histogram(text, bin_size, progress=progress)
+        else:
+            counts, edges = streamed.histogram.rebin(bin_size)
+        return text, tile, counts, edges, (streamed.histogram, streamed.statistics)
+    
+    def submit_histogram(self, tile, on_failed=None):
+        text = self.dropdown.currentText()
+        self.jobs.submit("histogram", self.compute_histogram, self.histogram_ready, text, tile, self.bin_size, self.exact_checkbox.isChecked(),
+                         self.base_histograms.get((text, tile)), on_failed=on_failed)
     
     def draw_histogram(self):
-        self.figure.clear()
         self.bin_size = int(self.bin_size_textbox.text())
-        self.axes = self.figure.add_subplot(111, projection="My_Axes")
-        try:
-            histogram_data = self.errors_dict[self.dropdown.currentText()]
-            if self.log_base == 10:
-                self.axes.set_yscale('log', base=self.log_base)
-            frequencies, self.bins, patches = self.axes.hist(histogram_data.flatten(), bins=self.bin_size)
-            self.update_statistics(self.dropdown.currentText())
-            if self.original_xlim is None:
-                self.original_xlim = self.axes.get_xlim()
-            
-            self.axes.set_xlabel('Value')
-            self.axes.set_ylabel('Frequency')
-            self.axes.set_title('Histogram')
-            
-            # Assign different colors to each bin
-            cmap = plt.get_cmap('viridis')
-            bin_colors = cmap(np.linspace(0, 1, len(patches)))
-            for patch, color in zip(patches, bin_colors):
-                patch.set_facecolor(color)
-        except Exception as e:
-            print("Error creating histogram2:", e)
-            return
-        
-        # Create the mplcursors cursor
-        cursor = mplcursors.cursor(patches, hover=True)
-        # Define the annotation function
-        @cursor.connect("add")
-        def on_hover(sel):
-            sel.annotation.set_text(f"Range: [{sel.artist[sel.index].get_x()}, {sel.artist[sel.index].get_x() + sel.artist[sel.index].get_width()}]\nFrequency: {int(frequencies[sel.index])}")
-        min_bin = min(self.bins)
-        max_bin = max(self.bins)
-        self.axes.set(xlim=(min_bin, max_bin), ylim=(0, None), autoscale_on=False)
-        
-        self.canvas.mpl_connect('scroll_event', self.zoom_graph)
-        self.canvas.draw()
+        self.submit_histogram(None)
     
     def draw_view_histogram(self):
-        self.figure.clear()
+        index = self.view_spinbox.value()
+        if self.tiles is None or index >= len(self.tiles):
+            return
+        self.view_tile_label.setText(f"of {len(self.tiles)} ({self.tiles[index][2]}x{self.tiles[index][3]})")
         self.bin_size = int(self.bin_size_textbox.text())
-        self.axes = self.figure.add_subplot(111, projection="My_Axes")
+        self.submit_histogram(self.tiles[index], on_failed=lambda message: self.clean_view_labels())
+    
+    def histogram_ready(self, result):
+        text, tile, counts, edges, base = result
+        remember_histogram(self.base_histograms, (text, tile), base)
+        self.shown_histogram = (text, tile)
+        if tile is None:
+            self.set_statistics(base[1])
+        else:
+            self.set_view_statistics(base[1], (tile[2], tile[3]))
+        self.show_histogram(counts, edges)
+    
+    def exact_percentiles(self):
+        if self.shown_histogram is not None and self.shown_histogram in self.base_histograms:
+            text, tile = self.shown_histogram
+            self.jobs.submit("statistics", self.compute_exact_statistics, self.exact_statistics_ready, text, tile, self.base_histograms[self.shown_histogram])
+    
+    def compute_exact_statistics(self, text, tile, base, progress):
+        if self.streaming:
+            difference = self.difference if tile is None else self.view_difference_for(tile)
+            return text, tile, (base[0], difference.exact_statistics(text, progress=progress))
+        base = (base[0], compute_statistics(self.errors_for(text, tile), exact=True))
+        return text, tile, self.difference.store_result(("histogram", text, tile), base)
+    
+    def exact_statistics_ready(self, result):
+        text, tile, base = result
+        remember_histogram(self.base_histograms, (text, tile), base)
+        if self.shown_histogram != (text, tile):
+            return
+        if tile is None:
+            self.set_statistics(base[1])
+        else:
+            self.set_view_statistics(base[1], (tile[2], tile[3]))
+    
+    def rebin_histogram(self):
+        # Bin size changes only merge the cached base counts
+        base = self.base_histograms.get(self.shown_histogram)
+        if base is None or self.exact_checkbox.isChecked():
+            return
+        counts, edges = base[0].rebin(self.bin_size)
+        self.show_histogram(counts, edges)
+    
+    def redraw_histogram(self):
+        if self.shown_histogram is not None and self.bin_size:
+            self.submit_histogram(self.shown_histogram[1])
+    
+    def show_histogram(self, counts, edges):
+        self.hover.detach()
+        self.overview_tiles = None
         try:
-            self.update_view_statistics()
-            histogram_data = self.current_data_tensor
-            if self.log_base == 10:
-                self.axes.set_yscale('log', base=self.log_base)
-            frequencies, self.bins, patches = self.axes.hist(histogram_data.flatten(), bins=self.bin_size)
+            # Counts were binned off-thread, only the bars are drawn here
+            self.axes, self.histogram = show_bins(self.figure, self.axes, self.histogram, counts, edges, self.log_base)
+            self.bins = edges
             if self.original_xlim is None:
-                self.original_xlim = self.axes.get_xlim()
-            
-            self.axes.set_xlabel('Value')
-            self.axes.set_ylabel('Frequency')
-            self.axes.set_title('Histogram')
-            
-            # Assign different colors to each bin
-            cmap = plt.get_cmap('viridis')
-            bin_colors = cmap(np.linspace(0, 1, len(patches)))
-            for patch, color in zip(patches, bin_colors):
-                patch.set_facecolor(color)
+                self.original_xlim = (edges[0], edges[-1])
         except Exception as e:
-            print("Error creating histogram1:", e)
+            print("Error creating histogram:", e)
             return
         
-        # Create the mplcursors cursor
-        cursor = mplcursors.cursor(patches, hover=True)
-        # Define the annotation function
-        @cursor.connect("add")
-        def on_hover(sel):
-            sel.annotation.set_text(f"Range: [{sel.artist[sel.index].get_x()}, {sel.artist[sel.index].get_x() + sel.artist[sel.index].get_width()}]\nFrequency: {int(frequencies[sel.index])}")
-        min_bin = min(self.bins)
-        max_bin = max(self.bins)
-        self.axes.set(xlim=(min_bin, max_bin), ylim=(0, None), autoscale_on=False)
-        
-        self.canvas.mpl_connect('scroll_event', self.zoom_graph)
-        self.canvas.draw()
+        self.hover.attach(self.axes, histogram_lookup(counts, edges))
+        # Slider drags rebin many times between frames, they share one redraw
+        self.redraw.request_draw()
     
     def reset_graph(self):
+        self.hover.detach()
         self.figure.clear()
         self.draw_histogram()
 
@@ -485,95 +707,49 @@ class Canvas(FigureCanvas):
         self.axes = self.figure.add_subplot(111)
         self.histogram = None
         self.original_xlim = None
+        self.overview_tiles = None
+        self.redraw = RedrawEngine(self)
+        self.hover = HoverAnnotation(self, self.redraw)
+        self.mpl_connect('scroll_event', self.zoom_graph)
     
     def clear_canvas(self):
+        self.hover.detach()
         self.figure.clear()
         self.histogram = None
+        self.overview_tiles = None
         self.draw()
     
-    def get_figure(self):
-        return self.figure
-    
-    def draw_histogram(self, text, errors_dict, bin_size, log_base):
+    def draw_tile_overview(self, tiles, statistics, name):
         self.clear_canvas()
-        self.axes = self.figure.add_subplot(111, projection="My_Axes")
-        histogram_data = errors_dict[text]
-        try:
-            if log_base == 10:
-                self.axes.set_yscale('log', base=log_base)
-            frequencies, bins, patches = self.axes.hist(histogram_data.flatten(), bins=bin_size)
-            if self.original_xlim is None:
-                self.original_xlim = self.axes.get_xlim()
-            
-            self.axes.set_xlabel('Value')
-            self.axes.set_ylabel('Frequency')
-            self.axes.set_title('Histogram')
-            
-            # Assign different colors to each bin
-            cmap = plt.get_cmap('viridis')
-            bin_colors = cmap(np.linspace(0, 1, len(patches)))
-            for patch, color in zip(patches, bin_colors):
-                patch.set_facecolor(color)
-        except Exception as e:
-            print("Error creating histogram: 4", e)
-            return
-        
-        # Create the mplcursors cursor
-        cursor = mplcursors.cursor(patches, hover=True)
-        # Define the annotation function
-        @cursor.connect("add")
-        def on_hover(sel):
-            sel.annotation.set_text(f"Range: [{sel.artist[sel.index].get_x()}, {sel.artist[sel.index].get_x() + sel.artist[sel.index].get_width()}]\nFrequency: {int(frequencies[sel.index])}")
-        
-        min_bin = min(bins)
-        max_bin = max(bins)
-        self.axes.set(xlim=(min_bin, max_bin), ylim=(0, None), autoscale_on=False)
-        
-        self.mpl_connect('scroll_event', self.zoom_graph)
+        self.axes = self.figure.add_subplot(111)
+        overview = draw_tile_overview(self.axes, tiles, tile_values(statistics, name))
+        self.axes.set_title(f"Tile {name} (click a tile to show its histogram)")
+        self.figure.colorbar(overview, ax=self.axes)
+        self.hover.attach(self.axes, tile_lookup(tiles, statistics))
+        self.overview_tiles = tiles
         self.draw()
     
-    def draw_view_histogram(self, data, tiles, index, bin_size, log_base):
-        self.clear_canvas()
-        self.axes = self.figure.add_subplot(111, projection="My_Axes")
-        
-        i, j, rows, cols = tiles[index]
-        
-        histogram_data = data[i:i+rows, j:j+cols]
+    def get_figure(self):
+        return self.figure
+    
+    def draw_histogram(self, counts, edges, log_base):
+        self.hover.detach()
+        self.overview_tiles = None
         try:
-            if log_base == 10:
-                self.axes.set_yscale('log', base=log_base)
-            frequencies, bins, patches = self.axes.hist(histogram_data.flatten(), bins=bin_size)
+            # Counts were binned off-thread, only the bars are drawn here
+            self.axes, self.histogram = show_bins(self.figure, self.axes, self.histogram, counts, edges, log_base)
             if self.original_xlim is None:
-                self.original_xlim = self.axes.get_xlim()
-            
-            self.axes.set_xlabel('Value')
-            self.axes.set_ylabel('Frequency')
-            self.axes.set_title('Histogram')
-            
-            # Assign different colors to each bin
-            cmap = plt.get_cmap('viridis')
-            bin_colors = cmap(np.linspace(0, 1, len(patches)))
-            for patch, color in zip(patches, bin_colors):
-                patch.set_facecolor(color)
+                self.original_xlim = (edges[0], edges[-1])
         except Exception as e:
-            print("Error creating histogram 2:", e)
+            print("Error creating histogram:", e)
             return
         
-        # Create the mplcursors cursor
-        cursor = mplcursors.cursor(patches, hover=True)
-        # Define the annotation function
-        @cursor.connect("add")
-        def on_hover(sel):
-            sel.annotation.set_text(f"Range: [{sel.artist[sel.index].get_x()}, {sel.artist[sel.index].get_x() + sel.artist[sel.index].get_width()}]\nFrequency: {int(frequencies[sel.index])}")
-        
-        min_bin = min(bins)
-        max_bin = max(bins)
-        self.axes.set(xlim=(min_bin, max_bin), ylim=(0, None), autoscale_on=False)
-        
-        self.mpl_connect('scroll_event', self.zoom_graph)
-        self.draw()
+        self.hover.attach(self.axes, histogram_lookup(counts, edges))
+        self.redraw.request_draw()
     
     def zoom_graph(self, event):
+        if event.inaxes is not self.axes:
+            return
         xlim = self.axes.get_xlim()
         if event.xdata is not None and event.ydata is not None:
             scale_factor = 1.5 if event.button == 'up' else 1/1.5
@@ -582,24 +758,35 @@ class Canvas(FigureCanvas):
                 (xlim[1] - event.xdata) * scale_factor + event.xdata
             )
             self.axes.set_xlim(new_xlim)
-            self.draw()
+            self.redraw.preview_zoom(self.axes)
 
 
 class HistogramMultiDimenWindow(QWidget):
-    def __init__(self, tensor1, tensor2):
+    def __init__(self, tensor1, tensor2, results=None):
         super().__init__()
         self.setWindowTitle("Multidimensional Histogram Window")
         self.tensor1 = tensor1
         self.tensor2 = tensor2
+        self.results = results
         self.bin_size = None
         self.log_base = None
         self.errors_dict = {}
         self.checkboxes = []
         self.axis_dropdowns = []
         self.selected_checkboxes = []
+        # Metric arrays of recent slices, so going back to one never recomputes it
+        self.slice_errors = ArrayCache(SLICE_CACHE_BYTES)
+        self.reslice_timer = QTimer()
+        self.reslice_timer.setSingleShot(True)
+        self.reslice_timer.setInterval(RESLICE_INTERVAL)
+        self.reslice_timer.timeout.connect(self.reslice)
         self.tiles = None
+        self.base_histograms = OrderedDict()
+        self.shown_histogram = None
+        self.tile_stats = None
         
         self.canvas = Canvas()
+        self.canvas.mpl_connect('button_press_event', self.tile_clicked)
         main_layout = QVBoxLayout(self)
         group_box = QGroupBox("Please select two dimensions to graph and fix the rest dimensions.")
         group_box_layout = QHBoxLayout(group_box)      
@@ -639,13 +826,25 @@ class HistogramMultiDimenWindow(QWidget):
         select_dimen_layout.addRow(QLabel("<b>Percentiles 75th: </b>"))
         select_dimen_layout.addRow(self.percentiles_label_75)
         
+        self.percentile_accuracy_label = QLabel()
+        select_dimen_layout.addRow(QLabel("<b>Percentiles: </b>"), self.percentile_accuracy_label)
+        
         
         self.label1 = QLabel('Select the size of the view (rows and columns):')
         self.row_input = QLineEdit()
         self.row_input.setText(str(self.tensor1.shape[0]))
         self.col_input = QLineEdit()
         self.col_input.setText(str(self.tensor1.shape[1]))
-        self.view_list_combo = QComboBox(self) 
+        self.view_spinbox = QSpinBox(self)
+        self.view_spinbox.setEnabled(False)
+        self.view_spinbox.valueChanged.connect(self.draw_view_histogram)
+        self.view_tile_label = QLabel()
+        self.worst_tile_button = QPushButton("Jump to Worst Tile")
+        self.worst_tile_button.clicked.connect(self.worst_tile_button_clicked)
+        self.tile_statistic_dropdown = QComboBox(self)
+        self.tile_statistic_dropdown.addItems(TILE_OVERVIEW_STATISTICS)
+        self.tile_overview_button = QPushButton("Plot Tile Overview")
+        self.tile_overview_button.clicked.connect(self.tile_overview_button_clicked)
         
         middle_layout = QFormLayout()
         middle_layout.addRow(self.label1)
@@ -655,7 +854,9 @@ class HistogramMultiDimenWindow(QWidget):
         self.graph_view_button = QPushButton("Plot View Size Histogram")
         self.graph_view_button.clicked.connect(self.graph_view_button_clicked)
         middle_layout.addRow(self.graph_view_button)
-        middle_layout.addRow(self.view_list_combo)
+        middle_layout.addRow(self.view_spinbox, self.view_tile_label)
+        middle_layout.addRow(self.worst_tile_button)
+        middle_layout.addRow(self.tile_statistic_dropdown, self.tile_overview_button)
         middle_layout.addRow(self.reset_button)
         self.mean_label_view = QLabel()
         self.median_label_view  = QLabel()
@@ -694,6 +895,9 @@ class HistogramMultiDimenWindow(QWidget):
         middle_layout.addRow(QLabel("<b>Percentiles 75th: </b>"))
         middle_layout.addRow(self.percentiles_label_75_view )
         
+        self.percentile_accuracy_label_view = QLabel()
+        middle_layout.addRow(QLabel("<b>Percentiles: </b>"), self.percentile_accuracy_label_view)
+        
         canvas_layout = QVBoxLayout()
         canvas_layout.addWidget(self.toolbar)
         canvas_layout.addWidget(self.canvas)
@@ -718,17 +922,10 @@ class HistogramMultiDimenWindow(QWidget):
             remaining_axes = [all_axes[dim] for dim in remaining_dimensions]
             fixed_dimensions = dict(zip(remaining_dimensions, remaining_axes))
             tensor1_2d, tensor2_2d= self.slice_2d_tensor(selected_dimensions, fixed_dimensions)
-            self.errors_dict = calculateDifference(tensor1_2d, tensor2_2d).tensor_difference_dict()
+            self.set_errors(tensor1_2d, tensor2_2d, ("slice", tuple(selected_dimensions), tuple(sorted(fixed_dimensions.items()))))
             view_size = self.updateResult()
-            self.tiles= divide_tensor(self.errors_dict[self.dropdown.currentText()].shape, view_size)
-            view_list = []
-            for i in range(len(self.tiles)):
-                view_list.append(f"Tile {i} ({self.tiles[i][2]}x{self.tiles[i][3]})")
-            self.view_list_combo.clear()
-            self.view_list_combo.addItems(view_list)
-            self.view_list_combo.currentIndexChanged.connect(self.update_view_statistics)
+            self.tiles= divide_tensor(tensor1_2d.shape, view_size)
             
-            histogram_data = self.errors_dict[self.dropdown.currentText()]
             if self.bin_size_textbox.text().isdigit():
                 self.bin_size = int(self.bin_size_textbox.text())
                 self.slider.setValue(self.bin_size)
@@ -737,10 +934,7 @@ class HistogramMultiDimenWindow(QWidget):
             else:
                 self.log_base = 0
             
-            self.view_list_combo.currentIndexChanged.connect(lambda index: self.canvas.draw_view_histogram(histogram_data, self.tiles, index, self.bin_size, self.log_base))
-            self.canvas.draw_view_histogram(histogram_data, self.tiles, self.view_list_combo.currentIndex(), self.bin_size, self.log_base)
-            
-            self.update_view_statistics()
+            self.show_tiles()
         
         else:
             QMessageBox.warning(self, "Graph", "Please select exactly two checkboxes and valid view sizes.")
@@ -753,51 +947,160 @@ class HistogramMultiDimenWindow(QWidget):
         view_size = (int(row), int(col))
         return view_size
     
-    def update_statistics(self, text):
+    def compute_histogram(self, errors_dict, text, tile, bin_size, exact, base, progress):
+        data = errors_dict[text]
+        if tile is not None:
+            i, j, rows, cols = tile
+            data = data[i:i+rows, j:j+cols]
+        if base is None:
+            error_statistics = (lambda: errors_dict.error_statistics(text)) if tile is None else None
+            base = errors_dict.cached(("histogram", text, tile), lambda: histogram_base(data, progress, error_statistics))
+        return (errors_dict, text, tile) + compute_histogram(data, bin_size, exact, base, progress)
+    
+    def submit_histogram(self, tile, on_failed):
+        text = self.dropdown.currentText()
+        self.jobs.submit("histogram", self.compute_histogram, self.histogram_ready, self.errors_dict, text, tile, self.bin_size or 10,
+                         self.exact_checkbox.isChecked(), self.base_histograms.get((text, tile)), on_failed=on_failed)
+    
+    def show_tiles(self):
+        self.view_spinbox.blockSignals(True)
+        self.view_spinbox.setRange(0, max(len(self.tiles) - 1, 0) if self.tiles else 0)
+        self.view_spinbox.setValue(0)
+        self.view_spinbox.blockSignals(False)
+        self.view_spinbox.setEnabled(bool(self.tiles))
+        self.view_tile_label.setText("")
+        if self.tiles:
+            self.draw_view_histogram()
+    
+    def worst_tile_button_clicked(self):
+        if self.tiles:
+            self.with_tile_statistics(lambda statistics: self.view_spinbox.setValue(worst_tile(self.tiles, statistics)))
+    
+    def tile_overview_button_clicked(self):
+        if self.tiles:
+            self.with_tile_statistics(lambda statistics: self.canvas.draw_tile_overview(self.tiles, statistics, self.tile_statistic_dropdown.currentText()))
+    
+    def with_tile_statistics(self, on_ready):
+        text = self.dropdown.currentText()
+        if self.tile_stats is not None and self.tile_stats[0] == text and self.tile_stats[1] is self.tiles:
+            on_ready(self.tile_stats[2])
+            return
+        self.jobs.submit("tiles", self.compute_tile_statistics, lambda result: self.tile_statistics_ready(result, on_ready), self.errors_dict, text, self.tiles)
+    
+    def compute_tile_statistics(self, errors_dict, text, tiles, progress):
+        data = errors_dict[text]
+        statistics = errors_dict.cached(("tiles", text, tiles.tile_rows, tiles.tile_cols),
+                                        lambda: tile_statistics(lambda start, stop: data[start:stop], data.shape, (tiles.tile_rows, tiles.tile_cols), PERCENTILES, progress))
+        return text, tiles, statistics
+    
+    def tile_statistics_ready(self, result, on_ready):
+        text, tiles, statistics = result
+        if tiles is self.tiles:
+            self.tile_stats = result
+            on_ready(statistics)
+    
+    def tile_clicked(self, event):
+        tiles = self.canvas.overview_tiles
+        if tiles is None or tiles is not self.tiles or event.inaxes is not self.canvas.axes or self.toolbar.mode or event.xdata is None:
+            return
+        index = tile_at(tiles, event.xdata, event.ydata)
+        if index is None:
+            return
+        if index == self.view_spinbox.value():
+            self.draw_view_histogram()
+        else:
+            self.view_spinbox.setValue(index)
+    
+    def draw_view_histogram(self):
+        index = self.view_spinbox.value()
+        if self.tiles is None or index >= len(self.tiles):
+            return
+        self.view_tile_label.setText(f"of {len(self.tiles)} ({self.tiles[index][2]}x{self.tiles[index][3]})")
+        self.submit_histogram(self.tiles[index], lambda message: self.clean_view_labels())
+    
+    def histogram_ready(self, result):
+        errors_dict, text, tile, counts, edges, base = result
+        if errors_dict is not self.errors_dict:
+            return
+        remember_histogram(self.base_histograms, (text, tile), base)
+        self.shown_histogram = (text, tile)
+        self.canvas.draw_histogram(counts, edges, self.log_base)
+        if tile is None:
+            self.set_statistics(base[1])
+        else:
+            self.set_view_statistics(base[1], (tile[2], tile[3]))
+    
+    def exact_percentiles(self):
+        if self.shown_histogram is not None and self.shown_histogram in self.base_histograms:
+            text, tile = self.shown_histogram
+            self.jobs.submit("statistics", self.compute_exact_statistics, self.exact_statistics_ready, self.errors_dict, text, tile,
+                             self.base_histograms[self.shown_histogram])
+    
+    def compute_exact_statistics(self, errors_dict, text, tile, base, progress):
+        data = errors_dict[text]
+        if tile is not None:
+            i, j, rows, cols = tile
+            data = data[i:i+rows, j:j+cols]
+        base = (base[0], compute_statistics(data, exact=True))
+        return errors_dict, text, tile, errors_dict.store_result(("histogram", text, tile), base)
+    
+    def exact_statistics_ready(self, result):
+        errors_dict, text, tile, base = result
+        if errors_dict is not self.errors_dict:
+            return
+        remember_histogram(self.base_histograms, (text, tile), base)
+        if self.shown_histogram != (text, tile):
+            return
+        if tile is None:
+            self.set_statistics(base[1])
+        else:
+            self.set_view_statistics(base[1], (tile[2], tile[3]))
+    
+    def rebin_histogram(self):
+        # Bin size changes only merge the cached base counts
+        base = self.base_histograms.get(self.shown_histogram)
+        if base is None or self.exact_checkbox.isChecked():
+            return
+        counts, edges = base[0].rebin(self.bin_size)
+        self.canvas.draw_histogram(counts, edges, self.log_base)
+    
+    def redraw_histogram(self):
+        if self.shown_histogram is not None:
+            self.submit_histogram(self.shown_histogram[1], None)
+    
+    def set_errors(self, tensor1_2d, tensor2_2d, spec):
+        results = None if self.results is None else self.results.child(spec)
+        self.errors_dict = calculateDifference(tensor1_2d, tensor2_2d, results=results, cache=self.slice_errors, cache_key=spec).tensor_difference_dict()
+        self.base_histograms.clear()
+        self.shown_histogram = None
+        self.tile_stats = None
+    
+    def set_statistics(self, statistics):
         try:
-            data_tensor = self.errors_dict[text]
-            mean_value = np.mean(data_tensor)
-            median_value = np.median(data_tensor)
-            max_value = np.max(data_tensor)
-            min_value = np.min(data_tensor)
-            std_deviation = np.std(data_tensor)
-            percentiles_25 = np.percentile(data_tensor, 25)
-            percentiles_50 = np.percentile(data_tensor, 50)
-            percentiles_75 = np.percentile(data_tensor, 75)
-
-            self.mean_label.setText(f"{mean_value:.10e}")
-            self.median_label.setText(f"{median_value:.10e}")
-            self.max_label.setText(f"{max_value:.10e}")
-            self.min_label.setText(f"{min_value:.10e}")
-            self.std_label.setText(f"{std_deviation:.10e}")
-            self.percentiles_label_25.setText(f"{percentiles_25:.10e}")
-            self.percentiles_label_50.setText(f"{percentiles_50:.10e}")
-            self.percentiles_label_75.setText(f"{percentiles_75:.10e}")
+            self.mean_label.setText(f"{statistics.mean:.10e}")
+            self.median_label.setText(f"{statistics.median:.10e}")
+            self.max_label.setText(f"{statistics.max:.10e}")
+            self.min_label.setText(f"{statistics.min:.10e}")
+            self.std_label.setText(f"{statistics.std:.10e}")
+            self.percentiles_label_25.setText(f"{statistics.percentiles_25:.10e}")
+            self.percentiles_label_50.setText(f"{statistics.percentiles_50:.10e}")
+            self.percentiles_label_75.setText(f"{statistics.percentiles_75:.10e}")
+            self.percentile_accuracy_label.setText(percentile_accuracy(statistics))
         except:
             self.clean_labels()
     
-    def update_view_statistics(self):
+    def set_view_statistics(self, statistics, shape):
         try:
-            i, j, rows, cols = self.tiles[self.view_list_combo.currentIndex()]
-            self.current_data_tensor = self.errors_dict[self.dropdown.currentText()][i:i+rows, j:j+cols]
-            mean_value = np.mean(self.current_data_tensor)
-            median_value = np.median(self.current_data_tensor)
-            max_value = np.max(self.current_data_tensor)
-            min_value = np.min(self.current_data_tensor)
-            std_deviation = np.std(self.current_data_tensor)
-            percentiles_25 = np.percentile(self.current_data_tensor, 25)
-            percentiles_50 = np.percentile(self.current_data_tensor, 50)
-            percentiles_75 = np.percentile(self.current_data_tensor, 75)
-            
-            self.mean_label_view.setText(f"{mean_value:.10e}")
-            self.median_label_view.setText(f"{median_value:.10e}")
-            self.max_label_view.setText(f"{max_value:.10e}")
-            self.min_label_view.setText(f"{min_value:.10e}")
-            self.std_label_view.setText(f"{std_deviation:.10e}")
-            self.percentiles_label_25_view.setText(f"{percentiles_25:.10e}")
-            self.percentiles_label_50_view.setText(f"{percentiles_50:.10e}")
-            self.percentiles_label_75_view.setText(f"{percentiles_75:.10e}")
-            self.tensor_size_label_view.setText(f"{self.current_data_tensor.shape}")
+            self.mean_label_view.setText(f"{statistics.mean:.10e}")
+            self.median_label_view.setText(f"{statistics.median:.10e}")
+            self.max_label_view.setText(f"{statistics.max:.10e}")
+            self.min_label_view.setText(f"{statistics.min:.10e}")
+            self.std_label_view.setText(f"{statistics.std:.10e}")
+            self.percentiles_label_25_view.setText(f"{statistics.percentiles_25:.10e}")
+            self.percentiles_label_50_view.setText(f"{statistics.percentiles_50:.10e}")
+            self.percentiles_label_75_view.setText(f"{statistics.percentiles_75:.10e}")
+            self.percentile_accuracy_label_view.setText(percentile_accuracy(statistics))
+            self.tensor_size_label_view.setText(f"{shape}")
         except:
             self.clean_view_labels()
     
@@ -810,6 +1113,7 @@ class HistogramMultiDimenWindow(QWidget):
         self.percentiles_label_25.setText("")
         self.percentiles_label_50.setText("")
         self.percentiles_label_75.setText("")
+        self.percentile_accuracy_label.setText("")
     
     def clean_view_labels(self):
         self.mean_label_view.setText("")
@@ -820,6 +1124,7 @@ class HistogramMultiDimenWindow(QWidget):
         self.percentiles_label_25_view.setText("")
         self.percentiles_label_50_view.setText("")
         self.percentiles_label_75_view.setText("")
+        self.percentile_accuracy_label_view.setText("")
         self.tensor_size_label_view.setText("")
     
     def slice_2d_tensor(self, selected_dimensions, fixed_dimensions):
@@ -829,8 +1134,13 @@ class HistogramMultiDimenWindow(QWidget):
             if i not in selected_dimensions: 
                 indices[i] = fixed_dimensions[i]
         
+        # Integers and full slices only, so these are strided views of the
+        # (memory-mapped) inputs and nothing is copied
         tensor1_2d = self.tensor1[tuple(indices)]
         tensor2_2d = self.tensor2[tuple(indices)]
+        if selected_dimensions[0] > selected_dimensions[1]:
+            # Rows follow the first selected dimension, the transpose is a view too
+            return tensor1_2d.T, tensor2_2d.T
         return tensor1_2d, tensor2_2d
     
     def create_widgets(self):
@@ -841,11 +1151,8 @@ class HistogramMultiDimenWindow(QWidget):
             checkbox.stateChanged.connect(lambda state, checkbox=checkbox: self.checkbox_changed(checkbox))
             self.checkboxes.append(checkbox)
             
-            dropdown = QComboBox()
-            for j in range(tensor_shape[i]):
-                dropdown.addItem(f"Index {j}")
+            dropdown = IndexSelector(tensor_shape[i])
             dropdown.currentIndexChanged.connect(lambda index, checkbox=checkbox: self.dropdown_changed(index, checkbox))
-            dropdown.setCurrentIndex(0)
             self.axis_dropdowns.append(dropdown)
         
         self.slider = QSlider(Qt.Orientation.Horizontal)
@@ -871,6 +1178,15 @@ class HistogramMultiDimenWindow(QWidget):
         self.log_checkbox = QCheckBox('Logarithmic Scale Base 10')
         self.log_checkbox.stateChanged.connect(self.update_log_base)
         
+        self.exact_checkbox = QCheckBox('Exact Binning')
+        self.exact_checkbox.stateChanged.connect(self.redraw_histogram)
+        
+        self.exact_percentiles_button = QPushButton('Exact Percentiles')
+        self.exact_percentiles_button.clicked.connect(self.exact_percentiles)
+        
+        self.progress_bar = QProgressBar()
+        self.jobs = JobRunner(self.progress_bar)
+        
         self.toolbar = CustomNavigationToolbar(self.canvas, self)
     
     def create_layout(self):
@@ -880,8 +1196,11 @@ class HistogramMultiDimenWindow(QWidget):
         layout.addRow(self.slider)
         layout.addRow(self.bin_size_textbox)
         layout.addRow(self.log_checkbox)
+        layout.addRow(self.exact_checkbox)
+        layout.addRow(self.exact_percentiles_button)
         layout.addRow(self.reset_button, self.dropdown)
         layout.addRow(self.graph_button)
+        layout.addRow(self.progress_bar)
         return layout
     
     def update_log_base(self):
@@ -895,9 +1214,10 @@ class HistogramMultiDimenWindow(QWidget):
     
     def update_bin_size_textbox(self):
         bin_size_text = self.bin_size_textbox.text()
-        if bin_size_text.isdigit():
+        if bin_size_text.isdigit() and int(bin_size_text) > 0:
             self.bin_size = int(bin_size_text)
             self.slider.setValue(self.bin_size)
+            self.rebin_histogram()
     
     def checkbox_changed(self, checkbox):
         if checkbox.isChecked():
@@ -929,8 +1249,16 @@ class HistogramMultiDimenWindow(QWidget):
     def dropdown_changed(self, index, checkbox):
         if index != 0:
             checkbox.setChecked(False)  # Uncheck the associated checkbox
+        # While an index is scrubbed the plotted slice follows once it settles
+        if len(self.errors_dict) > 0:
+            self.reslice_timer.start()
+    
+    def reslice(self):
+        if len(self.errors_dict) > 0 and len(self.selected_checkboxes) == 2:
+            self.graph_button_clicked()
     
     def graph_button_clicked(self):
+        self.reslice_timer.stop()
         if len(self.selected_checkboxes) == 2:
             selected_dimensions = []
             for checkbox in self.selected_checkboxes:
@@ -944,27 +1272,35 @@ class HistogramMultiDimenWindow(QWidget):
             remaining_axes = [all_axes[dim] for dim in remaining_dimensions]
             fixed_dimensions = dict(zip(remaining_dimensions, remaining_axes))
             tensor1_2d, tensor2_2d= self.slice_2d_tensor(selected_dimensions, fixed_dimensions)
-            self.errors_dict = calculateDifference(tensor1_2d, tensor2_2d).tensor_difference_dict()
-            self.canvas.draw_histogram(self.dropdown.currentText(), self.errors_dict, self.bin_size, self.log_base)
-            self.update_statistics(self.dropdown.currentText())
+            self.set_errors(tensor1_2d, tensor2_2d, ("slice", tuple(selected_dimensions), tuple(sorted(fixed_dimensions.items()))))
+            self.draw_histogram()
         else:
             QMessageBox.warning(self, "Graph", "Please select exactly two checkboxes.")
     
+    def draw_histogram(self):
+        self.submit_histogram(None, lambda message: self.clean_labels())
+    
     def reset_button_clicked(self):
+        self.jobs.cancel_all()
+        self.reslice_timer.stop()
         for checkbox in self.checkboxes:
             checkbox.setChecked(False)
         for dropdown in self.axis_dropdowns:
             dropdown.setEnabled(True)
             dropdown.setCurrentIndex(0)
+        self.shown_histogram = None
         self.log_checkbox.setChecked(False)
+        self.exact_checkbox.setChecked(False)
         self.dropdown.setCurrentIndex(0)
         self.selected_checkboxes.clear()
         self.clean_labels()
         self.errors_dict = {}
+        self.base_histograms.clear()
+        self.tiles = None
+        self.show_tiles()
         self.slider.setValue(10)
         self.canvas.clear_canvas()
     
     def reset_graph(self):
         self.canvas.clear_canvas()
-        self.canvas.draw_histogram(self.dropdown.currentText(), self.errors_dict, self.bin_size, self.log_base)
-        self.update_statistics(self.dropdown.currentText())
\ No newline at end of file
+        self.draw_histogram()
\ No newline at end of file
@@ -0,0 +1,75 @@
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QGuiApplication
+
+
+def frame_interval():
+    screen = QGuiApplication.primaryScreen()
+    rate = screen.refreshRate() if screen is not None else 0
+    return max(1, int(1000 / (rate or 60)))
+
+
+class HoverAnnotation:
+    # One per canvas, it survives redraws. Mouse moves are coalesced to at
+    # most one lookup per display frame, and lookup(xdata, ydata) maps the
+    # data coordinates straight to array indices, returning (text, xy) or None,
+    # so nothing is ever picked against artists. The annotation is an overlay
+    # of the canvas' RedrawEngine, moving it is a blit and never a redraw.
+    def __init__(self, canvas, redraw):
+        self.canvas = canvas
+        self.redraw = redraw
+        self.axes = None
+        self.lookup = None
+        self.annotation = None
+        self.event = None
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(frame_interval())
+        self.timer.timeout.connect(self.update)
+        canvas.mpl_connect('motion_notify_event', self.mouse_moved)
+        canvas.mpl_connect('axes_leave_event', self.mouse_moved)
+
+    def attach(self, axes, lookup):
+        self.axes = axes
+        self.lookup = lookup
+        self.annotation = axes.annotate("", xy=(0, 0), xytext=(15, 15), textcoords="offset points",
+                                        bbox=dict(boxstyle="round", fc="w", alpha=0.9),
+                                        arrowprops=dict(arrowstyle="->"), annotation_clip=False)
+        self.annotation.set_visible(False)
+        self.redraw.add_overlay(self.annotation)
+
+    def detach(self):
+        self.timer.stop()
+        if self.annotation is not None:
+            self.redraw.remove_overlay(self.annotation)
+            if self.annotation in self.axes.texts:
+                self.annotation.remove()
+        self.axes = None
+        self.lookup = None
+        self.annotation = None
+        self.event = None
+
+    def mouse_moved(self, event):
+        self.event = event
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def update(self):
+        event = self.event
+        if self.annotation is None or event is None:
+            return
+        result = None
+        if event.inaxes is self.axes and event.xdata is not None and event.ydata is not None:
+            try:
+                result = self.lookup(event.xdata, event.ydata)
+            except Exception as e:
+                print("Error reading hover values:", e)
+        if result is None:
+            if self.annotation.get_visible():
+                self.annotation.set_visible(False)
+                self.redraw.blit_overlays()
+            return
+        text, xy = result
+        self.annotation.xy = xy
+        self.annotation.set_text(text)
+        self.annotation.set_visible(True)
+        self.redraw.blit_overlays()
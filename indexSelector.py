@@ -0,0 +1,47 @@
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtWidgets import QHBoxLayout, QSlider, QSpinBox, QWidget
+
+# Pause in scrubbing after which the multidimensional windows re-slice
+RESLICE_INTERVAL = 150
+
+
+class IndexSelector(QWidget):
+    # Picks one index along an axis with a spin box and a slider, so an axis
+    # with a million indices costs the same two widgets as one with ten.
+    # Offers the parts of QComboBox the windows use.
+    currentIndexChanged = pyqtSignal(int)
+
+    def __init__(self, size, parent=None):
+        super().__init__(parent)
+        last = max(size - 1, 0)
+        self.spinbox = QSpinBox()
+        self.spinbox.setRange(0, last)
+        self.spinbox.setPrefix("Index ")
+        # Typed numbers only count once they are entered
+        self.spinbox.setKeyboardTracking(False)
+        self.slider = QSlider(Qt.Orientation.Horizontal)
+        self.slider.setRange(0, last)
+        self.slider.setPageStep(max(1, size // 100))
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.spinbox)
+        layout.addWidget(self.slider)
+
+        self.spinbox.valueChanged.connect(self.spinbox_changed)
+        self.slider.valueChanged.connect(self.spinbox.setValue)
+
+    def spinbox_changed(self, index):
+        self.slider.blockSignals(True)
+        self.slider.setValue(index)
+        self.slider.blockSignals(False)
+        self.currentIndexChanged.emit(index)
+
+    def currentIndex(self):
+        return self.spinbox.value()
+
+    def setCurrentIndex(self, index):
+        self.spinbox.setValue(index)
+
+    def count(self):
+        return self.spinbox.maximum() + 1
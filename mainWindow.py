@@ -1,9 +1,8 @@
 import sys
-import torch
 import numpy as np
-from PyQt6.QtWidgets import QApplication, QMainWindow, QSizePolicy, QWidget, QHBoxLayout, QVBoxLayout, QLabel, QFileDialog, QLineEdit, QPushButton, QFileDialog, QMessageBox
-from heatmapWindow import Heatmap2DimenWindow, HeatmapMultiDimenWindow
-from histogramWindow import Histogram2DimenWindow,  HistogramMultiDimenWindow
+from PyQt6.QtWidgets import QApplication, QMainWindow, QSizePolicy, QWidget, QHBoxLayout, QVBoxLayout, QLabel, QFileDialog, QLineEdit, QPushButton, QFileDialog, QMessageBox, QCheckBox
+from resultCache import ResultCache
+from tensorDifference import is_numeric
 
 class MainWindow(QMainWindow):
     def __init__(self, file1_path=None, file2_path=None):
@@ -11,6 +10,8 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("File Value Extractor")
         self.tensor1= None
         self.tensor2= None
+        self.results = None
+        self.result_cache = ResultCache()
         
         self.file1_label = QLabel("File 1:")
         self.file1_lineedit = QLineEdit()
@@ -23,6 +24,12 @@ class MainWindow(QMainWindow):
         self.heatmap_button = QPushButton("Graph Heatmap")
         self.histogram_button = QPushButton("Graph Histogram")
         
+        self.lazy_load_checkbox = QCheckBox("Lazy Loading (memory-map files)")
+        self.lazy_load_checkbox.setChecked(True)
+        
+        self.cache_results_checkbox = QCheckBox("Cache Results on Disk")
+        self.cache_results_checkbox.setChecked(False)
+        
         self.layout = QVBoxLayout()
         
         file1_layout = QHBoxLayout()
@@ -37,6 +44,8 @@ class MainWindow(QMainWindow):
         
         self.layout.addLayout(file1_layout)
         self.layout.addLayout(file2_layout)
+        self.layout.addWidget(self.lazy_load_checkbox)
+        self.layout.addWidget(self.cache_results_checkbox)
         self.layout.addWidget(self.heatmap_button)
         self.layout.addWidget(self.histogram_button)
         
@@ -61,24 +70,27 @@ class MainWindow(QMainWindow):
         if self.heatmap_window is not None:
                 self.heatmap_window.close()
         if self.extract_values():
+            # Plotting modules load on first use so the file picker shows up fast
+            from heatmapWindow import Heatmap2DimenWindow, HeatmapMultiDimenWindow
             if self.tensor1.ndim == 2:
                 print("2d heatmap graph")
-                self.heatmap_window = Heatmap2DimenWindow(self.tensor1, self.tensor2)
+                self.heatmap_window = Heatmap2DimenWindow(self.tensor1, self.tensor2, results=self.results)
                 self.heatmap_window.show()
             else:
-                self.heatmap_window = HeatmapMultiDimenWindow(self.tensor1, self.tensor2)
+                self.heatmap_window = HeatmapMultiDimenWindow(self.tensor1, self.tensor2, results=self.results)
                 self.heatmap_window.show()
     
     def open_histogram_window(self):
         if self.histogram_window is not None:
                 self.histogram_window.close()
         if self.extract_values():
+            from histogramWindow import Histogram2DimenWindow,  HistogramMultiDimenWindow
             if self.tensor1.ndim == 2:
                 print("2d histogram graph")
-                self.histogram_window = Histogram2DimenWindow(self.tensor1, self.tensor2)
+                self.histogram_window = Histogram2DimenWindow(self.tensor1, self.tensor2, results=self.results)
                 self.histogram_window.show()
             else:
-                self.histogram_window = HistogramMultiDimenWindow(self.tensor1, self.tensor2)
+                self.histogram_window = HistogramMultiDimenWindow(self.tensor1, self.tensor2, results=self.results)
                 self.histogram_window.show()
     
     def browse_file1(self):
@@ -102,16 +114,24 @@ class MainWindow(QMainWindow):
             return
         
         try:
-            data1 = np.load(file1_path)
-            data2 = np.load(file2_path)
+            # With lazy loading only the .npy headers are read here, pages are
+            # faulted in when a window slices or reduces the data.
+            mmap_mode = 'r' if self.lazy_load_checkbox.isChecked() else None
+            data1 = np.load(file1_path, mmap_mode=mmap_mode)
+            data2 = np.load(file2_path, mmap_mode=mmap_mode)
             
             if data1.shape != data2.shape:
                 QMessageBox.critical(self, "Error", "Tensor sizes are not the same.")
                 return
+            if not (is_numeric(data1.dtype) and is_numeric(data2.dtype)):
+                QMessageBox.critical(self, "Error", f"Tensor dtypes must be numeric, got {data1.dtype} and {data2.dtype}.")
+                return
             
             print("data1.shape", data1.shape)
-            self.tensor1 = torch.from_numpy(data1)
-            self.tensor2 = torch.from_numpy(data2)
+            self.tensor1 = data1
+            self.tensor2 = data2
+            # Results are keyed by the content of both files, hashed on first use
+            self.results = self.result_cache.pair(file1_path, file2_path) if self.cache_results_checkbox.isChecked() else None
             return True
         except FileNotFoundError:
             QMessageBox.critical(self, "Error", "File not found.")
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import numpy as np
+from tensorDifference import SliceSummary, StreamedErrors, TopErrors
+from tensorHistogram import StreamingHistogram
+from tensorStatistics import TensorStatistics
+from tensorTiles import TileStatistics
+
+RESULT_CACHE_DIRECTORY = os.environ.get("TENSOR_DIFF_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "tensorDiffGraphing"))
+RESULT_CACHE_BYTES = 2 * 2 ** 30
+# Bumped whenever a cached result changes meaning, old entries then age out
+RESULT_CACHE_VERSION = 3
+HASH_CHUNK_BYTES = 16 * 2 ** 20
+# Content hashes remembered per file path, size and modification time
+MAX_FINGERPRINTS = 1024
+FINGERPRINTS_FILE = "fingerprints.json"
+# Results other than arrays are rebuilt as one of these, nothing else is read back
+RESULT_TYPES = {result_type.__name__: result_type for result_type in
+                (SliceSummary, StreamedErrors, TopErrors, TensorStatistics, TileStatistics)}
+
+
+def entry_name(name):
+    if isinstance(name, tuple):
+        name = "-".join(str(part) for part in name)
+    return re.sub(r"[^\w.-]+", "_", name)
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def encode(value, arrays):
+    # JSON layout of a result, its arrays and NumPy scalars numbered into arrays
+    if isinstance(value, (np.ndarray, np.generic)):
+        arrays.append(np.asarray(value))
+        return {"array": len(arrays) - 1}
+    if isinstance(value, StreamingHistogram):
+        return {"histogram": encode(vars(value), arrays)}
+    if isinstance(value, tuple(RESULT_TYPES.values())):
+        return {"type": type(value).__name__, "fields": [encode(field, arrays) for field in value]}
+    if isinstance(value, (tuple, list)):
+        return {type(value).__name__: [encode(item, arrays) for item in value]}
+    if isinstance(value, dict):
+        return {"dict": [[encode(key, arrays), encode(item, arrays)] for key, item in value.items()]}
+    if isinstance(value, float):
+        # repr keeps nan and inf, which JSON has no numbers for
+        return {"float": repr(value)}
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    raise TypeError(f"Cannot cache a {type(value).__name__} result")
+
+
+def decode(layout, arrays):
+    if not isinstance(layout, dict):
+        return layout
+    if "array" in layout:
+        array = arrays[f"array{layout['array']}"]
+        return array[()] if array.ndim == 0 else array
+    if "histogram" in layout:
+        histogram = StreamingHistogram()
+        vars(histogram).update(decode(layout["histogram"], arrays))
+        return histogram
+    if "type" in layout:
+        return RESULT_TYPES[layout["type"]](*(decode(field, arrays) for field in layout["fields"]))
+    if "tuple" in layout:
+        return tuple(decode(item, arrays) for item in layout["tuple"])
+    if "list" in layout:
+        return [decode(item, arrays) for item in layout["list"]]
+    if "dict" in layout:
+        return {decode(key, arrays): decode(item, arrays) for key, item in layout["dict"]}
+    return float(layout["float"])
+
+
+def save_result(file, value):
+    arrays = []
+    layout = encode(value, arrays)
+    np.savez(file, layout=np.array(json.dumps(layout)), **{f"array{index}": array for index, array in enumerate(arrays)})
+
+
+def load_result(path):
+    # Nothing in the file is unpickled, only plain arrays and the JSON layout
+    with np.load(path, allow_pickle=False) as arrays:
+        return decode(json.loads(str(arrays["layout"])), arrays)
+
+
+def digest(*parts):
+    return hashlib.blake2b("\0".join(str(part) for part in parts).encode(), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    # Results live under directory/<key>/, one .npy (memory-mapped on load) or
+    # .npz file per result. Loads touch the file, so modification times order
+    # the entries for least recently used eviction. The directory is walked
+    # once for its size, then stores keep a running total and only going
+    # over max_bytes walks it again to evict.
+    def __init__(self, directory=RESULT_CACHE_DIRECTORY, max_bytes=RESULT_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self.fingerprints = None
+        self.total_bytes = None
+
+    def load_fingerprints(self):
+        if self.fingerprints is None:
+            try:
+                with open(os.path.join(self.directory, FINGERPRINTS_FILE)) as file:
+                    self.fingerprints = json.load(file)
+            except (OSError, ValueError):
+                self.fingerprints = {}
+        return self.fingerprints
+
+    def file_hash(self, path):
+        # A file is only read again after its size or modification time changes
+        stat = os.stat(path)
+        fingerprint = f"{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        with self.lock:
+            content_hash = self.load_fingerprints().get(fingerprint)
+        if content_hash is not None:
+            return content_hash
+
+        content = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(HASH_CHUNK_BYTES), b""):
+                content.update(block)
+        content_hash = content.hexdigest()
+        with self.lock:
+            fingerprints = self.load_fingerprints()
+            fingerprints[fingerprint] = content_hash
+            while len(fingerprints) > MAX_FINGERPRINTS:
+                fingerprints.pop(next(iter(fingerprints)))
+            try:
+                self.write(FINGERPRINTS_FILE, lambda file: file.write(json.dumps(fingerprints).encode()))
+            except OSError as e:
+                print("Error writing result cache:", e)
+        return content_hash
+
+    def pair(self, path_a, path_b):
+        # Order matters, the relative error divides by the first tensor
+        return CachedResults(self, lambda: digest(RESULT_CACHE_VERSION, self.file_hash(path_a), self.file_hash(path_b)))
+
+    def write(self, relative_path, write_file):
+        # Written next to the target and renamed, readers never see partial files
+        path = os.path.join(self.directory, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                write_file(file)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return path
+
+    def load(self, key, name):
+        path = os.path.join(self.directory, key, entry_name(name))
+        try:
+            if os.path.exists(path + ".npy"):
+                os.utime(path + ".npy")
+                return np.load(path + ".npy", mmap_mode="r")
+            if os.path.exists(path + ".npz"):
+                os.utime(path + ".npz")
+                return load_result(path + ".npz")
+        except Exception as e:
+            print("Error reading result cache:", e)
+        return None
+
+    def store(self, key, name, value):
+        # Arrays come back memory-mapped from the cache file, so the caller can
+        # drop its own copy; a failed write only costs the caching
+        relative_path = os.path.join(key, entry_name(name)) + (".npy" if isinstance(value, np.ndarray) else ".npz")
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self.entries())
+        try:
+            replaced = file_size(os.path.join(self.directory, relative_path))
+            if isinstance(value, np.ndarray):
+                path = self.write(relative_path, lambda file: np.save(file, value))
+                value = np.load(path, mmap_mode="r")
+            else:
+                path = self.write(relative_path, lambda file: save_result(file, value))
+            added = file_size(path) - replaced
+        except Exception as e:
+            print("Error writing result cache:", e)
+            return value
+        with self.lock:
+            self.total_bytes += added
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+        return value
+
+    def entries(self):
+        # (modification time, size, path) of every cached result
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name == FINGERPRINTS_FILE or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        with self.lock:
+            # Walked again, other processes may share the directory
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    # Memory maps of a removed file stay valid until they are closed
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    continue
+                try:
+                    os.rmdir(os.path.dirname(path))
+                except OSError:
+                    pass
+            self.total_bytes = total
+
+
+class CachedResults:
+    # The results of one pair of files, or of a slice of it. The key may hash
+    # both files, so it is only worked out on first use, off the GUI thread.
+    def __init__(self, cache, make_key):
+        self.cache = cache
+        self.make_key = make_key
+        self.key_value = None
+        self.lock = threading.Lock()
+
+    def key(self):
+        with self.lock:
+            if self.key_value is None:
+                self.key_value = self.make_key()
+            return self.key_value
+
+    def child(self, spec):
+        return CachedResults(self.cache, lambda: digest(self.key(), spec))
+
+    def load(self, name):
+        try:
+            key = self.key()
+        except OSError as e:
+            print("Error reading result cache:", e)
+            return None
+        return self.cache.load(key, name)
+
+    def store(self, name, value):
+        try:
+            key = self.key()
+        except OSError as e:
+            print("Error writing result cache:", e)
+            return value
+        return self.cache.store(key, name, value)
@@ -0,0 +1,507 @@
+import functools
+import os
+import threading
+import warnings
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from heatmapDownsample import HEATMAP_DOWNSAMPLE_SHAPE, REDUCTIONS, level_for, reduce_blocks
+from fusedErrors import FUSED_BLOCK_ELEMENTS, FusedSweep
+from tensorHistogram import StreamingHistogram, histogram
+from tensorStatistics import EXACT_STATISTICS_ELEMENTS, StatisticsAccumulator, compute_statistics, select_percentiles
+
+ERROR_METRICS = ("Tensor Difference", "L1 Error", "L2 Error", "Relative Error")
+
+# Three metric arrays, enough to flip between dropdown entries
+DEFAULT_CACHED_ARRAYS = 3
+# Metric arrays of recently graphed slices kept by the multidimensional windows
+SLICE_CACHE_BYTES = 2 ** 30
+
+# Inputs larger than this are diffed chunk by chunk instead of materializing errors
+STREAMING_THRESHOLD_BYTES = 2 ** 30
+STREAMING_CHUNK_BYTES = 64 * 2 ** 20
+# NumPy and torch release the GIL inside their kernels, so plain threads scale
+STREAMING_WORKERS = os.cpu_count() or 1
+
+# "numpy", or "torch" to subtract with torch; torch is only imported when chosen
+TENSOR_BACKEND = os.environ.get("TENSOR_DIFF_BACKEND", "numpy")
+
+# "float32" or "float64" for the metric arrays; unset keeps the inputs'
+# precision, with half precision and integers widened to at least float32
+ACCUMULATION_DTYPE = os.environ.get("TENSOR_DIFF_DTYPE") or None
+# Metrics are filled a block of leading rows at a time, so the in-place passes
+# after the subtraction find the block still in cache
+METRIC_BLOCK_ELEMENTS = 2 ** 18
+
+# heatmaps holds the overview level of the heatmap pyramid for every reduction
+StreamedErrors = namedtuple("StreamedErrors", ["statistics", "histogram", "heatmaps"])
+# One row of N-D indices per element, worst first, with the magnitude it was ranked by
+TopErrors = namedtuple("TopErrors", ["indices", "scores"])
+# Reductions of every 2D slice over the selected axes, indexed by the fixed dimensions in order
+SliceSummary = namedtuple("SliceSummary", ["fixed_dimensions", "max", "mean", "rms"])
+
+
+def as_torch_tensor(tensor):
+    import torch
+    if isinstance(tensor, torch.Tensor):
+        return tensor
+    with warnings.catch_warnings():
+        # Memory-mapped inputs are read-only, torch only ever reads from them
+        warnings.simplefilter("ignore", UserWarning)
+        return torch.from_numpy(np.asarray(tensor))
+
+
+def is_bfloat16(dtype):
+    # Without ml_dtypes registered, bfloat16 .npy files load as raw 2-byte records
+    return dtype.name == "bfloat16" or (dtype.kind == "V" and dtype.itemsize == 2 and dtype.fields is None)
+
+
+def is_numeric(dtype):
+    return np.issubdtype(dtype, np.number) or is_bfloat16(dtype)
+
+
+def as_float(values):
+    # Raw bfloat16 bits are the upper half of a float32, decoded per block
+    values = np.asarray(values)
+    if values.dtype.kind == "V" and is_bfloat16(values.dtype):
+        return (values.view(np.uint16).astype(np.uint32) << 16).view(np.float32)
+    return values
+
+
+def accumulation_dtype(dtype_a, dtype_b, requested=None):
+    if requested is not None:
+        return np.dtype(requested)
+    widened = [np.dtype(np.float32) if is_bfloat16(dtype) else np.result_type(dtype, np.float32) for dtype in (dtype_a, dtype_b)]
+    return np.result_type(*widened)
+
+
+def metric_blocks(shape, block_elements=METRIC_BLOCK_ELEMENTS):
+    if len(shape) == 0:
+        yield ...
+        return
+    rows = max(1, block_elements // max(1, int(np.prod(shape[1:]))))
+    for start in range(0, shape[0], rows):
+        yield slice(start, start + rows)
+
+
+def finish_metric(metric, value_a, out):
+    # Turns the difference in out into the metric without another array.
+    # |d| / |a| is computed as |d / a|, which rounds the same.
+    if metric == "L1 Error":
+        np.abs(out, out=out)
+    elif metric == "L2 Error":
+        np.square(out, out=out)
+    elif metric == "Relative Error":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(out, value_a, out=out, dtype=np.result_type(out, value_a))
+        np.abs(out, out=out)
+        out *= 100
+
+
+def largest(scores, k):
+    # Positions and values of the k largest scores, NaN ranks below everything
+    scores[np.isnan(scores)] = -np.inf
+    if scores.size > k:
+        positions = np.argpartition(scores, scores.size - k)[scores.size - k:]
+    else:
+        positions = np.arange(scores.size)
+    return positions, scores[positions]
+
+
+class ArrayCache:
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.arrays = OrderedDict()
+        self.nbytes = 0
+        # Shared between the differences of several slices and their jobs
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.arrays
+
+    def get(self, key):
+        with self.lock:
+            array = self.arrays.get(key)
+            if array is not None:
+                self.arrays.move_to_end(key)
+            return array
+
+    def put(self, key, array):
+        with self.lock:
+            if key in self.arrays:
+                self.nbytes -= self.arrays.pop(key).nbytes
+            self.arrays[key] = array
+            self.nbytes += array.nbytes
+            self.evict()
+
+    def evict(self):
+        if self.max_bytes is None:
+            return
+        # The newest entry always stays, even when it alone exceeds the budget
+        while self.nbytes > self.max_bytes and len(self.arrays) > 1:
+            _, evicted = self.arrays.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.arrays.clear()
+            self.nbytes = 0
+
+
+class LazyErrorDict(Mapping):
+    def __init__(self, difference):
+        self.difference = difference
+
+    def __getitem__(self, metric):
+        return self.difference.error(metric)
+
+    def __iter__(self):
+        return iter(ERROR_METRICS)
+
+    def __len__(self):
+        return len(ERROR_METRICS)
+
+    def values_at(self, index):
+        return self.difference.values_at(index)
+
+    def cached(self, name, compute):
+        return self.difference.cached(name, compute)
+
+    def store_result(self, name, value):
+        return self.difference.store_result(name, value)
+
+    def error_statistics(self, metric, progress=None):
+        return self.difference.error_statistics(metric, progress)
+
+
+def torch_available():
+    try:
+        import torch
+    except ImportError:
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_backend(backend):
+    # Checked once per backend name, so a missing torch is looked for and reported once
+    if backend == "torch" and not torch_available():
+        print("torch is not installed, falling back to the numpy backend")
+        return "numpy"
+    return backend
+
+
+class calculateDifference:
+    def __init__(self, tensor_a, tensor_b, max_cache_bytes=None, results=None, backend=None, dtype=None, cache=None, cache_key=None):
+        self.tensor_a = tensor_a
+        self.tensor_b = tensor_b
+        self.array_a = np.asarray(tensor_a)
+        self.array_b = np.asarray(tensor_b)
+        self.backend = resolve_backend(backend or TENSOR_BACKEND)
+        self.requested_dtype = dtype or ACCUMULATION_DTYPE
+        self.dtype = accumulation_dtype(self.array_a.dtype, self.array_b.dtype, self.requested_dtype)
+        if results is not None and self.requested_dtype is not None:
+            results = results.child(("dtype", self.dtype.name))
+        # A cache shared by several differences tells their arrays apart by cache_key
+        self.cache = ArrayCache(max_cache_bytes) if cache is None else cache
+        self.cache_key = cache_key
+        # Optional on-disk CachedResults of this pair, shared across sessions
+        self.results = results
+        self.streamed = {}
+        self.fused = None
+        # Background jobs may compute metrics while the GUI thread reads them
+        self.lock = threading.RLock()
+
+    def load_result(self, name):
+        if self.results is None:
+            return None
+        return self.results.load(name)
+
+    def store_result(self, name, value):
+        if self.results is None:
+            return value
+        return self.results.store(name, value)
+
+    def cached(self, name, compute):
+        value = self.load_result(name)
+        if value is None:
+            value = self.store_result(name, compute())
+        return value
+
+    def cache_name(self, metric):
+        return metric if self.cache_key is None else (self.cache_key, metric)
+
+    def tensor_diff(self):
+        return self.error("Tensor Difference")
+
+    def l1_loss(self):
+        return self.error("L1 Error")
+
+    def l2_loss(self):
+        return self.error("L2 Error")
+
+    def relative_error(self):
+        return self.error("Relative Error")
+
+    def compute_error(self, metric):
+        # Every metric is built from the inputs inside its own output array:
+        # the difference is written with out= and then transformed in place,
+        # so the only full-size allocation is the result. Half precision
+        # inputs are widened by the ufunc one buffer at a time, never whole.
+        out = np.empty(self.array_a.shape, dtype=self.dtype)
+        for block in metric_blocks(out.shape):
+            value_a = as_float(self.array_a[block])
+            value_b = as_float(self.array_b[block])
+            if self.backend == "torch":
+                difference = (as_torch_tensor(value_a) - as_torch_tensor(value_b)).numpy()
+                np.copyto(out[block], difference, casting="same_kind")
+            else:
+                np.subtract(value_a, value_b, out=out[block], dtype=np.result_type(value_a, value_b, out))
+            finish_metric(metric, value_a, out[block])
+        return out
+
+    def error(self, metric):
+        if metric not in ERROR_METRICS:
+            raise KeyError(metric)
+        with self.lock:
+            error = self.cache.get(self.cache_name(metric))
+            if error is None:
+                error = self.cached(metric, lambda: self.compute_error(metric))
+                if self.cache.max_bytes is None:
+                    self.cache.max_bytes = DEFAULT_CACHED_ARRAYS * error.nbytes
+            self.cache.put(self.cache_name(metric), error)
+            return error
+
+    def error_statistics(self, metric, progress=None, workers=STREAMING_WORKERS):
+        # Small inputs get exact statistics from a partition of the metric,
+        # larger ones read them off the fused sweep, which gives the
+        # statistics of the other three metrics for free
+        if self.array_a.size <= EXACT_STATISTICS_ELEMENTS:
+            return compute_statistics(self.error(metric))
+        return self.fused_errors(metric, progress, workers)[metric].statistics
+
+    def fused_errors(self, keep=None, progress=None, workers=STREAMING_WORKERS, chunk_bytes=STREAMING_CHUNK_BYTES):
+        # Statistics and base histograms of every metric from one read of both
+        # inputs, also filling the array of metric keep if it is not cached yet
+        with self.lock:
+            if self.fused is None:
+                self.fused = self.cached("fused", lambda: self.sweep_errors(keep, progress, workers, chunk_bytes))
+            return self.fused
+
+    def sweep_errors(self, keep, progress, workers, chunk_bytes):
+        shape = self.array_a.shape
+        kept = None
+        if keep is not None and self.cache.get(self.cache_name(keep)) is None:
+            kept = self.load_result(keep)
+            if kept is not None:
+                self.cache.put(self.cache_name(keep), kept)
+                kept = None
+            else:
+                kept = np.empty(shape, dtype=self.dtype)
+
+        def sweep_chunk(start):
+            stop = start + step
+            sweep = FusedSweep(self.dtype)
+            chunk_a = self.array_a[start:stop]
+            chunk_b = self.array_b[start:stop]
+            for block in metric_blocks(chunk_a.shape, FUSED_BLOCK_ELEMENTS):
+                sweep.update(as_float(chunk_a[block]), as_float(chunk_b[block]),
+                             ERROR_METRICS.index(keep) if kept is not None else None,
+                             kept[start:stop][block].reshape(-1) if kept is not None else None)
+            return sweep
+
+        step = self.chunk_rows(chunk_bytes)
+        starts = range(0, shape[0], step)
+        sweep = FusedSweep(self.dtype)
+        # Chunks are swept in parallel and merged in order, as in stream_errors
+        executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(starts))))
+        try:
+            for done, partial in enumerate(executor.map(sweep_chunk, starts), 1):
+                sweep.merge(partial)
+                if progress is not None:
+                    progress(100 * done // len(starts))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        if kept is not None:
+            kept = self.store_result(keep, kept)
+            if self.cache.max_bytes is None:
+                self.cache.max_bytes = DEFAULT_CACHED_ARRAYS * kept.nbytes
+            self.cache.put(self.cache_name(keep), kept)
+        return {metric: StreamedErrors(statistics, histogram, None) for metric, (statistics, histogram) in zip(ERROR_METRICS, sweep.results())}
+
+    def top_errors(self, metric, k, chunk_bytes=STREAMING_CHUNK_BYTES, workers=STREAMING_WORKERS, progress=None):
+        # The k elements with the largest error magnitude over the whole tensor.
+        # Every chunk keeps its own k best with argpartition, so only k
+        # candidates per chunk are merged, in order, as the chunks finish.
+        ranked = "L1 Error" if metric == "Tensor Difference" else metric
+        shape = self.array_a.shape
+        row_size = int(np.prod(shape[1:]))
+        step = self.chunk_rows(chunk_bytes)
+        starts = range(0, shape[0], step)
+
+        def chunk_top(start):
+            scores = calculateDifference(self.array_a[start:start + step], self.array_b[start:start + step], max_cache_bytes=0,
+                                         backend=self.backend, dtype=self.requested_dtype).error(ranked).reshape(-1)
+            positions, values = largest(scores, k)
+            return positions + start * row_size, values
+
+        best_positions = np.empty(0, dtype=np.intp)
+        best_scores = np.empty(0, dtype=self.dtype)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(starts))))
+        try:
+            for done, (positions, scores) in enumerate(executor.map(chunk_top, starts), 1):
+                best_positions = np.concatenate((best_positions, positions))
+                best_scores = np.concatenate((best_scores, scores))
+                kept, best_scores = largest(best_scores, k)
+                best_positions = best_positions[kept]
+                if progress is not None:
+                    progress(100 * done // len(starts))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        order = np.argsort(-best_scores, kind="stable")
+        order = order[best_scores[order] > -np.inf]
+        return TopErrors(np.stack(np.unravel_index(best_positions[order], shape), axis=1), best_scores[order])
+
+    def slice_summary(self, metric, selected_dimensions, chunk_bytes=STREAMING_CHUNK_BYTES, workers=STREAMING_WORKERS, progress=None):
+        # Largest magnitude, mean and RMS of the metric over the two selected
+        # axes, for every combination of the fixed indices at once. Chunks of
+        # the first axis are reduced over the selected axes and land in their
+        # own slices when the first axis is fixed, or add to all of them when
+        # it is selected.
+        shape = self.array_a.shape
+        selected = tuple(sorted(selected_dimensions))
+        fixed = tuple(dimension for dimension in range(len(shape)) if dimension not in selected)
+        step = self.chunk_rows(chunk_bytes)
+        starts = range(0, shape[0], step)
+
+        def chunk_summary(start):
+            chunk = calculateDifference(self.array_a[start:start + step], self.array_b[start:start + step], max_cache_bytes=0,
+                                        backend=self.backend, dtype=self.requested_dtype).error(metric)
+            peak = np.maximum(chunk.max(axis=selected), -chunk.min(axis=selected))
+            total = chunk.sum(axis=selected, dtype=np.float64)
+            np.square(chunk, out=chunk)
+            return start, peak, total, chunk.sum(axis=selected, dtype=np.float64)
+
+        fixed_shape = tuple(shape[dimension] for dimension in fixed)
+        peak = np.full(fixed_shape, -np.inf)
+        total = np.zeros(fixed_shape)
+        squares = np.zeros(fixed_shape)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(starts))))
+        try:
+            for done, (start, chunk_peak, chunk_total, chunk_squares) in enumerate(executor.map(chunk_summary, starts), 1):
+                target = (slice(start, start + chunk_peak.shape[0]),) if 0 in fixed else ()
+                np.maximum(peak[target], chunk_peak, out=peak[target])
+                total[target] += chunk_total
+                squares[target] += chunk_squares
+                if progress is not None:
+                    progress(100 * done // len(starts))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        count = int(np.prod([shape[dimension] for dimension in selected]))
+        return SliceSummary(fixed, peak, total / count, np.sqrt(squares / count))
+
+    def values_at(self, index):
+        # Hover only needs one element, never touch the full-size metric arrays
+        value_a = as_float(self.array_a[index]).astype(self.dtype)
+        value_diff = value_a - as_float(self.array_b[index]).astype(self.dtype)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            return {
+                "Tensor Difference": value_diff,
+                "L1 Error": np.abs(value_diff),
+                "L2 Error": np.square(value_diff),
+                "Relative Error": np.abs(value_diff) / np.abs(value_a) * 100
+            }
+
+    def tensor_difference_dict(self):
+        return LazyErrorDict(self)
+
+    def should_stream(self, threshold_bytes=STREAMING_THRESHOLD_BYTES):
+        return self.array_a.nbytes > threshold_bytes
+
+    def chunk_rows(self, chunk_bytes, block_rows=1):
+        row_bytes = self.array_a.itemsize * int(np.prod(self.array_a.shape[1:]))
+        rows = max(1, chunk_bytes // max(row_bytes, 1))
+        # Chunks hold whole heatmap blocks so each one downsamples independently
+        return max(block_rows, rows - rows % block_rows)
+
+    def stream_chunk(self, metric, start, stop, block_shape):
+        chunk = calculateDifference(self.array_a[start:stop], self.array_b[start:stop], max_cache_bytes=0, backend=self.backend, dtype=self.requested_dtype).error(metric)
+        accumulator = StatisticsAccumulator(StreamingHistogram())
+        accumulator.update(chunk)
+        heatmaps = None
+        if block_shape is not None:
+            heatmaps = {reduction: reduce_blocks(chunk, block_shape, reduction) for reduction in REDUCTIONS}
+        return accumulator, heatmaps
+
+    def streamed_errors(self, metric, chunk_bytes=STREAMING_CHUNK_BYTES, heatmap_shape=HEATMAP_DOWNSAMPLE_SHAPE, workers=STREAMING_WORKERS, progress=None):
+        if metric not in ERROR_METRICS:
+            raise KeyError(metric)
+        with self.lock:
+            if metric not in self.streamed:
+                self.streamed[metric] = self.cached(("streamed", metric), lambda: self.stream_errors(metric, chunk_bytes, heatmap_shape, workers, progress))
+            return self.streamed[metric]
+
+    def error_chunks(self, metric, chunk_bytes=STREAMING_CHUNK_BYTES, progress=None):
+        step = self.chunk_rows(chunk_bytes)
+        starts = range(0, self.array_a.shape[0], step)
+        for done, start in enumerate(starts, 1):
+            yield calculateDifference(self.array_a[start:start + step], self.array_b[start:start + step], max_cache_bytes=0, backend=self.backend, dtype=self.requested_dtype).error(metric)
+            if progress is not None:
+                progress(100 * done // len(starts))
+
+    def exact_histogram(self, metric, bins, chunk_bytes=STREAMING_CHUNK_BYTES, progress=None):
+        # Second pass binning every chunk straight into the display bins,
+        # over the exact range found by the streaming pass
+        edges = self.streamed_errors(metric, chunk_bytes, progress=progress).histogram.bin_edges(bins)
+        counts = np.zeros(bins, dtype=np.int64)
+        for chunk in self.error_chunks(metric, chunk_bytes, progress):
+            counts += histogram(chunk, bins, (edges[0], edges[-1]))[0]
+        return counts, edges
+
+    def exact_statistics(self, metric, chunk_bytes=STREAMING_CHUNK_BYTES, progress=None):
+        # The streaming pass leaves approximate percentiles, a few more passes
+        # over the chunks select the exact ones without holding the errors
+        streamed = self.streamed_errors(metric, chunk_bytes, progress=progress)
+        statistics = streamed.statistics
+        if not statistics.quantile_error:
+            return statistics
+        percentiles = select_percentiles(lambda: self.error_chunks(metric, chunk_bytes, progress), streamed.histogram)
+        statistics = statistics._replace(median=percentiles[1], percentiles_25=percentiles[0], percentiles_50=percentiles[1],
+                                         percentiles_75=percentiles[2], quantile_error=0.0)
+        with self.lock:
+            self.streamed[metric] = self.store_result(("streamed", metric), streamed._replace(statistics=statistics))
+        return statistics
+
+    def stream_errors(self, metric, chunk_bytes, heatmap_shape, workers, progress=None):
+        shape = self.array_a.shape
+        block_shape = None
+        if len(shape) == 2:
+            factor = 2 ** level_for(shape, heatmap_shape)
+            block_shape = (factor, factor)
+
+        step = self.chunk_rows(chunk_bytes, block_shape[0] if block_shape else 1)
+        starts = range(0, shape[0], step)
+        accumulator = StatisticsAccumulator(StreamingHistogram())
+        heatmaps = []
+        # Every chunk yields its own partial statistics, histogram and image
+        # rows; they are merged in order so the result does not depend on timing
+        executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(starts))))
+        try:
+            partials = executor.map(lambda start: self.stream_chunk(metric, start, start + step, block_shape), starts)
+            for done, (partial, heatmap_rows) in enumerate(partials, 1):
+                accumulator.merge(partial)
+                heatmaps.append(heatmap_rows)
+                if progress is not None:
+                    # May raise to cancel, pending chunks are then dropped
+                    progress(100 * done // len(starts))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if block_shape is not None:
+            heatmaps = {reduction: np.concatenate([rows[reduction] for rows in heatmaps], axis=0) for reduction in REDUCTIONS}
+        else:
+            heatmaps = None
+
+        return StreamedErrors(accumulator.result(), accumulator.histogram, heatmaps)
@@ -0,0 +1,290 @@
+import numpy as np
+
+BASE_BINS = 2 ** 16
+# Non-contiguous inputs are raveled this many elements at a time
+HISTOGRAM_CHUNK_ELEMENTS = 2 ** 22
+
+
+def value_chunks(data, chunk_elements=HISTOGRAM_CHUNK_ELEMENTS):
+    # Contiguous arrays are raveled as views, strided ones (tiles, slices)
+    # are copied one bounded block of leading rows at a time, or a row at a
+    # time in chunks when one row is larger. Strided 1-D arrays are sliced
+    # as they are, each chunk a view of chunk_elements.
+    data = np.asarray(data)
+    if data.flags.c_contiguous or data.ndim < 2:
+        flat = data if data.ndim == 1 else data.reshape(-1)
+        for start in range(0, flat.size, chunk_elements):
+            yield flat[start:start + chunk_elements]
+        return
+    if data[0].size > chunk_elements:
+        for row in data:
+            yield from value_chunks(row, chunk_elements)
+        return
+    rows = max(1, chunk_elements // max(1, data[0].size))
+    for start in range(0, data.shape[0], rows):
+        yield data[start:start + rows].reshape(-1)
+
+
+def finite_range(data):
+    # Exact min and max of the finite values, None when there are none
+    low = np.inf
+    high = -np.inf
+    for chunk in value_chunks(data):
+        if chunk.size == 0:
+            continue
+        chunk_min = chunk.min()
+        chunk_max = chunk.max()
+        if not (np.isfinite(chunk_min) and np.isfinite(chunk_max)):
+            chunk = chunk[np.isfinite(chunk)]
+            if chunk.size == 0:
+                continue
+            chunk_min = chunk.min()
+            chunk_max = chunk.max()
+        low = min(low, float(chunk_min))
+        high = max(high, float(chunk_max))
+    if low > high:
+        return None
+    return low, high
+
+
+def histogram_range(value_range, bins=1):
+    # Same range convention as np.histogram, except that ranges too narrow
+    # for distinct float64 edges are widened around their centre
+    if value_range is None:
+        return 0.0, 1.0
+    low, high = value_range
+    if low == high:
+        return low - 0.5, high + 0.5
+    minimum = 4 * bins * float(np.spacing(max(abs(low), abs(high))))
+    if high - low < minimum:
+        centre = low + (high - low) / 2
+        return centre - minimum / 2, centre + minimum / 2
+    return low, high
+
+
+def needs_float64(dtype, value_range, bins):
+    # np.histogram computes its edges in the data's float type, which is too
+    # coarse for many bins over a narrow range of low-precision values
+    if not np.issubdtype(dtype, np.floating) or np.finfo(dtype).bits >= 64:
+        return False
+    spacing = np.spacing(dtype.type(max(abs(value_range[0]), abs(value_range[1]))))
+    return value_range[1] - value_range[0] < 4 * bins * float(spacing)
+
+
+def histogram(data, bins, value_range=None):
+    # Equal-width counts matching np.histogram over the finite values, without
+    # flattening a copy of the whole array
+    if value_range is None:
+        value_range = histogram_range(finite_range(data), bins)
+    counts = np.zeros(bins, dtype=np.int64)
+    upcast = needs_float64(np.asarray(data).dtype, value_range, bins)
+    with np.errstate(invalid="ignore"):
+        for chunk in value_chunks(data):
+            if upcast:
+                chunk = chunk.astype(np.float64)
+            counts += np.histogram(chunk, bins=bins, range=value_range)[0]
+    return counts, np.linspace(value_range[0], value_range[1], bins + 1)
+
+
+class StreamingHistogram:
+    # Fine equal-width histogram that can be filled chunk by chunk without
+    # knowing the value range up front. When a chunk falls outside the current
+    # range the bin width doubles and adjacent bins are summed, which keeps
+    # the counts exact. Non-finite values are counted separately, with the
+    # infinities by sign so that they take their places in the ranks.
+    def __init__(self, base_bins=BASE_BINS):
+        self.base_bins = base_bins
+        self.counts = np.zeros(base_bins, dtype=np.int64)
+        self.low = None
+        self.width = None
+        self.min = np.inf
+        self.max = -np.inf
+        self.total = 0
+        self.non_finite = 0
+        self.negative_inf = 0
+        self.positive_inf = 0
+
+    @classmethod
+    def from_values(cls, data, base_bins=BASE_BINS):
+        # In-memory data is binned once over its exact finite range, so the
+        # base edges are the display edges of any bin count dividing base_bins
+        self = cls(base_bins)
+        value_range = finite_range(data)
+        self.count_infinities(data)
+        if value_range is None:
+            self.non_finite = int(np.size(data))
+            return self
+        self.counts, edges = histogram(data, base_bins, histogram_range(value_range, base_bins))
+        self.low = float(edges[0])
+        self.width = float(edges[-1] - edges[0]) / base_bins
+        self.min, self.max = value_range
+        self.total = int(self.counts.sum())
+        self.non_finite = int(np.size(data)) - self.total
+        return self
+
+    def high(self):
+        return self.low + self.width * self.base_bins
+
+    def count_infinities(self, data):
+        for chunk in value_chunks(data):
+            self.negative_inf += int(np.count_nonzero(chunk == -np.inf))
+            self.positive_inf += int(np.count_nonzero(chunk == np.inf))
+
+    def update(self, values):
+        values = np.asarray(values).reshape(-1)
+        finite = np.isfinite(values)
+        if not finite.all():
+            self.non_finite += values.size - int(np.count_nonzero(finite))
+            self.count_infinities(values[~finite])
+            values = values[finite]
+        if values.size == 0:
+            return
+
+        chunk_min = float(values.min())
+        chunk_max = float(values.max())
+        self.reserve(chunk_min, chunk_max)
+
+        index = np.subtract(values, self.low, dtype=np.float64)
+        index /= self.width
+        index = index.astype(np.intp)
+        np.clip(index, 0, self.base_bins - 1, out=index)
+        self.counts += np.bincount(index, minlength=self.base_bins)
+        self.include(values.size, chunk_min, chunk_max)
+
+    def reserve(self, value_min, value_max):
+        # Makes room for finite values in [value_min, value_max] before binning them
+        if self.low is None:
+            self.low = value_min
+            if value_max > value_min:
+                self.width = (value_max - value_min) / self.base_bins
+            else:
+                self.width = max(abs(value_min), 1.0) * 1e-6 / self.base_bins
+        self.expand(value_min, value_max)
+
+    def include(self, count, value_min, value_max):
+        self.min = min(self.min, value_min)
+        self.max = max(self.max, value_max)
+        self.total += count
+
+    def double_width(self, grow_left=False):
+        half = self.base_bins // 2
+        merged = self.counts.reshape(-1, 2).sum(axis=1)
+        self.counts[:] = 0
+        if grow_left:
+            # The old range becomes the upper half
+            self.low -= self.width * self.base_bins
+            self.counts[half:] = merged
+        else:
+            self.counts[:half] = merged
+        self.width *= 2
+
+    def expand(self, value_min, value_max):
+        while value_min < self.low or value_max > self.high():
+            self.double_width(grow_left=value_min < self.low)
+
+    def merge(self, other):
+        # Histograms filled by different workers rarely share bin edges. Other's
+        # bins are added by their centres once this histogram is at least as
+        # coarse, so merging costs at most one more base bin width of error.
+        self.non_finite += other.non_finite
+        self.negative_inf += other.negative_inf
+        self.positive_inf += other.positive_inf
+        if other.total == 0:
+            return
+        if self.low is None:
+            self.counts = other.counts.copy()
+            self.low = other.low
+            self.width = other.width
+        else:
+            self.expand(other.min, other.max)
+            while self.width < other.width:
+                self.double_width()
+            occupied = np.flatnonzero(other.counts)
+            centers = other.low + (occupied + 0.5) * other.width
+            index = np.floor((centers - self.low) / self.width).astype(np.intp)
+            np.clip(index, 0, self.base_bins - 1, out=index)
+            np.add.at(self.counts, index, other.counts[occupied])
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.total += other.total
+
+    def bin_edges(self, bins):
+        low, high = histogram_range((self.min, self.max) if self.total else None, bins)
+        return np.linspace(low, high, bins + 1)
+
+    def rebin(self, bins):
+        # Every base bin is assigned whole to the display bin holding its
+        # centre, so only values within one base bin width of a display edge
+        # can land in the neighbouring bin: each edge misplaces at most the
+        # count of the single base bin it cuts. Edges that fall on base edges
+        # cut nothing, which makes from_values histograms exact for any bin
+        # count dividing base_bins. histogram() recomputes exact counts.
+        edges = self.bin_edges(bins)
+        counts = np.zeros(bins, dtype=np.int64)
+        if self.total == 0:
+            return counts, edges
+        occupied = np.flatnonzero(self.counts)
+        centers = self.low + (occupied + 0.5) * self.width
+        index = np.floor((centers - edges[0]) / (edges[-1] - edges[0]) * bins).astype(np.intp)
+        np.clip(index, 0, bins - 1, out=index)
+        np.add.at(counts, index, self.counts[occupied])
+        return counts, edges
+
+    def size(self):
+        # Values in the ranks, -inf first and +inf last as np.percentile has them
+        return self.total + self.negative_inf + self.positive_inf
+
+    def ranks(self, percentiles):
+        # Same linear interpolation positions np.percentile uses by default
+        positions = np.asarray(percentiles, dtype=np.float64) / 100 * (self.size() - 1)
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.minimum(lower + 1, self.size() - 1)
+        return positions, lower, upper
+
+    def finite_bins(self, ranks):
+        # The base bin holding each rank among the finite values
+        index = np.searchsorted(np.cumsum(self.counts), ranks, side="right")
+        return np.clip(index, 0, self.base_bins - 1)
+
+    def value_at(self, ranks):
+        # Linear interpolation inside the base bin holding each rank
+        values = np.full(ranks.shape, np.inf)
+        values[ranks < self.negative_inf] = -np.inf
+        finite = (ranks >= self.negative_inf) & (ranks < self.negative_inf + self.total)
+        if finite.any():
+            finite_ranks = ranks[finite] - self.negative_inf
+            index = self.finite_bins(finite_ranks)
+            before = np.cumsum(self.counts)[index] - self.counts[index]
+            fraction = (finite_ranks - before + 0.5) / np.maximum(self.counts[index], 1)
+            estimates = self.low + (index + np.clip(fraction, 0, 1)) * self.width
+            values[finite] = np.clip(estimates, self.min, self.max)
+        return values
+
+    def quantile_error(self, percentiles):
+        # Bound on how far, as a fraction of all ranks, the value given for each
+        # percentile may be from its rank. Bin counts are exact apart from
+        # merges, which move counts by at most one bin, so a value interpolated
+        # in the bin of its rank is off by at most that bin and its neighbours.
+        if self.total == 0:
+            return 0.0
+        _, lower, upper = self.ranks(percentiles)
+        ranks = np.concatenate([lower, upper]) - self.negative_inf
+        ranks = ranks[(ranks >= 0) & (ranks < self.total)]
+        if ranks.size == 0:
+            return 0.0
+        index = self.finite_bins(ranks)
+        padded = np.concatenate(([0], self.counts, [0]))
+        crowded = padded[index] + padded[index + 1] + padded[index + 2]
+        return float(crowded.max()) / self.size()
+
+    def quantiles(self, percentiles):
+        percentiles = np.asarray(percentiles, dtype=np.float64)
+        if self.size() == 0:
+            return np.full(percentiles.shape, np.nan)
+        positions, lower, upper = self.ranks(percentiles)
+        low = self.value_at(lower)
+        high = self.value_at(upper)
+        fraction = positions - lower
+        with np.errstate(invalid="ignore"):
+            # As in compute_statistics, exact ranks must not pick up inf * 0
+            return np.where(fraction == 0, low, low + (high - low) * fraction)
@@ -0,0 +1,258 @@
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from tensorHistogram import StreamingHistogram, value_chunks
+
+# quantile_error bounds how far each percentile may be from its rank, as a
+# fraction of all ranks, 0 when exact
+TensorStatistics = namedtuple("TensorStatistics", ["mean", "median", "max", "min", "std", "percentiles_25", "percentiles_50", "percentiles_75", "size", "quantile_error"],
+                              defaults=(0.0,))
+
+PERCENTILES = (25, 50, 75)
+
+# Larger inputs get approximate percentiles unless exact ones are asked for
+EXACT_STATISTICS_ELEMENTS = 2 ** 26
+# Fine histograms get about one bin per this fraction of the value range
+QUANTILE_RELATIVE_ERROR = 2 ** -16
+# Looser rank bounds than this, when values crowd into a few bins, are
+# replaced by exact percentiles where the data can be read again
+QUANTILE_RANK_ERROR = 2 ** -10
+STATISTICS_WORKERS = os.cpu_count() or 1
+# Values kept in memory per rank while selecting exact percentiles out of core
+SELECTION_LIMIT = 2 ** 22
+
+
+def percentile_ranks(size, percentiles=PERCENTILES):
+    # Same linear interpolation positions np.percentile uses by default
+    positions = np.asarray(percentiles, dtype=np.float64) / 100 * (size - 1)
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, size - 1)
+    return positions, lower, upper
+
+
+def quantile_bins(relative_error=QUANTILE_RELATIVE_ERROR):
+    return 2 ** max(1, int(np.ceil(np.log2(1 / relative_error))))
+
+
+def percentile_accuracy(statistics):
+    if statistics.quantile_error:
+        return f"Approximate (rank \u00b1{statistics.quantile_error:.3%})"
+    return "Exact"
+
+
+def compute_statistics(data_tensor, exact=None, relative_error=QUANTILE_RELATIVE_ERROR, workers=STATISTICS_WORKERS):
+    if exact is None:
+        exact = np.size(data_tensor) <= EXACT_STATISTICS_ELEMENTS
+    if not exact:
+        return approximate_statistics(data_tensor, relative_error, workers)
+
+    # One float64 working copy replaces the copies np.median and every
+    # np.percentile call made, and a single partition places min, max and all
+    # the quantile ranks at once.
+    values = np.array(data_tensor, dtype=np.float64).reshape(-1)
+    size = values.size
+    if size == 0:
+        raise ValueError("Cannot compute statistics of an empty tensor.")
+
+    positions, lower, upper = percentile_ranks(size)
+    values.partition(np.unique(np.concatenate(([0, size - 1], lower, upper))))
+
+    min_value = values[0]
+    max_value = values[size - 1]
+    if np.isnan(max_value):
+        # NaNs are partitioned to the end, match numpy's NaN propagation
+        return TensorStatistics(*([np.nan] * 8), size)
+
+    fraction = positions - lower
+    low, high = values[lower], values[upper]
+    with np.errstate(invalid="ignore"):
+        # Exact ranks must not pick up inf * 0 from an infinite neighbour
+        percentiles = np.where(fraction == 0, low, low + (high - low) * fraction)
+    median_value = percentiles[1]
+
+    # Shift by the median before summing to keep the variance well conditioned
+    if np.isfinite(median_value):
+        values -= median_value
+        shift = median_value
+    else:
+        shift = 0.0
+    total = values.sum()
+    total_squares = np.dot(values, values)
+    mean_offset = total / size
+    mean_value = shift + mean_offset
+    std_deviation = np.sqrt(max(total_squares / size - mean_offset * mean_offset, 0.0))
+
+    return TensorStatistics(mean_value, median_value, max_value, min_value, std_deviation,
+                            percentiles[0], percentiles[1], percentiles[2], size)
+
+
+def approximate_statistics(data_tensor, relative_error=QUANTILE_RELATIVE_ERROR, workers=STATISTICS_WORKERS):
+    # Bounded chunks reduced on a thread pool into mergeable accumulators, so
+    # nothing is copied or partitioned as a whole. Chunks of strided input are
+    # copies, so only one per worker is read ahead of the merge. Percentiles
+    # come from the merged fine histogram and are off by at most one of its bins.
+    def reduce_chunk(chunk):
+        accumulator = StatisticsAccumulator(StreamingHistogram(quantile_bins(relative_error)))
+        accumulator.update(chunk)
+        return accumulator
+
+    accumulator = StatisticsAccumulator(StreamingHistogram(quantile_bins(relative_error)))
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk in value_chunks(data_tensor):
+            pending.append(executor.submit(reduce_chunk, chunk))
+            if len(pending) >= workers:
+                accumulator.merge(pending.popleft().result())
+        while pending:
+            accumulator.merge(pending.popleft().result())
+    statistics = accumulator.result()
+    if statistics.quantile_error > QUANTILE_RANK_ERROR:
+        # Heavy tails crowd most values into a few bins, which still bracket the ranks
+        percentiles = select_percentiles(lambda: value_chunks(data_tensor), accumulator.histogram)
+        statistics = statistics._replace(median=percentiles[1], percentiles_25=percentiles[0], percentiles_50=percentiles[1],
+                                         percentiles_75=percentiles[2], quantile_error=0.0)
+    return statistics
+
+
+def select_percentiles(read_chunks, base, percentiles=PERCENTILES, limit=SELECTION_LIMIT):
+    # Exact percentiles of data too large to hold, read_chunks() yields it
+    # again for every pass. The base histogram brackets each rank; a pass
+    # counts the values below every bracket and keeps those inside it, or
+    # narrows a bracket holding more than limit values with a finer histogram.
+    negative_inf = base.negative_inf
+    positions, lower, upper = percentile_ranks(base.total + base.non_finite, percentiles)
+
+    values = {}
+    brackets = {}
+    cumulative = np.cumsum(base.counts)
+    for rank in set(lower.tolist()) | set(upper.tolist()):
+        finite_rank = rank - negative_inf
+        if finite_rank < 0:
+            values[rank] = -np.inf
+        elif finite_rank >= base.total:
+            values[rank] = np.inf
+        else:
+            # One base bin of margin on both sides absorbs rounding at bin edges
+            index = int(np.searchsorted(cumulative, finite_rank, side="right"))
+            brackets[rank] = (max(base.min, base.low + (index - 1) * base.width),
+                              min(base.max, base.low + (index + 2) * base.width))
+
+    unbounded = set()
+    while brackets:
+        below = dict.fromkeys(brackets, 0)
+        inside = {rank: [] for rank in brackets}
+        counts = {rank: np.zeros(base.base_bins, dtype=np.int64) for rank in brackets}
+        for chunk in read_chunks():
+            chunk = chunk.reshape(-1)
+            if base.non_finite:
+                chunk = chunk[np.isfinite(chunk)]
+            for rank, (low, high) in brackets.items():
+                below[rank] += int(np.count_nonzero(chunk < low))
+                selected = chunk[(chunk >= low) & (chunk <= high)]
+                if selected.size == 0:
+                    continue
+                if high > low:
+                    bins = ((selected - low) / (high - low) * base.base_bins).astype(np.intp)
+                    counts[rank] += np.bincount(np.clip(bins, 0, base.base_bins - 1), minlength=base.base_bins)
+                else:
+                    counts[rank][0] += selected.size
+                if inside[rank] is not None:
+                    # Distinct values with their counts, so ties cost one entry
+                    inside[rank].append(np.unique(selected, return_counts=True))
+                    if rank not in unbounded and sum(part[0].size for part in inside[rank]) > limit:
+                        inside[rank] = None
+
+        for rank, (low, high) in list(brackets.items()):
+            finite_rank = rank - negative_inf - below[rank]
+            if not 0 <= finite_rank < counts[rank].sum():
+                # Rounding pushed the rank out of the bracket, start over from the full range
+                brackets[rank] = (base.min, base.max)
+            elif inside[rank] is not None:
+                distinct, where = np.unique(np.concatenate([part[0] for part in inside[rank]]), return_inverse=True)
+                tally = np.bincount(where, weights=np.concatenate([part[1] for part in inside[rank]]))
+                values[rank] = float(distinct[np.searchsorted(np.cumsum(tally), finite_rank, side="right")])
+                del brackets[rank]
+            else:
+                index = int(np.searchsorted(np.cumsum(counts[rank]), finite_rank, side="right"))
+                narrowed = (max(low, low + (high - low) * ((index - 1) / base.base_bins)),
+                            min(high, low + (high - low) * ((index + 2) / base.base_bins)))
+                if narrowed == (low, high) or narrowed[1] <= narrowed[0]:
+                    # Too narrow to split further in floating point, gather it whole
+                    unbounded.add(rank)
+                else:
+                    brackets[rank] = narrowed
+
+    fraction = positions - lower
+    low = np.array([values[rank] for rank in lower])
+    high = np.array([values[rank] for rank in upper])
+    with np.errstate(invalid="ignore"):
+        return np.where(fraction == 0, low, low + (high - low) * fraction)
+
+
+class StatisticsAccumulator:
+    # Mergeable running statistics for data seen one chunk at a time. Mean and
+    # standard deviation use Chan's pairwise update, percentiles come from the
+    # optional histogram and are therefore approximate.
+    def __init__(self, histogram=None):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.nan_count = 0
+        self.histogram = histogram
+
+    def update(self, values):
+        values = np.asarray(values).reshape(-1)
+        if values.size == 0:
+            return
+        nan_count = int(np.count_nonzero(np.isnan(values)))
+        chunk_mean = values.mean(dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            deviation = np.subtract(values, chunk_mean, dtype=np.float64)
+        chunk_m2 = np.dot(deviation, deviation)
+        del deviation
+        self.merge_partial(values.size, chunk_mean, chunk_m2, values.min(), values.max(), nan_count)
+        if self.histogram is not None:
+            self.histogram.update(values)
+
+    def merge_partial(self, count, mean, m2, min_value, max_value, nan_count=0):
+        total = self.count + count
+        if not (np.isfinite(self.mean) and np.isfinite(mean)):
+            # inf - inf has no meaning: an infinite mean stays (nan for both
+            # signs) and the spread is undefined, as compute_statistics has it
+            with np.errstate(invalid="ignore"):
+                self.mean = self.mean + mean
+            self.m2 = np.nan
+        else:
+            with np.errstate(invalid="ignore"):
+                delta = mean - self.mean
+                self.mean += delta * count / total
+                self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, float(min_value))
+        self.max = max(self.max, float(max_value))
+        self.nan_count += nan_count
+
+    def merge(self, other):
+        if other.count:
+            self.merge_partial(other.count, other.mean, other.m2, other.min, other.max, other.nan_count)
+        if self.histogram is not None and other.histogram is not None:
+            self.histogram.merge(other.histogram)
+
+    def result(self):
+        if self.count == 0:
+            raise ValueError("Cannot compute statistics of an empty tensor.")
+        if self.nan_count:
+            return TensorStatistics(*([np.nan] * 8), self.count)
+        quantile_error = np.nan
+        if self.histogram is not None:
+            percentiles = self.histogram.quantiles(PERCENTILES)
+            quantile_error = self.histogram.quantile_error(PERCENTILES)
+        else:
+            percentiles = np.full(len(PERCENTILES), np.nan)
+        with np.errstate(invalid="ignore"):
+            std_deviation = np.sqrt(max(self.m2 / self.count, 0.0))
+        return TensorStatistics(self.mean, percentiles[1], self.max, self.min, std_deviation,
+                                percentiles[0], percentiles[1], percentiles[2], self.count, quantile_error)
@@ -0,0 +1,139 @@
+from collections import namedtuple
+from collections.abc import Sequence
+import numpy as np
+
+# Rows read per reduction step are capped at about this many elements
+TILE_CHUNK_ELEMENTS = 2 ** 24
+
+TileMoments = namedtuple("TileMoments", ["count", "mean", "m2", "min", "max", "percentiles"])
+TileStatistics = namedtuple("TileStatistics", ["count", "mean", "std", "min", "max", "percentiles"])
+
+
+class TileIndex(Sequence):
+    # Tiles in divide_tensor order: the full grid row by row, then the bottom
+    # strip, the right strip and the corner. Every lookup is arithmetic, so
+    # the index costs nothing however many tiles the tensor splits into.
+    def __init__(self, tensor_size, tile_size):
+        self.rows, self.cols = (int(size) for size in tensor_size[:2])
+        self.tile_rows, self.tile_cols = (int(size) for size in tile_size)
+        if self.tile_rows <= 0 or self.tile_cols <= 0:
+            raise ValueError("Tile size must be positive")
+        self.num_rows = self.rows // self.tile_rows
+        self.num_cols = self.cols // self.tile_cols
+        self.remainder_rows = self.rows % self.tile_rows
+        self.remainder_cols = self.cols % self.tile_cols
+        self.grid_shape = (self.num_rows + (self.remainder_rows > 0), self.num_cols + (self.remainder_cols > 0))
+
+    def __len__(self):
+        return self.grid_shape[0] * self.grid_shape[1]
+
+    def __getitem__(self, index):
+        grid_row, grid_col = self.grid_position(index)
+        height = self.tile_rows if grid_row < self.num_rows else self.remainder_rows
+        width = self.tile_cols if grid_col < self.num_cols else self.remainder_cols
+        return (grid_row * self.tile_rows, grid_col * self.tile_cols, height, width)
+
+    def grid_position(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        full = self.num_rows * self.num_cols
+        if index < full:
+            return divmod(index, self.num_cols)
+        index -= full
+        if self.remainder_rows > 0:
+            if index < self.num_cols:
+                return self.num_rows, index
+            index -= self.num_cols
+        if self.remainder_cols > 0 and index < self.num_rows:
+            return index, self.num_cols
+        return self.num_rows, self.num_cols
+
+    def index_at(self, grid_row, grid_col):
+        if not (0 <= grid_row < self.grid_shape[0] and 0 <= grid_col < self.grid_shape[1]):
+            raise IndexError((grid_row, grid_col))
+        if grid_row < self.num_rows and grid_col < self.num_cols:
+            return grid_row * self.num_cols + grid_col
+        index = self.num_rows * self.num_cols
+        bottom = self.num_cols if self.remainder_rows > 0 else 0
+        if grid_row == self.num_rows and grid_col < self.num_cols:
+            return index + grid_col
+        if grid_col == self.num_cols and grid_row < self.num_rows:
+            return index + bottom + grid_row
+        return index + bottom + self.num_rows
+
+
+def block_moments(data, tile_size, percentiles=()):
+    # One reshape-and-reduce per part: the divisible region, the bottom
+    # strip, the right strip and the corner
+    rows, cols = data.shape
+    tile_rows, tile_cols = tile_size
+    full_rows = rows // tile_rows
+    full_cols = cols // tile_cols
+    shape = (-(-rows // tile_rows), -(-cols // tile_cols))
+    moments = TileMoments(np.empty(shape, dtype=np.int64), np.empty(shape), np.empty(shape),
+                          np.empty(shape), np.empty(shape), np.empty((len(percentiles),) + shape))
+    row_parts = [(0, full_rows * tile_rows, tile_rows, slice(0, full_rows)),
+                 (full_rows * tile_rows, rows, rows - full_rows * tile_rows, slice(full_rows, shape[0]))]
+    col_parts = [(0, full_cols * tile_cols, tile_cols, slice(0, full_cols)),
+                 (full_cols * tile_cols, cols, cols - full_cols * tile_cols, slice(full_cols, shape[1]))]
+    for row_start, row_stop, height, grid_rows in row_parts:
+        for col_start, col_stop, width, grid_cols in col_parts:
+            if row_stop <= row_start or col_stop <= col_start:
+                continue
+            blocks = data[row_start:row_stop, col_start:col_stop].reshape(-1, height, (col_stop - col_start) // width, width)
+            mean = blocks.mean(axis=(1, 3), dtype=np.float64)
+            deviations = blocks - mean[:, None, :, None]
+            moments.count[grid_rows, grid_cols] = height * width
+            moments.mean[grid_rows, grid_cols] = mean
+            moments.m2[grid_rows, grid_cols] = np.einsum("ijkl,ijkl->ik", deviations, deviations)
+            moments.min[grid_rows, grid_cols] = blocks.min(axis=(1, 3))
+            moments.max[grid_rows, grid_cols] = blocks.max(axis=(1, 3))
+            if len(percentiles):
+                # Tiles side by side along the last axis, partitioned all at once
+                values = np.moveaxis(blocks, 2, 1).reshape(blocks.shape[0], blocks.shape[2], -1)
+                moments.percentiles[:, grid_rows, grid_cols] = np.percentile(values, percentiles, axis=-1)
+    return moments
+
+
+def merge_moments(a, b):
+    # Chan's update, element-wise over tiles. Percentiles cannot be merged
+    # exactly, the count-weighted average of the parts is kept as a sketch.
+    count = a.count + b.count
+    delta = b.mean - a.mean
+    mean = a.mean + delta * (b.count / count)
+    m2 = a.m2 + b.m2 + delta ** 2 * (a.count * b.count / count)
+    percentiles = (a.percentiles * a.count + b.percentiles * b.count) / count
+    return TileMoments(count, mean, m2, np.minimum(a.min, b.min), np.maximum(a.max, b.max), percentiles)
+
+
+def tile_statistics(read_rows, shape, tile_size, percentiles=(), progress=None):
+    # read_rows(start, stop) returns those full-width rows of the error array.
+    # Chunks hold whole tile rows when they fit and percentiles are exact;
+    # tall tiles are reduced in row slices whose moments are merged.
+    rows, cols = shape[:2]
+    tile_rows, tile_cols = tile_size
+    step = max(1, TILE_CHUNK_ELEMENTS // max(cols, 1))
+    grid = []
+    if step >= tile_rows:
+        step -= step % tile_rows
+        for start in range(0, rows, step):
+            stop = min(start + step, rows)
+            grid.append(block_moments(read_rows(start, stop), tile_size, percentiles))
+            if progress is not None:
+                progress(100 * stop // rows)
+    else:
+        for start in range(0, rows, tile_rows):
+            end = min(start + tile_rows, rows)
+            moments = None
+            for sub_start in range(start, end, step):
+                sub_stop = min(sub_start + step, end)
+                part = block_moments(read_rows(sub_start, sub_stop), (sub_stop - sub_start, tile_cols), percentiles)
+                moments = part if moments is None else merge_moments(moments, part)
+                if progress is not None:
+                    progress(100 * sub_stop // rows)
+            grid.append(moments)
+    count, mean, m2, low, high = (np.concatenate(parts, axis=0) for parts in list(zip(*grid))[:5])
+    percentile_grid = np.concatenate([moments.percentiles for moments in grid], axis=1)
+    return TileStatistics(count, mean, np.sqrt(m2 / count), low, high, percentile_grid)
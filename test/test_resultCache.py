@@ -0,0 +1,145 @@
+import os
+import numpy as np
+import pytest
+from resultCache import FINGERPRINTS_FILE, ResultCache, load_result
+from tensorDifference import StreamedErrors
+from tensorHistogram import StreamingHistogram
+from tensorStatistics import compute_statistics
+
+ENTRY = np.arange(1000, dtype=np.float64)
+
+
+def disk_bytes(cache):
+    return sum(size for _, size, _ in cache.entries())
+
+
+def entry_path(cache, key, name, extension=".npy"):
+    return os.path.join(cache.directory, key, name + extension)
+
+
+def set_age(cache, key, name, seconds):
+    os.utime(entry_path(cache, key, name), ns=(seconds * 10 ** 9, seconds * 10 ** 9))
+
+
+def test_arrays_come_back_memory_mapped(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    stored = cache.store("key", ("heatmap", "L1 Error", "max"), ENTRY)
+    assert isinstance(stored, np.memmap)
+    loaded = cache.load("key", ("heatmap", "L1 Error", "max"))
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, ENTRY)
+    assert cache.load("key", "missing") is None
+
+
+def test_other_results_round_trip_without_pickle(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    data = np.array([1.0, 2.0, np.inf, -np.inf, 5.0, np.nan], dtype=np.float32)
+    histogram = StreamingHistogram.from_values(data)
+    statistics = compute_statistics(data, exact=True)
+    value = {"L1 Error": StreamedErrors(statistics, histogram, {"max": np.ones((2, 3))}), "Relative Error": StreamedErrors(statistics, histogram, None)}
+    cache.store("key", "fused", value)
+    path = entry_path(cache, "key", "fused", ".npz")
+    with np.load(path, allow_pickle=False) as arrays:
+        assert "layout" in arrays
+    loaded = load_result(path)
+    assert loaded.keys() == value.keys()
+    assert loaded["Relative Error"].heatmaps is None
+    np.testing.assert_array_equal(loaded["L1 Error"].heatmaps["max"], np.ones((2, 3)))
+    np.testing.assert_equal(tuple(loaded["L1 Error"].statistics), tuple(statistics))
+    restored = loaded["L1 Error"].histogram
+    assert vars(restored).keys() == vars(histogram).keys()
+    np.testing.assert_array_equal(restored.counts, histogram.counts)
+    assert (restored.total, restored.non_finite, restored.negative_inf, restored.positive_inf) == (3, 3, 1, 1)
+    np.testing.assert_array_equal(restored.quantiles([0, 50, 100]), histogram.quantiles([0, 50, 100]))
+
+    pair = (histogram, statistics)
+    cache.store("key", ("histogram", "L1 Error", None), pair)
+    loaded = cache.load("key", ("histogram", "L1 Error", None))
+    assert isinstance(loaded, tuple)
+    np.testing.assert_equal(tuple(loaded[1]), tuple(statistics))
+
+
+def test_unsupported_results_are_not_written(tmp_path, capsys):
+    cache = ResultCache(str(tmp_path))
+    value = {"callback": print}
+    assert cache.store("key", "bad", value) is value
+    assert "Error writing result cache" in capsys.readouterr().out
+    assert cache.total_bytes == disk_bytes(cache) == 0
+    assert cache.load("key", "bad") is None
+
+
+def test_running_total_matches_disk(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    for index in range(5):
+        cache.store(f"key{index % 2}", f"entry{index}", ENTRY[:100 * (index + 1)])
+    assert cache.total_bytes == disk_bytes(cache)
+    # Replacing an entry counts the difference, not both files
+    cache.store("key0", "entry0", ENTRY)
+    cache.store("key0", "entry0", ENTRY[:10])
+    assert cache.total_bytes == disk_bytes(cache)
+    # A second cache on the same directory starts from a walk of it
+    other = ResultCache(str(tmp_path))
+    other.store("key2", "entry", ENTRY)
+    assert other.total_bytes == disk_bytes(other) == cache.total_bytes + os.path.getsize(entry_path(other, "key2", "entry"))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    for name in ("a", "b", "c"):
+        cache.store("key", name, ENTRY)
+    size = os.path.getsize(entry_path(cache, "key", "a"))
+    cache.max_bytes = 3 * size
+    for seconds, name in enumerate(("a", "b", "c"), 1):
+        set_age(cache, "key", name, seconds)
+    # Loading a makes it the most recently used
+    cache.load("key", "a")
+    cache.store("other", "d", ENTRY)
+    remaining = sorted(os.path.relpath(path, cache.directory) for _, _, path in cache.entries())
+    assert remaining == [os.path.join("key", "a.npy"), os.path.join("key", "c.npy"), os.path.join("other", "d.npy")]
+    assert cache.total_bytes == disk_bytes(cache) == 3 * size
+
+    cache.max_bytes = size
+    cache.store("other", "e", ENTRY[:1])
+    assert cache.total_bytes == disk_bytes(cache) <= size
+    assert os.path.exists(entry_path(cache, "other", "e"))
+    # Emptied key directories go with their last entry
+    assert not os.path.exists(os.path.join(cache.directory, "key"))
+
+
+def test_pair_keys_follow_content_and_order(tmp_path):
+    files = {}
+    for name, value in (("a", 1.0), ("b", 2.0), ("copy", 1.0)):
+        files[name] = str(tmp_path / f"{name}.npy")
+        np.save(files[name], np.full(10, value))
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = cache.pair(files["a"], files["b"]).key()
+    assert cache.pair(files["copy"], files["b"]).key() == key
+    assert cache.pair(files["b"], files["a"]).key() != key
+    assert os.path.exists(os.path.join(cache.directory, FINGERPRINTS_FILE))
+
+    np.save(files["a"], np.full(10, 3.0))
+    os.utime(files["a"], ns=(1, 1))
+    assert ResultCache(cache.directory).pair(files["a"], files["b"]).key() != key
+
+    results = cache.pair(files["a"], files["b"])
+    child = results.child("slice")
+    assert child.key() != results.key()
+    child.store("statistics", ENTRY[:3])
+    np.testing.assert_array_equal(child.load("statistics"), ENTRY[:3])
+    assert results.load("statistics") is None
+
+
+def test_unreadable_pair_costs_only_the_caching(tmp_path, capsys):
+    results = ResultCache(str(tmp_path)).pair(str(tmp_path / "missing.npy"), str(tmp_path / "other.npy"))
+    assert results.load("statistics") is None
+    assert results.store("statistics", ENTRY) is ENTRY
+    assert "Error" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("name", [("histogram", "L1 Error", (0, 0, 10, 10)), "Relative Error", ("top", "L2 Error", 100)])
+def test_entry_names_stay_inside_the_key(tmp_path, name):
+    cache = ResultCache(str(tmp_path))
+    cache.store("key", name, ENTRY[:4])
+    (path,) = [path for _, _, path in cache.entries()]
+    assert os.path.dirname(path) == os.path.join(str(tmp_path), "key")
+    np.testing.assert_array_equal(cache.load("key", name), ENTRY[:4])
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from tensorHistogram import StreamingHistogram, histogram, value_chunks
+
+
+def values(size=20000, seed=0):
+    return np.random.default_rng(seed).standard_normal(size)
+
+
+def cumulative_error(counts, expected):
+    return np.abs(np.cumsum(counts) - np.cumsum(expected)).max()
+
+
+@pytest.mark.parametrize("bins", [1, 16, 256, 4096])
+def test_from_values_rebin_matches_numpy_for_bins_dividing_base(bins):
+    data = values()
+    counts, edges = StreamingHistogram.from_values(data).rebin(bins)
+    expected, expected_edges = np.histogram(data, bins=bins)
+    np.testing.assert_array_equal(counts, expected)
+    np.testing.assert_allclose(edges, expected_edges)
+
+
+@pytest.mark.parametrize("bins", [3, 100, 1000])
+def test_rebin_misplaces_at_most_one_base_bin_per_edge(bins):
+    data = values()
+    base = StreamingHistogram.from_values(data, base_bins=1024)
+    counts, edges = base.rebin(bins)
+    expected = np.histogram(data, bins=edges)[0]
+    assert counts.sum() == data.size
+    assert cumulative_error(counts, expected) <= base.counts.max()
+
+
+def test_update_in_chunks_keeps_exact_range_and_total():
+    data = values() * 1e3 + 5
+    streamed = StreamingHistogram()
+    for chunk in np.array_split(data, 7):
+        streamed.update(chunk)
+    assert streamed.total == data.size
+    assert (streamed.min, streamed.max) == (data.min(), data.max())
+    assert streamed.low <= data.min() and streamed.high() >= data.max()
+    counts, edges = streamed.rebin(50)
+    expected = np.histogram(data, bins=edges)[0]
+    assert counts.sum() == data.size
+    # Widened bins still hold whole base bins, one per display edge at most
+    assert cumulative_error(counts, expected) <= streamed.counts.max()
+
+
+def test_merge_matches_single_histogram():
+    data = values(30000)
+    # Different ranges give the two parts different bin edges
+    parts = [StreamingHistogram(4096) for _ in range(2)]
+    parts[0].update(data[:10000] * 0.5)
+    parts[1].update(data[10000:])
+    merged = StreamingHistogram(4096)
+    for part in parts:
+        merged.merge(part)
+    combined = np.concatenate([data[:10000] * 0.5, data[10000:]])
+    assert merged.total == combined.size
+    assert (merged.min, merged.max) == (combined.min(), combined.max())
+    counts, edges = merged.rebin(64)
+    expected = np.histogram(combined, bins=edges)[0]
+    # One base bin moved by the merge and one cut by each display edge
+    assert cumulative_error(counts, expected) <= 2 * merged.counts.max()
+
+
+def test_merge_into_empty_copies_counts():
+    part = StreamingHistogram.from_values(values())
+    merged = StreamingHistogram()
+    merged.merge(part)
+    merged.merge(StreamingHistogram())
+    np.testing.assert_array_equal(merged.counts, part.counts)
+    assert merged.total == part.total
+    assert merged.counts is not part.counts
+
+
+def test_non_finite_values_are_counted_apart():
+    data = values(1000)
+    data[:5] = np.nan
+    data[5:8] = np.inf
+    data[8:10] = -np.inf
+    streamed = StreamingHistogram()
+    streamed.update(data[:500])
+    streamed.update(data[500:])
+    for base in (StreamingHistogram.from_values(data), streamed):
+        assert base.total == 990
+        assert (base.non_finite, base.positive_inf, base.negative_inf) == (10, 3, 2)
+        counts, edges = base.rebin(10)
+        np.testing.assert_array_equal(counts.sum(), np.histogram(data[10:], bins=edges)[0].sum())
+
+    merged = StreamingHistogram()
+    merged.merge(streamed)
+    merged.merge(StreamingHistogram.from_values(np.array([-np.inf, np.nan])))
+    assert (merged.non_finite, merged.positive_inf, merged.negative_inf) == (12, 3, 3)
+
+
+def test_all_non_finite_values_leave_histogram_empty():
+    base = StreamingHistogram.from_values(np.array([np.nan, np.inf]))
+    assert base.total == 0 and base.non_finite == 2
+    counts, edges = base.rebin(4)
+    np.testing.assert_array_equal(counts, 0)
+    np.testing.assert_allclose(edges, np.linspace(0, 1, 5))
+
+
+def test_histogram_matches_numpy_on_strided_input():
+    data = values(40000).reshape(200, 200)[::3, 1::2]
+    data[0, 0] = np.nan
+    counts, edges = histogram(data, 37)
+    finite = data[np.isfinite(data)]
+    expected, expected_edges = np.histogram(finite, bins=37)
+    np.testing.assert_array_equal(counts, expected)
+    np.testing.assert_allclose(edges, expected_edges)
+
+
+@pytest.mark.parametrize("chunk_elements", [1, 7, 100, 10 ** 6])
+def test_value_chunks_are_bounded_and_in_order(chunk_elements):
+    tensor = values(3 * 50 * 40).reshape(3, 50, 40)
+    for data in (tensor, tensor[:, ::2, 1:], tensor.reshape(-1)[::3], np.float64(2.0)):
+        chunks = list(value_chunks(data, chunk_elements))
+        assert all(chunk.ndim == 1 and chunk.size <= chunk_elements for chunk in chunks)
+        np.testing.assert_array_equal(np.concatenate(chunks), np.reshape(data, -1))
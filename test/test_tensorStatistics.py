@@ -0,0 +1,166 @@
+import numpy as np
+import pytest
+from tensorHistogram import StreamingHistogram
+from tensorStatistics import (PERCENTILES, QUANTILE_RANK_ERROR, StatisticsAccumulator, compute_statistics, percentile_accuracy,
+                              select_percentiles)
+
+
+def reference_percentiles(data, percentiles=PERCENTILES):
+    # np.percentile's interpolation, except that exact ranks are taken as they
+    # are, so an infinite neighbour does not turn them into inf * 0 = nan
+    ordered = np.sort(np.asarray(data, dtype=np.float64).reshape(-1))
+    positions = np.asarray(percentiles, dtype=np.float64) / 100 * (ordered.size - 1)
+    low = ordered[np.floor(positions).astype(np.intp)]
+    high = ordered[np.ceil(positions).astype(np.intp)]
+    fraction = positions - np.floor(positions)
+    with np.errstate(invalid="ignore"):
+        return np.where(fraction == 0, low, low + (high - low) * fraction)
+
+
+def heavy_tailed(size=200000, seed=0):
+    # Relative errors of nearly equal tensors, a few near-zero divisors stretch the range
+    rng = np.random.default_rng(seed)
+    a = rng.standard_normal(size)
+    b = a + rng.standard_normal(size) * 1e-3
+    return np.abs(a - b) / np.abs(a)
+
+
+def check_percentiles(statistics, expected):
+    np.testing.assert_array_equal([statistics.percentiles_25, statistics.percentiles_50, statistics.percentiles_75], expected)
+    assert statistics.median == statistics.percentiles_50
+
+
+@pytest.mark.parametrize("data", [np.arange(10.0), np.random.default_rng(0).standard_normal((30, 17)).astype(np.float32),
+                                  np.array([[3, 1], [2, 2]], dtype=np.int64), np.array([5.0])])
+def test_exact_statistics_match_numpy(data):
+    statistics = compute_statistics(data, exact=True)
+    values = data.astype(np.float64)
+    np.testing.assert_allclose([statistics.mean, statistics.std], [values.mean(), values.std()], rtol=1e-12, atol=1e-15)
+    assert (statistics.min, statistics.max, statistics.size) == (values.min(), values.max(), data.size)
+    np.testing.assert_allclose([statistics.percentiles_25, statistics.median, statistics.percentiles_75], np.percentile(values, PERCENTILES))
+    assert statistics.quantile_error == 0
+    assert percentile_accuracy(statistics) == "Exact"
+
+
+def test_exact_statistics_place_infinities_at_the_ends():
+    data = np.array([np.inf, 1.0, -np.inf, 2.0, 3.0, np.inf, 4.0, 0.5])
+    statistics = compute_statistics(data, exact=True)
+    check_percentiles(statistics, reference_percentiles(data))
+    assert (statistics.min, statistics.max) == (-np.inf, np.inf)
+    assert np.isnan(statistics.mean) and np.isnan(statistics.std)
+
+
+def test_nan_makes_every_statistic_nan():
+    data = np.array([1.0, np.nan, 2.0])
+    for exact in (True, False):
+        statistics = compute_statistics(data, exact=exact, workers=1)
+        assert np.isnan(statistics[:8]).all()
+        assert statistics.size == 3
+
+
+def test_empty_tensor_raises():
+    for exact in (True, False):
+        with pytest.raises(ValueError):
+            compute_statistics(np.empty((0, 3)), exact=exact, workers=1)
+
+
+def test_accumulator_chan_merge_matches_numpy():
+    data = np.random.default_rng(1).standard_normal(10007) * 1e3 + 1e6
+    chunks = np.array_split(data, 13)
+    # Chunk by chunk, and as partial accumulators merged in a different grouping
+    sequential = StatisticsAccumulator()
+    for chunk in chunks:
+        sequential.update(chunk)
+    halves = [StatisticsAccumulator(), StatisticsAccumulator()]
+    for index, chunk in enumerate(chunks):
+        halves[index % 2].update(chunk)
+    merged = StatisticsAccumulator()
+    merged.merge(halves[0])
+    merged.merge(StatisticsAccumulator())
+    merged.merge(halves[1])
+    for accumulator in (sequential, merged):
+        statistics = accumulator.result()
+        np.testing.assert_allclose(statistics.mean, data.mean(), rtol=1e-14)
+        np.testing.assert_allclose(statistics.std, data.std(), rtol=1e-9)
+        assert (statistics.min, statistics.max, statistics.size) == (data.min(), data.max(), data.size)
+        assert np.isnan(statistics.quantile_error)
+
+
+@pytest.mark.parametrize("infinities, mean", [((np.inf,), np.inf), ((-np.inf, -np.inf), -np.inf), ((np.inf, -np.inf), np.nan)])
+def test_accumulator_keeps_infinite_means(infinities, mean):
+    data = np.random.default_rng(2).standard_normal(100)
+    accumulator = StatisticsAccumulator()
+    accumulator.update(data[:50])
+    for infinity in infinities:
+        accumulator.update(np.array([infinity, 1.0]))
+    accumulator.update(data[50:])
+    statistics = accumulator.result()
+    np.testing.assert_equal(statistics.mean, mean)
+    assert np.isnan(statistics.std)
+    assert (statistics.min, statistics.max) == (min(data.min(), *infinities), max(data.max(), *infinities))
+
+
+def test_approximate_percentiles_stay_within_their_rank_bound():
+    data = np.random.default_rng(3).standard_normal(100000)
+    statistics = compute_statistics(data, exact=False, workers=2)
+    assert 0 < statistics.quantile_error <= QUANTILE_RANK_ERROR
+    assert percentile_accuracy(statistics).startswith("Approximate (rank")
+    ordered = np.sort(data)
+    for percentile, value in zip(PERCENTILES, (statistics.percentiles_25, statistics.percentiles_50, statistics.percentiles_75)):
+        rank = np.searchsorted(ordered, value)
+        assert abs(rank - percentile / 100 * (data.size - 1)) <= statistics.quantile_error * data.size + 1
+    np.testing.assert_allclose([statistics.mean, statistics.std], [data.mean(), data.std()], rtol=1e-12)
+
+
+def test_heavy_tails_fall_back_to_exact_percentiles():
+    data = heavy_tailed()
+    accumulator = StatisticsAccumulator(StreamingHistogram())
+    accumulator.update(data)
+    assert accumulator.result().quantile_error > QUANTILE_RANK_ERROR
+    statistics = compute_statistics(data, exact=False, workers=2)
+    assert statistics.quantile_error == 0
+    check_percentiles(statistics, np.percentile(data, PERCENTILES))
+
+
+def test_approximate_statistics_rank_infinities():
+    # The quartiles fall on exact ranks of 40001 values
+    data = heavy_tailed(40001, seed=4)
+    data[:3000] = np.inf
+    data[3000:4000] = -np.inf
+    statistics = compute_statistics(data, exact=False, workers=2)
+    check_percentiles(statistics, reference_percentiles(data))
+    # Enough infinities to hold the upper quartile
+    data[4000:15000] = np.inf
+    statistics = compute_statistics(data, exact=False, workers=2)
+    check_percentiles(statistics, reference_percentiles(data))
+    assert statistics.percentiles_75 == np.inf and np.isfinite(statistics.median)
+
+
+def test_histogram_quantiles_rank_infinities():
+    data = np.array([-np.inf, 1.0, 2.0, 3.0, np.inf])
+    base = StreamingHistogram.from_values(data)
+    quantiles = base.quantiles([0, 50, 100])
+    assert (quantiles[0], quantiles[2]) == (-np.inf, np.inf)
+    assert abs(quantiles[1] - 2.0) <= base.width
+
+
+@pytest.mark.parametrize("limit", [1, 50, 10 ** 6])
+def test_select_percentiles_is_exact(limit):
+    rng = np.random.default_rng(5)
+    # Ties, a heavy tail and infinities, read back in uneven chunks
+    data = np.concatenate([rng.integers(0, 20, 3000).astype(np.float64), heavy_tailed(2000, seed=6),
+                           [np.inf] * 50, [-np.inf] * 30])
+    rng.shuffle(data)
+    chunks = np.array_split(data, 9)
+    base = StreamingHistogram(64)
+    for chunk in chunks:
+        base.update(chunk)
+    percentiles = (0, 1, 10, 25, 50, 75, 99, 100)
+    selected = select_percentiles(lambda: iter(chunks), base, percentiles, limit=limit)
+    np.testing.assert_array_equal(selected, reference_percentiles(data, percentiles))
+
+
+def test_select_percentiles_of_constant_data():
+    data = np.full(1000, 0.25)
+    base = StreamingHistogram.from_values(data, base_bins=16)
+    np.testing.assert_array_equal(select_percentiles(lambda: iter([data]), base, limit=1), [0.25, 0.25, 0.25])
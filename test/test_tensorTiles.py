@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+import tensorTiles
+from tensorTiles import TileIndex, tile_statistics
+
+
+def divide_tensor(tensor_size, tile_size):
+    # The tile list TileIndex replaced, kept as the reference order
+    rows, cols = tensor_size
+    tile_rows, tile_cols = tile_size
+    num_rows = rows // tile_rows
+    num_cols = cols // tile_cols
+    remainder_rows = rows % tile_rows
+    remainder_cols = cols % tile_cols
+    tiles = [(i * tile_rows, j * tile_cols, tile_rows, tile_cols) for i in range(num_rows) for j in range(num_cols)]
+    if remainder_rows > 0:
+        tiles += [(num_rows * tile_rows, j * tile_cols, remainder_rows, tile_cols) for j in range(num_cols)]
+    if remainder_cols > 0:
+        tiles += [(i * tile_rows, num_cols * tile_cols, tile_rows, remainder_cols) for i in range(num_rows)]
+    if remainder_rows > 0 and remainder_cols > 0:
+        tiles.append((num_rows * tile_rows, num_cols * tile_cols, remainder_rows, remainder_cols))
+    return tiles
+
+
+SIZES = [((12, 20), (4, 5)), ((13, 20), (4, 5)), ((12, 23), (4, 5)), ((13, 23), (4, 5)),
+         ((3, 4), (5, 7)), ((1, 1), (1, 1)), ((7, 9), (7, 1)), ((30, 2), (4, 3))]
+
+
+@pytest.mark.parametrize("tensor_size, tile_size", SIZES)
+def test_tile_index_matches_divide_tensor(tensor_size, tile_size):
+    tiles = TileIndex(tensor_size, tile_size)
+    expected = divide_tensor(tensor_size, tile_size)
+    assert len(tiles) == len(expected)
+    assert list(tiles) == expected
+    assert [tiles[index - len(tiles)] for index in range(len(tiles))] == expected
+    for tile in (expected[0], expected[-1]):
+        assert tiles.index(tile) == expected.index(tile)
+
+
+@pytest.mark.parametrize("tensor_size, tile_size", SIZES)
+def test_grid_positions_round_trip(tensor_size, tile_size):
+    tiles = TileIndex(tensor_size, tile_size)
+    positions = [tiles.grid_position(index) for index in range(len(tiles))]
+    assert sorted(positions) == [(row, col) for row in range(tiles.grid_shape[0]) for col in range(tiles.grid_shape[1])]
+    for index, (row, col) in enumerate(positions):
+        assert tiles.index_at(row, col) == index
+        assert tiles[index][:2] == (row * tiles.tile_rows, col * tiles.tile_cols)
+
+
+def test_out_of_range_lookups_raise():
+    tiles = TileIndex((13, 23), (4, 5))
+    with pytest.raises(IndexError):
+        tiles[len(tiles)]
+    with pytest.raises(IndexError):
+        tiles.index_at(*tiles.grid_shape)
+    with pytest.raises(ValueError):
+        TileIndex((13, 23), (0, 5))
+
+
+def expected_tiles(data, tile_size, percentiles):
+    tiles = TileIndex(data.shape, tile_size)
+    expected = {name: np.empty(tiles.grid_shape) for name in ("count", "mean", "std", "min", "max")}
+    expected["percentiles"] = np.empty((len(percentiles),) + tiles.grid_shape)
+    for index, (row, col, height, width) in enumerate(tiles):
+        grid = tiles.grid_position(index)
+        tile = data[row:row + height, col:col + width]
+        with np.errstate(invalid="ignore"):
+            expected["count"][grid] = tile.size
+            expected["mean"][grid] = tile.mean()
+            expected["std"][grid] = tile.std()
+            expected["min"][grid] = tile.min()
+            expected["max"][grid] = tile.max()
+            expected["percentiles"][(slice(None),) + grid] = np.percentile(tile, percentiles)
+    return expected
+
+
+def check_statistics(statistics, expected, names):
+    for name in names:
+        np.testing.assert_allclose(getattr(statistics, name), expected[name], rtol=1e-10, atol=1e-12, equal_nan=True, err_msg=name)
+
+
+@pytest.mark.parametrize("tensor_size, tile_size", SIZES)
+def test_tile_statistics_match_numpy(tensor_size, tile_size):
+    data = np.random.default_rng(1).standard_normal(tensor_size)
+    statistics = tile_statistics(lambda start, stop: data[start:stop], data.shape, tile_size, (25, 50, 75))
+    check_statistics(statistics, expected_tiles(data, tile_size, (25, 50, 75)), ("count", "mean", "std", "min", "max", "percentiles"))
+
+
+def test_tile_statistics_propagate_non_finite_values():
+    data = np.random.default_rng(2).standard_normal((13, 23))
+    data[0, 0] = np.nan
+    data[5, 6] = np.inf
+    data[12, 22] = -np.inf
+    with np.errstate(invalid="ignore"):
+        statistics = tile_statistics(lambda start, stop: data[start:stop], data.shape, (4, 5), (50,))
+    expected = expected_tiles(data, (4, 5), (50,))
+    check_statistics(statistics, expected, ("count", "mean", "std", "min", "max", "percentiles"))
+    assert np.isnan(statistics.mean[0, 0]) and statistics.mean[1, 1] == np.inf and statistics.max[3, 4] < np.inf
+
+
+def test_tall_tiles_merge_row_slices(monkeypatch):
+    # Fewer elements per read than a tile row needs, so each tile is merged from slices
+    monkeypatch.setattr(tensorTiles, "TILE_CHUNK_ELEMENTS", 46)
+    data = np.random.default_rng(3).standard_normal((31, 23)) * 10 + 3
+    reads = []
+
+    def read_rows(start, stop):
+        reads.append(stop - start)
+        return data[start:stop]
+
+    statistics = tile_statistics(read_rows, data.shape, (9, 5))
+    assert max(reads) == 2
+    check_statistics(statistics, expected_tiles(data, (9, 5), ()), ("count", "mean", "std", "min", "max"))